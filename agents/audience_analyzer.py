@@ -1,16 +1,16 @@
-import google.generativeai as genai
+from utils.gemini_client import get_model
 
 class AudienceAnalyzerAgent:
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None):  # Added model_name parameter with default
         """
         Initializes the AudienceAnalyzerAgent with the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
     def generate_audience_profile(self, topic: str) -> str:
         """
@@ -21,6 +21,9 @@ class AudienceAnalyzerAgent:
 
         Returns:
             str: formatted audience profile
+
+        Raises:
+            Exception: Model errors propagate, so a failed call never becomes the profile.
         """
         prompt = f"""
 You are a market research expert. Analyze the topic '{topic}' and generate a probable audience profile, including:
@@ -35,8 +38,5 @@ Return a formatted profile like this:
 **Interests**: <details>
 **Reading Goals**: <details>
 """
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"Error generating audience profile: {str(e)}"
\ No newline at end of file
+        response = self.model.generate_content(prompt)
+        return response.text.strip()
\ No newline at end of file
@@ -4,41 +4,118 @@ into a pipeline that turns user-provided topic(s) into polished blog posts.
 
 ✨ Enhancements:
 - Feedback loop from Editor to Writer
-- Topic validation before planning
-- Multi-topic batch generation
+- Topic validation before planning (local pre-screen + per-topic verdict cache)
+- Near-duplicate topics in a batch share one pipeline run (utils/topic_clusters.py)
+- Multi-topic batch generation (topics run concurrently on a bounded thread pool)
 - Role-switching iterative collaboration
+- Streaming stage events (stream_single_chain / stream_chain) with token-level draft chunks
+- Adaptive early exit from the edit/feedback loops once drafts converge
+- Section-level incremental revision for long drafts
+- Per-stage latency, token and cache metrics (utils/metrics.py) with a run summary
+- Declarative stage graph (agents/stages.py) run by a concurrent executor (agents/pipeline.py)
+- Stage-level checkpoints (utils/checkpoints.py): interrupted topics resume from the first unfinished stage
 """
 
 from agents.planner_agent import PlannerAgent
 from agents.content_writer import ContentWriterAgent
 from agents.content_editor import ContentEditorAgent
 from agents.engagement_predictor import EngagementPredictorAgent
-# Placeholder imports for new agents
-# from agents.audience_analyzer import AudienceAnalyzerAgent
-# from agents.tone_refiner_agent import ToneRefinerAgent
+from agents.audience_analyzer import AudienceAnalyzerAgent
+from agents.tone_refiner_agent import ToneRefinerAgent
+from agents.pipeline import PipelineAborted, PipelineCancelled, PipelineExecutor, PipelineGraph
+from agents.stages import PIPELINE_VERSION, build_graph
+from agents.events import (
+    StageEvent, STAGE_STARTED, STAGE_SKIPPED, PLAN_READY, DRAFT_READY, EDIT_DONE, FEEDBACK_READY, SCORE, DONE, ERROR,
+)
+import contextlib
+import dataclasses
+import hashlib
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.backends import get_default_backend
+from utils.checkpoints import ABORTED, COMPLETED, FAILED, RunInProgress, get_default_checkpoints
+from utils.llm_cache import fresh_responses
+from utils.metrics import format_summary, get_metrics, summarize
+from utils.prompt_budget import PromptOverBudget
+from utils.topic_clusters import DEFAULT_DEDUPE_THRESHOLD, cluster_topics, format_clusters
+from utils.topic_screen import UNSURE, TopicVerdictCache, screen_topic
 
 # Load API key
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
 
+# Topics are almost entirely network-bound, so a handful of threads gives a near-linear speedup
+DEFAULT_MAX_WORKERS = int(os.getenv("CONTENTCRAFTER_MAX_WORKERS", "4"))
+# Refinement stops once an edit pass changes little, or after this many editor passes
+DEFAULT_CONVERGENCE_THRESHOLD = float(os.getenv("CONTENTCRAFTER_CONVERGENCE_THRESHOLD", "0.9"))
+DEFAULT_MAX_EDIT_PASSES = int(os.getenv("CONTENTCRAFTER_MAX_EDIT_PASSES", "3"))
+# Long drafts are revised section by section instead of being resent in full
+DEFAULT_SECTION_EDIT_MIN_WORDS = int(os.getenv("CONTENTCRAFTER_SECTION_EDIT_MIN_WORDS", "800"))
+
 class ContentChainAgent:
-    def __init__(self, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, model_name="gemini-1.5-flash", stages=None,
+                 convergence_threshold: float = DEFAULT_CONVERGENCE_THRESHOLD,
+                 max_edit_passes: int = DEFAULT_MAX_EDIT_PASSES,
+                 section_edit_min_words: int = DEFAULT_SECTION_EDIT_MIN_WORDS, backend=None,
+                 checkpoints=None, dedupe_threshold: float = DEFAULT_DEDUPE_THRESHOLD):  # Added model_name parameter with default
+        """
+        Args:
+            model_name (str, optional): The Gemini model every agent uses.
+            stages (list | str | PipelineGraph, optional): Pipeline stages to run (see agents/stages.py).
+                Defaults to CONTENTCRAFTER_STAGES, or the standard ten-step chain.
+            convergence_threshold (float, optional): Stop refining once an edit pass leaves the draft
+                at least this similar (0–1). Values above 1 always run every pass.
+            max_edit_passes (int, optional): Upper bound on editor passes per topic (1–3).
+            section_edit_min_words (int, optional): Drafts at least this long are revised section by
+                section where possible. 0 always sends whole drafts.
+            backend (ModelBackend, optional): Model backend for every agent (utils/backends.py),
+                e.g. FakeBackend for offline runs. Defaults to CONTENTCRAFTER_BACKEND / the Gemini SDK.
+            checkpoints (CheckpointStore | bool, optional): Where finished stages are saved so an
+                interrupted topic resumes where it stopped. Defaults to the shared store
+                (unless CONTENTCRAFTER_CHECKPOINTS_DISABLED is set); False turns checkpointing off.
+            dedupe_threshold (float, optional): Topics in one batch at least this similar (0–1) share
+                a single pipeline run (see utils/topic_clusters.py). Values above 1 run every topic.
+        """
+        self.convergence_threshold = convergence_threshold
+        self.max_edit_passes = max_edit_passes
+        self.section_edit_min_words = section_edit_min_words
+        self.dedupe_threshold = dedupe_threshold
         # Initialize agents with api_key and model_name for switch to gemini-1.5-flash
-        self.planner = PlannerAgent(api_key, model_name)
-        self.writer = ContentWriterAgent(api_key, model_name)
-        self.editor = ContentEditorAgent(api_key, model_name)
-        self.engagement_predictor = EngagementPredictorAgent(api_key, model_name)  # Added initialization
-        # Placeholder initializations for new agents
-        # self.audience_analyzer = AudienceAnalyzerAgent(api_key, model_name)
-        # self.tone_refiner = ToneRefinerAgent(api_key, model_name)
+        self.planner = PlannerAgent(api_key, model_name, backend)
+        self.writer = ContentWriterAgent(api_key, model_name, backend)
+        self.editor = ContentEditorAgent(api_key, model_name, backend)
+        self.engagement_predictor = EngagementPredictorAgent(api_key, model_name, backend)  # Added initialization
+        # Only used when their optional stages are enabled; construction is free (shared model handle)
+        self.audience_analyzer = AudienceAnalyzerAgent(api_key, model_name, backend)
+        self.tone_refiner = ToneRefinerAgent(api_key, model_name, backend)
+
+        self.graph = stages if isinstance(stages, PipelineGraph) else build_graph(stages)
+        self.executor = PipelineExecutor(self.graph)
+        self.checkpoints = None if checkpoints is False else (checkpoints or get_default_checkpoints())
+        backend_name = (backend or get_default_backend()).name
+        # Checkpoints are only resumed by a pipeline with the same stages, backend, model and refinement settings
+        self.pipeline_version = hashlib.sha256("|".join([
+            PIPELINE_VERSION, self.graph.signature(), backend_name, model_name,
+            str(convergence_threshold), str(max_edit_passes), str(section_edit_min_words),
+        ]).encode("utf-8")).hexdigest()[:12]
+        self.topic_verdicts = TopicVerdictCache(model_name, backend=backend_name)
 
     def validate_topic(self, topic: str) -> str:
         """
-        Validates the topic using the planner agent.
+        Validates the topic. Obvious cases are settled locally (utils/topic_screen.py); the rest
+        go to the model once per normalized topic and the verdict is reused after that.
         If topic is invalid, returns an error message string.
         """
+        screen = screen_topic(topic)
+        if screen.verdict != UNSURE:
+            return screen.text
+        cached = self.topic_verdicts.get(topic)
+        if cached is not None:
+            return cached
+
         validation_prompt = f"""You are a content validation expert.
 Evaluate if the topic '{topic}' is suitable for generating blog content.
 Reject vague topics (like "life" or "AI") and ask for more specific ones.
@@ -48,104 +125,220 @@ or
 'INVALID: <reason and how to improve it>'"""
 
         result = self.planner.model.generate_content(validation_prompt).text.strip()
+        if result.startswith(("VALID", "INVALID")):  # Don't pin a malformed answer
+            self.topic_verdicts.set(topic, result)
         return result
 
     def run_single_chain(self, topic: str) -> dict:
         """
         Runs the full content generation pipeline for a single topic with role-switching.
+        Progress is printed to stdout as each stage completes.
         """
-        print(f"\n🔎 Validating topic: '{topic}'...")
-        validation = self.validate_topic(topic)
-        if not validation.startswith("VALID"):
-            return {"error": f"❌ Topic '{topic}' is invalid.\n\n{validation}"}
+        result = None
+        for event in self.stream_single_chain(topic):
+            _print_event(event)
+            if event.kind in (DONE, ERROR):
+                result = event.data
+        return result
 
-        print("📌 Step 1: Generating content plan...\n")
-        plan = self.planner.plan(topic)  # Ensure planner uses the validated topic
-        print("📄 Content Plan:\n", plan)
+    def stream_single_chain(self, topic: str, regenerate: bool = False, cancel: threading.Event = None):
+        """
+        Runs the pipeline graph for a single topic, yielding a StageEvent as each stage makes progress.
+        Independent stages run concurrently; writer and editor stages stream their output token
+        by token (DRAFT_CHUNK events). The last event is DONE (data = the result dict) or
+        ERROR (data = {"error": ..., "retryable": False for a rejected topic, True for a failure}).
 
-        # Extract title, default to topic if no valid title found
-        title_line = next((line for line in plan.split('\n') if "title" in line.lower()), f"Blog Title: {topic}")
-        blog_topic = title_line.split(":")[-1].strip() if ":" in title_line else topic
-        if not blog_topic.lower().startswith(topic.lower()):  # Check for mismatch
-            print(f"⚠️ Warning: Extracted topic '{blog_topic}' differs from input '{topic}'. Forcing input topic.")
-            blog_topic = topic
+        With regenerate=True every stage runs again: checkpoints are not resumed and cached
+        responses are not reused. Setting cancel, or closing the generator before the last
+        event, stops the run after its in-flight calls; finished stages stay checkpointed.
+        """
+        events = queue.Queue()
+        finished = object()
+        cancel = cancel if cancel is not None else threading.Event()
 
-        print("\n✍️ Step 2: Writing initial blog post...\n")
-        initial_draft = self.writer.generate_content(blog_topic)
-        print("📝 Initial Draft:\n", initial_draft)
+        def run():
+            checkpoint = None
+            try:
+                if self.checkpoints:
+                    checkpoint = self.checkpoints.start(topic, self.pipeline_version, resume=not regenerate)
+                with fresh_responses() if regenerate else contextlib.nullcontext():
+                    values = self.executor.run({"topic": topic}, emit=events.put, chain=self, checkpoint=checkpoint,
+                                               cancel=cancel)
+                result = {key: value for key, value in values.items() if key != "topic" and not key.startswith("_")}
+                if checkpoint:
+                    checkpoint.finish(COMPLETED)
+                events.put(StageEvent(topic, "done", DONE, data=result))
+            except PipelineCancelled as e:
+                # Cancelled runs stay resumable
+                if checkpoint:
+                    checkpoint.finish(FAILED, str(e))
+                events.put(StageEvent(topic, "error", ERROR, str(e), {"error": str(e), "retryable": True}))
+            except PipelineAborted as e:
+                if checkpoint:
+                    checkpoint.finish(ABORTED, str(e))
+                events.put(StageEvent(topic, "error", ERROR, str(e), {"error": str(e), "retryable": False}))
+            except RunInProgress as e:
+                # Another live run owns this topic's checkpoint; leave it alone
+                events.put(StageEvent(topic, "error", ERROR, str(e), {"error": str(e), "retryable": True}))
+            except Exception as e:
+                error = f"❌ Topic '{topic}' failed: {type(e).__name__}: {e}"
+                if checkpoint:
+                    checkpoint.finish(FAILED, error)
+                # Retrying cannot shrink a draft that is too large for its prompt budget
+                retryable = not isinstance(e, PromptOverBudget)
+                events.put(StageEvent(topic, "error", ERROR, error, {"error": error, "retryable": retryable}))
+            finally:
+                events.put(finished)
 
-        print("\n🛠️ Step 3: First Edit Pass...\n")
-        first_edit = self.editor.revise_content(initial_draft, plan)
-        print("✅ First Edited Version:\n", first_edit["revised_post"])
+        threading.Thread(target=run, name=f"content-chain-{topic[:20]}", daemon=True).start()
+        completed = False
+        try:
+            while True:
+                event = events.get()
+                if event is finished:
+                    completed = True
+                    return
+                yield event
+        finally:
+            if not completed:
+                # The consumer stopped listening: wind the run down instead of paying for it
+                cancel.set()
 
-        print("\n🔁 Step 4: Feedback Loop - Improving Draft...\n")
-        improvement_prompt = f"""You're a senior blog reviewer.
-Based on this editor-reviewed version, suggest 3 clear improvements for the writer, focusing on clarity and engagement:
+    def run_chain(self, input_topics: str, max_workers: int = DEFAULT_MAX_WORKERS) -> dict:
+        """
+        Accepts a comma-separated string of topics and returns generated content for each.
 
---- Final Edited Version ---
-{first_edit["revised_post"]}
+        Topics are processed concurrently on a bounded thread pool. A topic that raises
+        is reported as an error entry without cancelling the remaining topics. Near-duplicate
+        topics run once and share the result; the clustering is printed first.
 
-Reply with the improvements only."""
-        feedback = self.editor.model.generate_content(improvement_prompt).text.strip()
+        Args:
+            input_topics (str): Comma-separated topics.
+            max_workers (int, optional): Maximum number of topics processed at once.
+                Use 1 to run the topics sequentially.
 
-        print("📌 Editor Feedback:\n", feedback)
+        Returns:
+            dict: Results keyed by topic, in the original input order.
+            A per-stage latency/token summary is printed at the end (see utils/metrics.py).
+        """
+        topics = list(dict.fromkeys(t.strip() for t in input_topics.split(",") if t.strip()))
+        if not topics:
+            return {}
 
-        print("\n✍️ Step 5: Writer Applies Feedback...\n")
-        improved_draft = self.writer.generate_content(blog_topic, previous_draft=first_edit["revised_post"], feedback=feedback)
-        print("📝 Improved Draft:\n", improved_draft)
+        clusters = self._cluster(topics)
+        mark = get_metrics().mark()
+        workers = max(1, min(max_workers, len(clusters)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-chain") as pool:
+            futures = {cluster.representative: pool.submit(self._run_topic, cluster.representative)
+                       for cluster in clusters}
+            shared = {}
+            for cluster in clusters:
+                result = futures[cluster.representative].result()
+                shared.update((topic, dict(result)) for topic in cluster.topics)
+            results = {topic: shared[topic] for topic in topics}
 
-        print("\n🔄 Step 6: Second Edit Pass with Structural Feedback...\n")
-        second_edit = self.editor.revise_content(improved_draft, plan, structural_feedback=True)
-        print("✅ Second Edited Version:\n", second_edit["revised_post"])
+        print("\n📊 Run summary (per stage):\n" + format_summary(summarize(get_metrics().records_since(mark, topics))))
+        return results
 
-        print("\n🔁 Step 7: Second Feedback Loop - Structural Improvements...\n")
-        structural_prompt = f"""You're a senior blog reviewer.
-Based on this editor-reviewed version, suggest 2 structural improvements (e.g., reorganize sections, add subheadings):
+    def _cluster(self, topics: list) -> list:
+        """
+        Groups near-duplicate topics and prints the clustering decisions, if any.
+        """
+        clusters = cluster_topics(topics, self.dedupe_threshold)
+        report = format_clusters(clusters)
+        if report:
+            print(f"\n🔗 Near-duplicate topics share one run ({len(topics)} topics → {len(clusters)} run(s)):\n{report}")
+        return clusters
+
+    def _run_topic(self, topic: str) -> dict:
+        """
+        Runs a single topic, converting any exception into an error result.
+        """
+        print(f"\n\n===========================\n🧠 Processing Topic: {topic}\n===========================")
+        try:
+            return self.run_single_chain(topic)
+        except Exception as e:
+            return {"error": f"❌ Topic '{topic}' failed: {type(e).__name__}: {e}"}
 
---- Second Edited Version ---
-{second_edit["revised_post"]}
+    def stream_chain(self, input_topics: str, max_workers: int = DEFAULT_MAX_WORKERS, regenerate: bool = False):
+        """
+        Runs several topics concurrently and yields their StageEvents as they happen.
+        Events from different topics are interleaved; each topic ends with a DONE or ERROR event.
+        Near-duplicate topics run once: each member first gets a STAGE_SKIPPED event (stage
+        "dedupe") naming its representative, then a copy of every representative event.
+        Closing the generator early (break, Streamlit rerun) cancels the topics still running.
 
-Reply with the improvements only."""
-        structural_feedback = self.editor.model.generate_content(structural_prompt).text.strip()
+        Args:
+            input_topics (str): Comma-separated topics.
+            max_workers (int, optional): Maximum number of topics processed at once.
+            regenerate (bool, optional): Rerun every stage, ignoring checkpoints and cached responses.
 
-        print("📌 Structural Feedback:\n", structural_feedback)
+        Yields:
+            StageEvent: Progress events from all topics.
+        """
+        topics = list(dict.fromkeys(t.strip() for t in input_topics.split(",") if t.strip()))
+        if not topics:
+            return
 
-        print("\n✍️ Step 8: Writer Applies Structural Feedback...\n")
-        second_draft = self.writer.generate_content(blog_topic, previous_draft=second_edit["revised_post"], feedback=structural_feedback)
-        print("📝 Second Draft:\n", second_draft)
+        clusters = self._cluster(topics)
+        events = queue.Queue()
+        finished = object()
+        cancel = threading.Event()
 
-        print("\n🧹 Step 9: Final Polishing...\n")
-        final_post = self.editor.revise_content(second_draft, plan)
-        print("✅ Final Polished Blog:\n", final_post["revised_post"])
+        def pump(cluster):
+            def put(event):
+                events.put(event)
+                for member, _ in cluster.members:
+                    events.put(dataclasses.replace(event, topic=member, data=dict(event.data)))
 
-        # Step 10: Predict Engagement
-        print("\n📈 Step 10: Predicting Engagement...\n")
-        engagement = self.engagement_predictor.predict_engagement(final_post["revised_post"])
-        print(f"📊 Engagement Score: {engagement['score']}\nAnalysis:\n", engagement['analysis'])
+            topic = cluster.representative
+            try:
+                for event in self.stream_single_chain(topic, regenerate=regenerate, cancel=cancel):
+                    put(event)
+            except Exception as e:
+                error = f"❌ Topic '{topic}' failed: {type(e).__name__}: {e}"
+                put(StageEvent(topic, "error", ERROR, error, {"error": error}))
+            finally:
+                events.put(finished)
 
-        return {
-            "plan": plan,
-            "blog_title": blog_topic,
-            "blog_post": improved_draft,
-            "second_draft": second_draft,
-            "edited_post": final_post["revised_post"],
-            "feedback": feedback,
-            "structural_feedback": structural_feedback,
-            "initial_draft": initial_draft,
-            "engagement_score": engagement["score"],
-            "engagement_analysis": engagement["analysis"]
-        }
+        for cluster in clusters:
+            for member, similarity in cluster.members:
+                yield StageEvent(member, "dedupe", STAGE_SKIPPED,
+                                 f"🔗 Near-duplicate of '{cluster.representative}' (similarity {similarity:.2f}) — sharing its result")
 
-    def run_chain(self, input_topics: str) -> dict:
-        """
-        Accepts a comma-separated string of topics and returns generated content for each.
-        """
-        topics = [t.strip() for t in input_topics.split(",") if t.strip()]
-        results = {}
+        workers = max(1, min(max_workers, len(clusters)))
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-stream")
+        try:
+            for cluster in clusters:
+                pool.submit(pump, cluster)
+            remaining = len(clusters)
+            while remaining:
+                event = events.get()
+                if event is finished:
+                    remaining -= 1
+                else:
+                    yield event
+        finally:
+            # Also runs when the consumer stops early: cancel queued topics and wind down running ones
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
 
-        for topic in topics:
-            print(f"\n\n===========================\n🧠 Processing Topic: {topic}\n===========================")
-            result = self.run_single_chain(topic)
-            results[topic] = result
 
-        return results
\ No newline at end of file
+def _print_event(event: StageEvent):
+    """
+    Prints a pipeline event in the CLI's step-by-step format (streamed chunks are not echoed).
+    """
+    if event.kind == STAGE_STARTED:
+        print(f"\n{event.text}\n")
+    elif event.kind == STAGE_SKIPPED:
+        print(event.text)
+    elif event.kind == PLAN_READY:
+        print("📄 Content Plan:\n", event.text)
+    elif event.kind == DRAFT_READY:
+        print("📝 Draft:\n", event.text)
+    elif event.kind == EDIT_DONE:
+        print("✅ Edited Version:\n", event.text)
+    elif event.kind == FEEDBACK_READY:
+        print("📌 Editor Feedback:\n", event.text)
+    elif event.kind == SCORE:
+        print(f"📊 Engagement Score: {event.data['score']}\nAnalysis:\n", event.data["analysis"])
@@ -16,7 +16,12 @@ Output (dict):
     }
 """
 
-import google.generativeai as genai
+from utils.gemini_client import get_model
+from utils.prompt_budget import PromptBuilder
+from utils.sections import (
+    changed_sections, format_sections_for_prompt, merge_sections, parse_sections_response,
+    select_sections, split_sections,
+)
 
 class ContentEditorAgent:
     """
@@ -25,16 +30,16 @@ class ContentEditorAgent:
     Also provides feedback to help regenerate a better version.
     """
 
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None):  # Added model_name parameter with default
         """
-        Initializes the Gemini model using the provided API key.
+        Fetches the shared Gemini model handle for the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
     def revise_content(self, draft: str, goals: str, structural_feedback: bool = False) -> dict:
         """
@@ -55,32 +60,107 @@ class ContentEditorAgent:
             }
         """
 
-        prompt = f"""
-You are a professional blog editor. Below is a draft blog post and its original planning goals.
+        prompt = self._build_prompt(draft, goals, structural_feedback)
+        response = self.model.generate_content(prompt)
+        return self.parse_revision(response.text)
+
+    def revise_content_stream(self, draft: str, goals: str, structural_feedback: bool = False):
+        """
+        Streaming variant of revise_content: yields the raw editor output as tokens arrive.
+        Pass the concatenated chunks to parse_revision() to get the usual dict.
+
+        Args:
+            draft (str): The raw content generated by ContentWriterAgent.
+            goals (str): The original content goals provided by PlannerAgent.
+            structural_feedback (bool): If True, prioritize structural changes.
+
+        Yields:
+            str: The next chunk of the editor's response.
+        """
+        prompt = self._build_prompt(draft, goals, structural_feedback)
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+    def revise_sections(self, draft: str, goals: str, feedback: str = None, previous_draft: str = None) -> dict:
+        """
+        Section-level variant of revise_content for long posts: only the sections the feedback
+        targets (or, with previous_draft, the sections that changed since then) are sent to the
+        model, and the revised sections are merged back by section ID.
+        Falls back to a full revise_content pass when nothing specific is targeted.
+
+        Args:
+            draft (str): The blog post to edit.
+            goals (str): The original content goals provided by PlannerAgent.
+            feedback (str, optional): Reviewer feedback used to pick the target sections.
+            previous_draft (str, optional): An earlier version; sections that changed since are revised.
+
+        Returns:
+            dict: {
+                "revised_post": (str) The merged blog post,
+                "feedback": (str) Editor feedback,
+                "revised_sections": (list) IDs of the sections that were sent for revision
+            }
+        """
+        sections = split_sections(draft)
+        targets = []
+        if previous_draft is not None:
+            targets = changed_sections(previous_draft, draft)
+        if feedback:
+            target_ids = {section.id for section in targets}
+            targets += [section for section in select_sections(sections, feedback) if section.id not in target_ids]
+        if not targets or len(targets) == len(sections):
+            result = self.revise_content(draft, goals)
+            result["revised_sections"] = [section.id for section in sections]
+            return result
+
+        feedback_block = "\n--- REVIEWER FEEDBACK ---\n{feedback}\n" if feedback else ""
+        builder = (PromptBuilder("editor_sections")
+                   .add("goals", goals, priority=1)
+                   .add("sections", format_sections_for_prompt(targets), kind="verbatim"))
+        if feedback:
+            builder.add("feedback", feedback, kind="feedback", priority=0)
+        prompt = builder.build(f"""
+You are a professional blog editor. Below are selected sections of a blog post and its original planning goals.
 
 Your task is:
-1. Revise the blog to improve {'structure and organization' if structural_feedback else 'grammar, tone, clarity, coherence'}.
-2. Ensure alignment with the planner’s goals.
-3. Write a short critique explaining:
-   - What you improved
-   - What is still weak or could be improved further
+1. Revise ONLY the sections below to improve grammar, tone, clarity and coherence.
+2. Ensure alignment with the planner’s goals{' and address the reviewer feedback' if feedback else ''}.
+3. Keep every [[SECTION:id]] and [[END SECTION]] marker exactly as given, one block per section.
+4. Write a short critique of the sections you edited.
 
 --- GOALS ---
-{goals}
-
---- DRAFT BLOG POST ---
-{draft}
+{{goals}}
+{feedback_block}
+--- SECTIONS TO REVISE ---
+{{sections}}
 
 Return your response in the following format:
 
-### Revised Blog Post:
-<your revised blog post here>
+### Revised Sections:
+<the revised sections, each wrapped in its markers>
 
 ### Editor Feedback:
 <constructive feedback here>
-"""
-        response = self.model.generate_content(prompt)
-        output = response.text.strip()
+""")
+        output = self.model.generate_content(prompt).text.strip()
+        revised_part, _, feedback_part = output.partition("### Editor Feedback:")
+        revised = parse_sections_response(revised_part)
+        target_ids = [section.id for section in targets]
+        return {
+            "revised_post": merge_sections(sections, {key: revised[key] for key in target_ids if key in revised}),
+            "feedback": feedback_part.strip() or "No feedback provided.",
+            "revised_sections": target_ids,
+        }
+
+    @staticmethod
+    def parse_revision(output: str) -> dict:
+        """
+        Splits the editor's raw output into the revised post and the feedback.
+
+        Returns:
+            dict: {"revised_post": str, "feedback": str}
+        """
+        output = output.strip()
 
         # Split the output into revised content and feedback
         if "### Editor Feedback:" in output:
@@ -94,4 +174,38 @@ Return your response in the following format:
         return {
             "revised_post": revised_post,
             "feedback": feedback
-        }
\ No newline at end of file
+        }
+
+    def _build_prompt(self, draft: str, goals: str, structural_feedback: bool = False) -> str:
+        """
+        Builds the editing prompt for revise_content / revise_content_stream.
+        """
+        # Only the goals are trimmed: the draft being edited is sent whole (or not at all)
+        prompt = (PromptBuilder("editor")
+                  .add("goals", goals, priority=2)
+                  .add("draft", draft, kind="verbatim")
+                  .build(f"""
+You are a professional blog editor. Below is a draft blog post and its original planning goals.
+
+Your task is:
+1. Revise the blog to improve {'structure and organization' if structural_feedback else 'grammar, tone, clarity, coherence'}.
+2. Ensure alignment with the planner’s goals.
+3. Write a short critique explaining:
+   - What you improved
+   - What is still weak or could be improved further
+
+--- GOALS ---
+{{goals}}
+
+--- DRAFT BLOG POST ---
+{{draft}}
+
+Return your response in the following format:
+
+### Revised Blog Post:
+<your revised blog post here>
+
+### Editor Feedback:
+<constructive feedback here>
+"""))
+        return prompt
@@ -15,7 +15,11 @@ Output (string):
     A revised and improved blog post based on the topic and editor feedback.
 """
 
-import google.generativeai as genai
+from utils.gemini_client import get_model
+from utils.prompt_budget import PromptBuilder
+from utils.sections import (
+    format_sections_for_prompt, merge_sections, parse_sections_response, select_sections, split_sections,
+)
 
 class ContentWriterAgent:
     """
@@ -23,16 +27,16 @@ class ContentWriterAgent:
     Can optionally use feedback to regenerate improved versions.
     """
 
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None):  # Added model_name parameter with default
         """
         Initializes the ContentWriterAgent with the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
     def generate_content(self, topic: str, previous_draft: str = None, feedback: str = None) -> str:
         """
@@ -45,10 +49,86 @@ class ContentWriterAgent:
 
         Returns:
             str: The newly generated or improved blog post.
+
+        Raises:
+            Exception: Model errors propagate, so a failed call never becomes the draft.
+        """
+        prompt = self._build_prompt(topic, previous_draft, feedback)
+        response = self.model.generate_content(prompt)
+        return response.text.strip()
+
+    def generate_content_stream(self, topic: str, previous_draft: str = None, feedback: str = None):
+        """
+        Streaming variant of generate_content: yields the blog post piece by piece as tokens arrive.
+
+        Args:
+            topic (str): The subject to write about.
+            previous_draft (str, optional): The original blog post draft to improve.
+            feedback (str, optional): Editor feedback to use for revision.
+
+        Yields:
+            str: The next chunk of the blog post.
+
+        Raises:
+            Exception: Model errors propagate, so a failed call never becomes the draft.
+        """
+        prompt = self._build_prompt(topic, previous_draft, feedback)
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+    def revise_sections(self, topic: str, previous_draft: str, feedback: str) -> str:
+        """
+        Section-level variant of generate_content(previous_draft=..., feedback=...): only the
+        sections the feedback refers to are rewritten and merged back by section ID.
+        Falls back to a full rewrite when the feedback does not target specific sections.
+
+        Args:
+            topic (str): The subject of the blog post.
+            previous_draft (str): The draft to improve.
+            feedback (str): Editor feedback to apply.
+
+        Returns:
+            str: The improved blog post.
+        """
+        sections = split_sections(previous_draft)
+        targets = select_sections(sections, feedback)
+        if not targets or len(targets) == len(sections):
+            return self.generate_content(topic, previous_draft=previous_draft, feedback=feedback)
+
+        prompt = (PromptBuilder("writer_sections")
+                  .add("topic", topic, priority=9)
+                  .add("feedback", feedback, kind="feedback", priority=0)
+                  .add("sections", format_sections_for_prompt(targets), kind="verbatim")
+                  .build("""
+You are a skilled content writer. Below are selected sections of a blog post on the topic '{topic}', along with editorial feedback.
+
+Your task:
+- Rewrite ONLY these sections, using the feedback to improve weak areas.
+- Keep every [[SECTION:id]] and [[END SECTION]] marker exactly as given, one block per section.
+
+--- Feedback from Editor ---
+{feedback}
+
+--- Sections ---
+{sections}
+
+Return the rewritten sections only.
+        """))
+        revised = parse_sections_response(self.model.generate_content(prompt).text)
+        target_ids = {section.id for section in targets}
+        return merge_sections(sections, {key: text for key, text in revised.items() if key in target_ids})
+
+    def _build_prompt(self, topic: str, previous_draft: str = None, feedback: str = None) -> str:
+        """
+        Builds the writing prompt, or the revision prompt when a previous draft and feedback are given.
         """
-        print(f"Generating content for topic: {topic}")  # Added debug print
         if previous_draft and feedback:
-            prompt = f"""
+            # Only the feedback is compacted: the draft being rewritten is sent whole (or not at all)
+            prompt = (PromptBuilder("writer")
+                      .add("topic", topic, priority=9)
+                      .add("feedback", feedback, kind="feedback", priority=0)
+                      .add("previous_draft", previous_draft, kind="verbatim")
+                      .build("""
 You are a skilled content writer. Here's a blog post draft on the topic '{topic}', along with editorial feedback.
 
 Your task:
@@ -63,16 +143,11 @@ Your task:
 {previous_draft}
 
 Return the improved blog post only.
-            """
+            """))
         else:
             prompt = f"""
 Write a detailed blog post on the topic: '{topic}'.
 Make it informative, engaging, structured with subheadings, and easy to understand.
 Avoid fluff and repetition. Provide examples or evidence where possible.
             """
-
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"⚠️ Error generating content: {str(e)}"
\ No newline at end of file
+        return prompt
@@ -1,30 +1,79 @@
-import google.generativeai as genai
+import os
+
+from utils.engagement import is_borderline, score_posts
+from utils.gemini_client import get_model
+
+# "local": heuristics only, "llm": always ask the model, "auto": ask the model for borderline scores only
+ENGAGEMENT_MODES = ("local", "auto", "llm")
+DEFAULT_ENGAGEMENT_MODE = os.getenv("CONTENTCRAFTER_ENGAGEMENT_MODE", "auto")
 
 class EngagementPredictorAgent:
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None,
+                 mode: str = DEFAULT_ENGAGEMENT_MODE):  # Added model_name parameter with default
         """
         Initializes the EngagementPredictorAgent with the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
+            mode (str, optional): "local", "auto" (the default) or "llm"; see ENGAGEMENT_MODES.
+
+        Raises:
+            ValueError: If mode is not one of ENGAGEMENT_MODES.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        if mode not in ENGAGEMENT_MODES:
+            raise ValueError(f"Unknown engagement mode '{mode}' (expected one of {ENGAGEMENT_MODES})")
+        self.mode = mode
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
-    def predict_engagement(self, blog: str) -> dict:
+    def predict_engagement(self, blog: str, use_llm: bool = None) -> dict:
         """
         Analyzes the blog for engagement and predicts a score (1–10).
 
+        The score comes from the local heuristics (utils/engagement.py) unless the model is
+        asked: always with use_llm=True or mode "llm", for borderline scores in mode "auto".
+
         Args:
             blog: str, the blog post to analyze.
+            use_llm (bool, optional): Force (True) or skip (False) the model call.
 
         Returns:
             dict: {
                 "score": int, engagement score,
-                "analysis": str, explanation of score
+                "analysis": str, explanation of score,
+                "method": "local" or "llm",
+                ...local "raw_score" and "features"
             }
         """
+        return self.predict_engagement_batch([blog], use_llm=use_llm)[0]
+
+    def predict_engagement_batch(self, blogs: list, use_llm: bool = None) -> list:
+        """
+        Scores many posts at once: all locally, then the model only for the ones that need it
+        (see predict_engagement). Returns one result dict per post, in order.
+        """
+        results = score_posts(blogs)
+        for blog, result in zip(blogs, results):
+            ask = use_llm if use_llm is not None else (
+                self.mode == "llm" or (self.mode == "auto" and is_borderline(result["raw_score"])))
+            if ask:
+                llm = self.predict_with_llm(blog)
+                # An unusable reply keeps the local score rather than a made-up default
+                if llm.pop("parsed"):
+                    result.update(llm, method="llm", local_score=result["score"])
+        return results
+
+    def predict_with_llm(self, blog: str) -> dict:
+        """
+        Asks the model to score the blog (1–10) against the engagement criteria.
+
+        Returns:
+            dict: {"score": int, "analysis": str, "parsed": bool (the reply had a valid score)}
+
+        Raises:
+            Exception: Model errors (quota, auth, ...) propagate; only an unparseable reply falls back.
+        """
         prompt = f"""
 You are an engagement expert. Evaluate the blog post for the following criteria:
 - **Length**: Is it appropriate? (Ideal range: ~500–1500 words, too short or too long reduces engagement.)
@@ -44,32 +93,29 @@ Return in the following format:
 <explanation of the score based on the criteria above>
 ```
 """
-        try:
-            response = self.model.generate_content(prompt)
-            output = response.text.strip()
-
-            score = 5  # Default score if parsing fails
-            analysis = "No analysis provided."
-            if "### Analysis:" in output:
-                score_part = output.split("### Engagement Score:")[1].split("\n")[0].strip()
-                analysis_part = output.split("### Analysis:")[1].strip()
-                try:
-                    score = int(score_part)
-                    if score < 1 or score > 10:
-                        raise ValueError("Score out of range (1-10)")
-                except ValueError as ve:
-                    analysis = f"Failed to parse score: {score_part}. Error: {str(ve)}"
-                else:
-                    analysis = analysis_part
+        response = self.model.generate_content(prompt)
+        output = response.text.strip()
+
+        score = 5  # Default score if parsing fails
+        analysis = "No analysis provided."
+        parsed = False
+        if "### Engagement Score:" in output and "### Analysis:" in output:
+            score_part = output.split("### Engagement Score:")[1].split("\n")[0].strip()
+            analysis_part = output.split("### Analysis:")[1].strip()
+            try:
+                score = int(score_part)
+                if score < 1 or score > 10:
+                    raise ValueError("Score out of range (1-10)")
+            except ValueError as ve:
+                analysis = f"Failed to parse score: {score_part}. Error: {str(ve)}"
             else:
-                analysis = "Unexpected response format."
+                analysis = analysis_part
+                parsed = True
+        else:
+            analysis = "Unexpected response format."
 
-            return {
-                "score": score,
-                "analysis": analysis
-            }
-        except Exception as e:
-            return {
-                "score": 0,
-                "analysis": f"Error predicting engagement: {str(e)}"
-            }
\ No newline at end of file
+        return {
+            "score": score,
+            "analysis": analysis,
+            "parsed": parsed
+        }
\ No newline at end of file
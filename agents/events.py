@@ -0,0 +1,42 @@
+"""
+events.py
+
+Typed progress events emitted by ContentChainAgent.stream_single_chain / stream_chain.
+
+Consumers (the CLI and the Streamlit UI) render these as they arrive instead of waiting
+for the whole ten-step pipeline to finish.
+
+🔁 Example Usage:
+
+    for event in agent.stream_single_chain("AI in Education"):
+        if event.kind == DRAFT_CHUNK:
+            print(event.text, end="")
+        elif event.kind == DONE:
+            result = event.data
+"""
+
+from dataclasses import dataclass, field
+
+# Event kinds
+STAGE_STARTED = "stage_started"    # text: human-readable step label
+STAGE_SKIPPED = "stage_skipped"    # text: why the stage did not need an LLM call
+PLAN_READY = "plan_ready"          # text: content plan
+DRAFT_CHUNK = "draft_chunk"        # text: next streamed piece of a writer/editor stage
+DRAFT_READY = "draft_ready"        # text: complete writer draft
+EDIT_DONE = "edit_done"            # text: revised post, data: {"feedback": ...}
+FEEDBACK_READY = "feedback_ready"  # text: reviewer feedback
+SCORE = "score"                    # data: {"score": int, "analysis": str}
+DONE = "done"                      # data: the final result dict (same shape as run_single_chain)
+ERROR = "error"                    # text: error message, data: {"error": ..., "retryable": bool}
+
+
+@dataclass
+class StageEvent:
+    """
+    A single progress event for one topic.
+    """
+    topic: str
+    stage: str
+    kind: str
+    text: str = ""
+    data: dict = field(default_factory=dict)
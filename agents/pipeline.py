@@ -0,0 +1,268 @@
+"""
+pipeline.py
+
+Declarative stage graph and concurrent executor for the content pipeline.
+
+Each Stage declares the context keys it reads (inputs) and writes (outputs). The
+executor starts every stage as soon as its inputs exist, so independent stages run
+concurrently. Gate stages (topic validation) may abort the run by raising
+PipelineAborted; speculative stages are allowed to start before the gates pass and
+are cancelled if a gate fails. Stages that are not speculative wait for every gate.
+
+Context keys starting with "_" are internal and are not part of the final result.
+
+A caller-owned cancel event stops the run early (PipelineCancelled): no new stages start,
+and streaming stages stop at their next chunk.
+
+With a checkpoint (utils/checkpoints.py), every finished stage's outputs are saved as it
+completes, and stages restored from an earlier, interrupted attempt are not run again.
+
+🔁 Example Usage:
+
+    graph = PipelineGraph([
+        Stage("validate", validate_fn, inputs=("topic",), outputs=("_validation",), gate=True),
+        Stage("plan", plan_fn, inputs=("topic",), outputs=("plan",), speculative=True),
+    ])
+    values = PipelineExecutor(graph).run({"topic": "AI in Education"}, emit=print)
+"""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from agents.events import StageEvent, STAGE_SKIPPED, STAGE_STARTED
+from utils.metrics import timed_stage
+
+
+class PipelineAborted(Exception):
+    """
+    Raised by a stage (usually a gate) to stop the run; the message is reported as the topic's error.
+    """
+
+
+class PipelineCancelled(PipelineAborted):
+    """
+    Raised when the caller cancelled the run (e.g. nobody is listening to its events any more).
+    """
+
+
+# How often a run with a cancel event checks it while stages are in flight
+CANCEL_POLL_SECONDS = 0.25
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    fn receives a StageContext and returns a dict containing every key in outputs.
+    """
+    name: str
+    fn: Callable
+    inputs: tuple = ()
+    outputs: tuple = ()
+    gate: bool = False
+    speculative: bool = False
+    label: str = ""
+
+
+class StageContext:
+    """
+    What a stage function sees: the chain agent, the topic, its inputs and an event emitter.
+    """
+
+    def __init__(self, chain, stage: Stage, values: dict, emit: Callable, cancel_event: threading.Event):
+        self.chain = chain
+        self.stage = stage
+        self.topic = values.get("topic", "")
+        self.inputs = {key: values[key] for key in stage.inputs}
+        self._emit = emit
+        self._cancel_event = cancel_event
+
+    def __getitem__(self, key):
+        return self.inputs[key]
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        True once the run has been aborted; long-running stages should stop early.
+        """
+        return self._cancel_event.is_set()
+
+    def emit(self, kind: str, text: str = "", data: dict = None):
+        self._emit(StageEvent(self.topic, self.stage.name, kind, text, data or {}))
+
+
+class PipelineGraph:
+    """
+    An ordered, validated collection of stages. Stages can be added, removed or replaced
+    without touching the chain agent.
+    """
+
+    def __init__(self, stages: list, initial_keys: tuple = ("topic",)):
+        self.initial_keys = tuple(initial_keys)
+        self.stages = []
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> "PipelineGraph":
+        if any(existing.name == stage.name for existing in self.stages):
+            raise ValueError(f"Duplicate pipeline stage: {stage.name}")
+        self.stages.append(stage)
+        return self
+
+    def remove(self, name: str) -> "PipelineGraph":
+        self.stages = [stage for stage in self.stages if stage.name != name]
+        return self
+
+    def replace(self, stage: Stage) -> "PipelineGraph":
+        self.stages = [stage if existing.name == stage.name else existing for existing in self.stages]
+        return self
+
+    def get(self, name: str) -> Optional[Stage]:
+        return next((stage for stage in self.stages if stage.name == name), None)
+
+    def signature(self) -> str:
+        """
+        Returns a stable description of the stages and their inputs/outputs, used to tell
+        checkpoints from a differently shaped pipeline apart.
+        """
+        return ";".join(f"{stage.name}({','.join(stage.inputs)})->{','.join(stage.outputs)}" for stage in self.stages)
+
+    def validate(self):
+        """
+        Checks that every input is produced by exactly one stage (or is an initial key)
+        and that the graph has no cycles.
+
+        Raises:
+            ValueError: If the graph cannot be executed.
+        """
+        producers = {key: None for key in self.initial_keys}
+        for stage in self.stages:
+            for key in stage.outputs:
+                if key in producers:
+                    raise ValueError(f"'{key}' is produced by more than one stage ({stage.name})")
+                producers[key] = stage.name
+        for stage in self.stages:
+            missing = [key for key in stage.inputs if key not in producers]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' needs {missing}, which no stage produces")
+        self.topological_order()
+
+    def topological_order(self) -> list:
+        """
+        Returns the stage names in an order that respects their dependencies.
+        """
+        available = set(self.initial_keys)
+        remaining = list(self.stages)
+        order = []
+        while remaining:
+            ready = [stage for stage in remaining if all(key in available for key in stage.inputs)]
+            if not ready:
+                raise ValueError(f"Pipeline has a cycle between: {[stage.name for stage in remaining]}")
+            for stage in ready:
+                order.append(stage.name)
+                available.update(stage.outputs)
+                remaining.remove(stage)
+        return order
+
+
+class PipelineExecutor:
+    """
+    Runs a PipelineGraph for one topic, starting independent stages concurrently.
+    """
+
+    def __init__(self, graph: PipelineGraph, max_workers: int = 4):
+        graph.validate()
+        self.graph = graph
+        self.max_workers = max_workers
+
+    def run(self, initial: dict, emit: Callable = None, chain=None, checkpoint=None,
+            cancel: threading.Event = None) -> dict:
+        """
+        Executes the graph.
+
+        Args:
+            initial (dict): Initial context values (at least "topic").
+            emit (callable, optional): Receives every StageEvent produced by the stages.
+            chain (optional): The ContentChainAgent exposed to stage functions as ctx.chain.
+            checkpoint (RunCheckpoint, optional): Restores stages finished in an earlier attempt
+                and saves each stage's outputs as it completes.
+            cancel (threading.Event, optional): Set by the caller to stop the run early.
+
+        Returns:
+            dict: Every context value once all stages have finished.
+
+        Raises:
+            PipelineAborted: If a stage aborted the run (speculative work is cancelled first).
+            PipelineCancelled: If cancel was set before the run finished.
+        """
+        emit = emit or (lambda event: None)
+        values = dict(initial)
+        pending = list(self.graph.stages)
+        gates_left = {stage.name for stage in pending if stage.gate}
+        cancel_event = threading.Event()
+        running = {}
+
+        if checkpoint is not None:
+            restored = checkpoint.load()
+            for stage in list(pending):
+                outputs = restored.get(stage.name)
+                if outputs is None or any(key not in outputs for key in stage.outputs):
+                    continue
+                pending.remove(stage)
+                values.update(outputs)
+                gates_left.discard(stage.name)
+                emit(StageEvent(values.get("topic", ""), stage.name, STAGE_SKIPPED,
+                                f"♻️ Restored from checkpoint: {stage.name}"))
+
+        def ready(stage):
+            if any(key not in values for key in stage.inputs):
+                return False
+            return stage.gate or stage.speculative or not gates_left
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline-stage")
+        try:
+            while pending or running:
+                if cancel is not None and cancel.is_set():
+                    raise PipelineCancelled("⏹️ Run cancelled")
+                for stage in [stage for stage in pending if ready(stage)]:
+                    pending.remove(stage)
+                    ctx = StageContext(chain, stage, values, emit, cancel_event)
+                    # Stages see the caller's context variables (metric tags, cache bypass)
+                    running[pool.submit(contextvars.copy_context().run, self._run_stage, stage, ctx)] = stage
+
+                if not running:
+                    raise PipelineAborted(f"Pipeline stalled; stages never became ready: {[s.name for s in pending]}")
+
+                done, _ = wait(running, timeout=CANCEL_POLL_SECONDS if cancel is not None else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    outputs = future.result()
+                    values.update(outputs)
+                    gates_left.discard(stage.name)
+                    if checkpoint is not None and not cancel_event.is_set() and all(key in outputs for key in stage.outputs):
+                        checkpoint.save(stage.name, {key: outputs[key] for key in stage.outputs})
+        except BaseException:
+            # Don't wait for speculative work: flag it as cancelled and let it wind down in the background
+            cancel_event.set()
+            raise
+        finally:
+            pool.shutdown(wait=not cancel_event.is_set(), cancel_futures=True)
+        return values
+
+    @staticmethod
+    def _run_stage(stage: Stage, ctx: StageContext) -> dict:
+        if ctx.cancelled:
+            return {}
+        if stage.label:
+            ctx.emit(STAGE_STARTED, stage.label)
+        with timed_stage(stage.name, ctx.topic):
+            outputs = stage.fn(ctx) or {}
+        missing = [key for key in stage.outputs if key not in outputs]
+        if missing and not ctx.cancelled:
+            raise ValueError(f"Stage '{stage.name}' did not produce {missing}")
+        return outputs
@@ -3,7 +3,8 @@ planner_agent.py
 
 Defines the PlannerAgent, responsible for generating a structured content plan
 including blog titles, video ideas, and tweet hooks using the Gemini model.
-Also validates the quality of the topic.
+Topics are validated beforehand (ContentChainAgent.validate_topic), so the plan prompt
+does not re-check them.
 
 🔁 Example Usage:
 
@@ -19,53 +20,47 @@ Output (string):
     - "Teachers + AI = Superpowers for Learning!"
 """
 
-import google.generativeai as genai
+from utils.gemini_client import get_model
 
 class PlannerAgent:
     """
     The PlannerAgent generates a content plan (title, YouTube idea, tweets) for a given topic.
-    Also performs topic validation and requests rephrasing if needed.
+    Expects a topic that has already passed ContentChainAgent.validate_topic.
     """
 
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None):  # Added model_name parameter with default
         """
         Initializes the PlannerAgent with the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
     def plan(self, topic: str) -> str:
         """
-        Validates the topic and generates a content strategy for the given topic.
+        Generates a content strategy for the given (already validated) topic.
 
         Args:
             topic (str): The subject to plan content for.
 
         Returns:
-            str: A formatted content plan OR a message asking for better topic input.
+            str: A formatted content plan.
+
+        Raises:
+            Exception: Model errors propagate, so a failed call never becomes the plan.
         """
 
         prompt = f"""
-You are an expert content strategist. Evaluate this topic: "{topic}"
-
-Step 1: Determine if the topic is clear, specific, and suitable for a blog post.
-If it is vague (e.g. "Technology"), irrelevant (e.g. "My cat's name"), or nonsensical,
-kindly explain why and ask the user to provide a more specific and meaningful topic.
+You are an expert content strategist. Plan content for this topic: "{topic}"
 
-Step 2: If the topic is valid, generate:
+Generate:
 - Blog Title
 - YouTube Video Idea
 - 3 Tweet Hooks
-
-Respond accordingly.
         """
 
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            return f"⚠️ Error generating content plan: {str(e)}"
\ No newline at end of file
+        response = self.model.generate_content(prompt)
+        return response.text.strip()
\ No newline at end of file
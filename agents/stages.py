@@ -0,0 +1,321 @@
+"""
+stages.py
+
+The content pipeline expressed as PipelineGraph stages (see agents/pipeline.py).
+
+DEFAULT_STAGES reproduces the original ten-step chain. The three editor passes stop early
+once a revision barely changes the draft (ContentChainAgent.convergence_threshold) or the
+edit-pass budget (max_edit_passes) is spent; skipped stages pass the latest draft through.
+For long drafts (section_edit_min_words) the feedback rewrite and the final polish only
+send the targeted or changed sections to the model (see utils/sections.py). A draft too
+large for its whole-post rewrite prompt takes the same section-level path; if that cannot
+fit either, the stage fails (PromptOverBudget) rather than rewriting a truncated draft.
+
+Optional stages (audience profile, tone refinement) can be switched on without editing
+chain_agent.py, either by passing stage names to ContentChainAgent(stages=...) or through
+the CONTENTCRAFTER_STAGES environment variable, e.g. "default,audience,tone".
+
+🔁 Example Usage:
+
+    graph = build_graph(["default", "audience"])
+    graph.remove("engagement")
+    agent = ContentChainAgent(stages=graph)
+"""
+
+import logging
+import os
+
+from agents.events import PLAN_READY, DRAFT_CHUNK, DRAFT_READY, EDIT_DONE, FEEDBACK_READY, SCORE, STAGE_SKIPPED
+from agents.pipeline import PipelineAborted, PipelineGraph, Stage
+from utils.convergence import convergence_score
+from utils.prompt_budget import PromptBuilder, PromptOverBudget
+
+logger = logging.getLogger(__name__)
+
+
+def validate(ctx):
+    validation = ctx.chain.validate_topic(ctx.topic)
+    if not validation.startswith("VALID"):
+        raise PipelineAborted(f"❌ Topic '{ctx.topic}' is invalid.\n\n{validation}")
+    return {"_validation": validation}
+
+
+def plan(ctx):
+    topic = ctx.topic
+    plan = ctx.chain.planner.plan(topic)  # Ensure planner uses the validated topic
+    ctx.emit(PLAN_READY, plan)
+
+    # Extract title, default to topic if no valid title found
+    title_line = next((line for line in plan.split('\n') if "title" in line.lower()), f"Blog Title: {topic}")
+    blog_topic = title_line.split(":")[-1].strip() if ":" in title_line else topic
+    if not blog_topic.lower().startswith(topic.lower()):  # Check for mismatch
+        logger.warning("Extracted topic '%s' differs from input '%s'. Forcing input topic.", blog_topic, topic)
+        blog_topic = topic
+    return {"plan": plan, "blog_title": blog_topic}
+
+
+def initial_draft(ctx):
+    chunks = ctx.chain.writer.generate_content_stream(ctx["blog_title"])
+    return {"initial_draft": stream_draft(ctx, chunks)}
+
+
+def first_edit(ctx):
+    return {"_first_edit": edit_pass(ctx, ctx["initial_draft"], pass_number=1)}
+
+
+def feedback(ctx):
+    if refinement_done(ctx, ctx["_first_edit"]):
+        # Reuse the editor's own critique instead of paying for another review
+        return {"feedback": ctx["_first_edit"]["feedback"]}
+    improvement_prompt = PromptBuilder("reviewer").add("post", ctx["_first_edit"]["revised_post"], kind="draft").build(
+        """You're a senior blog reviewer.
+Based on this editor-reviewed version, suggest 3 clear improvements for the writer, focusing on clarity and engagement:
+
+--- Final Edited Version ---
+{post}
+
+Reply with the improvements only.""")
+    feedback = ctx.chain.editor.model.generate_content(improvement_prompt).text.strip()
+    ctx.emit(FEEDBACK_READY, feedback)
+    return {"feedback": feedback}
+
+
+def improved_draft(ctx):
+    if refinement_done(ctx, ctx["_first_edit"]):
+        return {"blog_post": ctx["_first_edit"]["revised_post"]}
+    previous_draft = ctx["_first_edit"]["revised_post"]
+    return {"blog_post": rewrite_draft(ctx, previous_draft, ctx["feedback"], sections=use_section_edits(ctx, previous_draft))}
+
+
+def second_edit(ctx):
+    previous = ctx["_first_edit"]
+    if refinement_done(ctx, previous):
+        return {"_second_edit": dict(previous, revised_post=ctx["blog_post"], skipped=True)}
+    return {"_second_edit": edit_pass(ctx, ctx["blog_post"], pass_number=previous["pass"] + 1, structural_feedback=True)}
+
+
+def structural_feedback(ctx):
+    if refinement_done(ctx, ctx["_second_edit"]):
+        return {"structural_feedback": ctx["_second_edit"]["feedback"]}
+    structural_prompt = PromptBuilder("reviewer").add("post", ctx["_second_edit"]["revised_post"], kind="draft").build(
+        """You're a senior blog reviewer.
+Based on this editor-reviewed version, suggest 2 structural improvements (e.g., reorganize sections, add subheadings):
+
+--- Second Edited Version ---
+{post}
+
+Reply with the improvements only.""")
+    structural_feedback = ctx.chain.editor.model.generate_content(structural_prompt).text.strip()
+    ctx.emit(FEEDBACK_READY, structural_feedback)
+    return {"structural_feedback": structural_feedback}
+
+
+def second_draft(ctx):
+    if refinement_done(ctx, ctx["_second_edit"]):
+        return {"second_draft": ctx["_second_edit"]["revised_post"]}
+    return {"second_draft": rewrite_draft(ctx, ctx["_second_edit"]["revised_post"], ctx["structural_feedback"])}
+
+
+def final_edit(ctx):
+    previous = ctx["_second_edit"]
+    if refinement_done(ctx, previous):
+        return {"edited_post": ctx["second_draft"], "refinement_passes": previous["pass"]}
+    # Polishing only needs to touch what the writer changed since the second edit
+    edit = edit_pass(ctx, ctx["second_draft"], pass_number=previous["pass"] + 1, previous_draft=previous["revised_post"])
+    return {"edited_post": edit["revised_post"], "refinement_passes": edit["pass"]}
+
+
+def engagement(ctx):
+    engagement = ctx.chain.engagement_predictor.predict_engagement(ctx["edited_post"])
+    ctx.emit(SCORE, str(engagement["score"]), engagement)
+    return {"engagement_score": engagement["score"], "engagement_analysis": engagement["analysis"]}
+
+
+def audience(ctx):
+    return {"audience_profile": ctx.chain.audience_analyzer.generate_audience_profile(ctx.topic)}
+
+
+def tone(ctx):
+    refined = ctx.chain.tone_refiner.refine_tone(ctx["edited_post"], ctx["plan"], ctx["blog_title"])
+    ctx.emit(EDIT_DONE, refined["refined_post"], {"feedback": refined["tone_feedback"]})
+    return {"tone_refined_post": refined["refined_post"], "tone_feedback": refined["tone_feedback"]}
+
+
+def stream_draft(ctx, chunks) -> str:
+    """
+    Forwards writer chunks as DRAFT_CHUNK events and returns the complete draft.
+    Stops early if the run is cancelled.
+    """
+    parts = []
+    for chunk in chunks:
+        if ctx.cancelled:
+            break
+        parts.append(chunk)
+        ctx.emit(DRAFT_CHUNK, chunk)
+    draft = "".join(parts).strip()
+    ctx.emit(DRAFT_READY, draft)
+    return draft
+
+
+def rewrite_draft(ctx, previous_draft: str, feedback: str, sections: bool = False) -> str:
+    """
+    Has the writer apply feedback to previous_draft: streamed as a whole post, or section by
+    section when sections=True or the whole draft does not fit the writer's prompt budget.
+    """
+    if not sections:
+        chunks = ctx.chain.writer.generate_content_stream(ctx["blog_title"], previous_draft=previous_draft, feedback=feedback)
+        try:
+            return stream_draft(ctx, chunks)
+        except PromptOverBudget as e:
+            # Raised before the first chunk, while the prompt is built
+            logger.warning("%s; rewriting section by section instead", e)
+    draft = ctx.chain.writer.revise_sections(ctx["blog_title"], previous_draft, feedback)
+    ctx.emit(DRAFT_READY, draft)
+    return draft
+
+
+def edit_pass(ctx, draft: str, pass_number: int, structural_feedback: bool = False, previous_draft: str = None) -> dict:
+    """
+    Runs one editor pass and measures how much it changed the draft. Long drafts with a
+    previous_draft, and drafts with one that do not fit the editor's prompt budget, are
+    edited section by section (only changed sections are sent); everything else is a
+    streamed full pass.
+
+    Returns:
+        dict: The editor's {"revised_post", "feedback"} plus "pass" (edit passes run so far),
+        "similarity" (convergence score between draft and revision) and "converged".
+    """
+    sections = previous_draft is not None and not structural_feedback and use_section_edits(ctx, draft)
+    if not sections:
+        chunks = ctx.chain.editor.revise_content_stream(draft, ctx["plan"], structural_feedback=structural_feedback)
+        try:
+            edit = stream_edit(ctx, chunks)
+        except PromptOverBudget as e:
+            if previous_draft is None:
+                raise
+            # Raised before the first chunk, while the prompt is built
+            logger.warning("%s; editing changed sections instead", e)
+            sections = True
+    if sections:
+        edit = ctx.chain.editor.revise_sections(draft, ctx["plan"], previous_draft=previous_draft)
+        ctx.emit(EDIT_DONE, edit["revised_post"], {"feedback": edit["feedback"], "sections": edit["revised_sections"]})
+    similarity = convergence_score(draft, edit["revised_post"])
+    edit.update(
+        {"pass": pass_number, "similarity": round(similarity, 3),
+         "converged": similarity >= ctx.chain.convergence_threshold, "skipped": False}
+    )
+    return edit
+
+
+def use_section_edits(ctx, draft: str) -> bool:
+    """
+    True when a draft is long enough for section-level revision (ContentChainAgent.section_edit_min_words).
+    """
+    min_words = ctx.chain.section_edit_min_words
+    return bool(min_words) and len(draft.split()) >= min_words
+
+
+def refinement_done(ctx, edit: dict) -> bool:
+    """
+    True when the refinement loop should stop after this edit: the draft converged or the
+    edit-pass budget is spent. Emits STAGE_SKIPPED so consumers can show why.
+    """
+    if edit["converged"]:
+        reason = f"draft converged (similarity {edit['similarity']:.2f})"
+    elif edit["pass"] >= ctx.chain.max_edit_passes:
+        reason = f"edit-pass budget of {ctx.chain.max_edit_passes} spent"
+    else:
+        return False
+    ctx.emit(STAGE_SKIPPED, f"⏭️ Skipped: {reason}")
+    return True
+
+
+def stream_edit(ctx, chunks) -> dict:
+    """
+    Forwards editor chunks as DRAFT_CHUNK events and returns the parsed revision dict.
+    """
+    parts = []
+    for chunk in chunks:
+        if ctx.cancelled:
+            break
+        parts.append(chunk)
+        ctx.emit(DRAFT_CHUNK, chunk)
+    edit = ctx.chain.editor.parse_revision("".join(parts))
+    ctx.emit(EDIT_DONE, edit["revised_post"], {"feedback": edit["feedback"]})
+    return edit
+
+
+STAGES = {
+    "validate": Stage("validate", validate, inputs=("topic",), outputs=("_validation",), gate=True,
+                      label="🔎 Validating topic..."),
+    # Planning only needs the topic, so it starts speculatively alongside validation
+    "plan": Stage("plan", plan, inputs=("topic",), outputs=("plan", "blog_title"), speculative=True,
+                  label="📌 Step 1: Generating content plan..."),
+    "initial_draft": Stage("initial_draft", initial_draft, inputs=("blog_title",), outputs=("initial_draft",),
+                           label="✍️ Step 2: Writing initial blog post..."),
+    "first_edit": Stage("first_edit", first_edit, inputs=("initial_draft", "plan"), outputs=("_first_edit",),
+                        label="🛠️ Step 3: First Edit Pass..."),
+    "feedback": Stage("feedback", feedback, inputs=("_first_edit",), outputs=("feedback",),
+                      label="🔁 Step 4: Feedback Loop - Improving Draft..."),
+    "improved_draft": Stage("improved_draft", improved_draft, inputs=("blog_title", "_first_edit", "feedback"),
+                            outputs=("blog_post",), label="✍️ Step 5: Writer Applies Feedback..."),
+    "second_edit": Stage("second_edit", second_edit, inputs=("blog_post", "plan", "_first_edit"), outputs=("_second_edit",),
+                         label="🔄 Step 6: Second Edit Pass with Structural Feedback..."),
+    "structural_feedback": Stage("structural_feedback", structural_feedback, inputs=("_second_edit",),
+                                 outputs=("structural_feedback",),
+                                 label="🔁 Step 7: Second Feedback Loop - Structural Improvements..."),
+    "second_draft": Stage("second_draft", second_draft, inputs=("blog_title", "_second_edit", "structural_feedback"),
+                          outputs=("second_draft",), label="✍️ Step 8: Writer Applies Structural Feedback..."),
+    "final_edit": Stage("final_edit", final_edit, inputs=("second_draft", "plan", "_second_edit"),
+                        outputs=("edited_post", "refinement_passes"),
+                        label="🧹 Step 9: Final Polishing..."),
+    "engagement": Stage("engagement", engagement, inputs=("edited_post",),
+                        outputs=("engagement_score", "engagement_analysis"),
+                        label="📈 Step 10: Predicting Engagement..."),
+    # Optional stages; both run concurrently with the main chain
+    "audience": Stage("audience", audience, inputs=("topic",), outputs=("audience_profile",),
+                      label="👥 Analyzing audience..."),
+    "tone": Stage("tone", tone, inputs=("edited_post", "plan", "blog_title"),
+                  outputs=("tone_refined_post", "tone_feedback"), label="🎯 Refining tone..."),
+}
+
+# Bump when a stage's prompts or outputs change, so old checkpoints are not resumed
+PIPELINE_VERSION = "3"
+
+DEFAULT_STAGES = [
+    "validate", "plan", "initial_draft", "first_edit", "feedback", "improved_draft",
+    "second_edit", "structural_feedback", "second_draft", "final_edit", "engagement",
+]
+
+
+def build_graph(stage_names=None) -> PipelineGraph:
+    """
+    Builds a PipelineGraph from stage names.
+
+    Args:
+        stage_names (list | str, optional): Stage names, or a comma-separated string.
+            "default" expands to DEFAULT_STAGES and "-name" removes a stage.
+            Defaults to CONTENTCRAFTER_STAGES, or DEFAULT_STAGES when unset.
+
+    Returns:
+        PipelineGraph: The validated graph.
+    """
+    if stage_names is None:
+        stage_names = os.getenv("CONTENTCRAFTER_STAGES") or DEFAULT_STAGES
+    if isinstance(stage_names, str):
+        stage_names = [name.strip() for name in stage_names.split(",") if name.strip()]
+
+    selected = []
+    for name in stage_names:
+        if name == "default":
+            selected.extend(n for n in DEFAULT_STAGES if n not in selected)
+        elif name.startswith("-"):
+            selected = [n for n in selected if n != name[1:]]
+        elif name not in STAGES:
+            raise ValueError(f"Unknown pipeline stage '{name}'. Available: {', '.join(STAGES)}")
+        elif name not in selected:
+            selected.append(name)
+
+    graph = PipelineGraph([STAGES[name] for name in selected])
+    graph.validate()
+    return graph
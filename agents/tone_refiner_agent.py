@@ -1,17 +1,18 @@
 # agents/tone_refiner_agent.py
-import google.generativeai as genai
+from utils.gemini_client import get_model
+from utils.prompt_budget import PromptBuilder
 
 class ToneRefinerAgent:
-    def __init__(self, api_key: str, model_name="gemini-1.5-flash"):  # Added model_name parameter with default
+    def __init__(self, api_key: str, model_name="gemini-1.5-flash", backend=None):  # Added model_name parameter with default
         """
         Initializes the ToneRefinerAgent with the provided API key.
 
         Args:
             api_key (str): Your Google Generative AI API key.
             model_name (str, optional): The Gemini model to use. Defaults to "gemini-1.5-flash" for hackathon quota compatibility.
+            backend (ModelBackend, optional): Model backend (utils/backends.py). Defaults to the Gemini SDK.
         """
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(model_name)  # Updated to use model_name
+        self.model = get_model(model_name, api_key, agent=type(self).__name__, backend=backend)  # Shared, cached handle from utils/gemini_client.py
 
     def refine_tone(self, draft: str, goals: str, title: str) -> dict:
         """
@@ -29,7 +30,11 @@ class ToneRefinerAgent:
                 "tone_feedback": (str) Explanation of tone adjustments
             }
         """
-        prompt = f"""You are a tone expert. Analyze the blog title '{title}' and goals to determine the intended emotional tone.
+        prompt = (PromptBuilder("tone")
+                  .add("title", title, priority=9)
+                  .add("goals", goals, priority=2)
+                  .add("draft", draft, kind="verbatim")
+                  .build("""You are a tone expert. Analyze the blog title '{title}' and goals to determine the intended emotional tone.
 Refine the draft to align with this tone and explain changes.
 
 --- GOALS ---
@@ -45,7 +50,7 @@ Return in format:
 ### Refined Post:
 <content>
 ### Tone Feedback:
-<explanation>"""
+<explanation>"""))
         response = self.model.generate_content(prompt)
         output = response.text.strip()
         if "### Tone Feedback:" in output:
@@ -1,73 +1,252 @@
 import streamlit as st
 from agents.chain_agent import ContentChainAgent
-import os
+from agents.events import STAGE_STARTED, STAGE_SKIPPED, DRAFT_CHUNK, SCORE, DONE, ERROR
+from utils.image_worker import ImageJob, ImageWorker, get_image_worker as _get_process_image_worker
+from utils.document import Document, Heading, ImageRef, Paragraph, build_document
+from utils.docx_export import DOCX_MIME, docx_bytes, docx_filename, write_docx_zip
+from utils.placeholders import collect_image_prompts
 from dotenv import load_dotenv
-import re
 import io
-import torch
-import base64
-from docx import Document
-from docx.shared import Inches
+
+@st.cache_resource
+def get_chain_agent(model_name: str = "gemini-1.5-flash") -> ContentChainAgent:
+    """
+    Returns one ContentChainAgent per model name, shared across reruns and sessions.
+    """
+    return ContentChainAgent(model_name=model_name)
+
+@st.cache_resource
+def get_image_worker() -> ImageWorker:
+    """
+    Returns the process-wide image worker, shared across reruns and sessions. Its process
+    (which owns Stable Diffusion) starts on the first uncached image or an explicit warm-up.
+    """
+    return _get_process_image_worker()
+
+def render_image_controls(images: ImageWorker):
+    """
+    Sidebar controls for loading / unloading the image model.
+    """
+    with st.sidebar:
+        st.markdown("### 🎨 Image model")
+        if images.loaded:
+            st.success(f"Loaded on {images.device.upper()}")
+        elif images.load_error:
+            st.error(f"Unavailable: {images.load_error}")
+        elif images.alive:
+            st.info("Worker running (model loads on the first image)")
+        else:
+            st.info("Not loaded (loads on the first image)")
+        col_warm, col_unload = st.columns(2)
+        if col_warm.button("🔥 Warm up", disabled=images.loaded):
+            images.warm_up()
+            st.toast("Loading Stable Diffusion in the background...")
+        if col_unload.button("🧹 Unload", disabled=not images.loaded):
+            images.unload()
+            st.rerun()
+        for profile, stats in images.timings.items():
+            st.caption(f"⏱️ {profile}: {stats['images']} image(s), {stats['avg_s']:.1f}s avg, {stats['seconds']:.1f}s total")
+
+def stream_results(agent: ContentChainAgent, topics: list, regenerate: bool = False) -> dict:
+    """
+    Runs the chain for all topics, showing each topic's current step and its draft
+    as tokens stream in. Returns the results keyed by topic in input order.
+    With regenerate=True nothing is reused from checkpoints or the response cache.
+    """
+    results = {}
+    status, preview, buffers = {}, {}, {}
+    for topic in topics:
+        with st.expander(f"⏳ Live progress: {topic}", expanded=len(topics) == 1):
+            status[topic] = st.empty()
+            preview[topic] = st.empty()
+        status[topic].info("Queued...")
+
+    for event in agent.stream_chain(",".join(topics), regenerate=regenerate):
+        topic = event.topic
+        if event.kind == STAGE_STARTED:
+            status[topic].info(event.text)
+            buffers[topic] = ""
+        elif event.kind == DRAFT_CHUNK:
+            buffers[topic] = buffers.get(topic, "") + event.text
+            preview[topic].markdown(buffers[topic])
+        elif event.kind == STAGE_SKIPPED and event.stage == "dedupe":
+            st.caption(f"{topic}: {event.text}")
+        elif event.kind == SCORE:
+            status[topic].info(f"📊 Engagement Score: {event.data['score']}")
+        elif event.kind == DONE:
+            status[topic].success("✅ Done")
+            results[topic] = event.data
+        elif event.kind == ERROR:
+            status[topic].error(event.text)
+            results[topic] = event.data
+
+    return {topic: results[topic] for topic in topics if topic in results}
+
+PREVIEW_DRAFT_KEYS = ("blog_post", "second_draft")
+FINAL_POST_KEY = "edited_post"
+
+def submit_run_images(images: ImageWorker, results: dict) -> ImageJob:
+    """
+    Queues every image referenced by any draft of any topic, once, on the background worker:
+    intermediate drafts at preview quality, the final posts at full quality.
+    The previous generation of this session is cancelled first.
+    """
+    previous = st.session_state.pop("image_job", None)
+    if previous is not None:
+        images.cancel(previous)
+    outputs = [output for output in results.values() if "error" not in output]
+    job = images.submit({
+        "preview": collect_image_prompts(output.get(key, "") for output in outputs for key in PREVIEW_DRAFT_KEYS),
+        "full": collect_image_prompts(output.get(FINAL_POST_KEY, "") for output in outputs),
+    })
+    st.session_state["image_job"] = job
+    return job
+
+def render_document(document: Document):
+    """
+    Renders a Document with Streamlit: markdown for text, st.image for ready images
+    (read from the image cache by path), a placeholder for images still being generated.
+    """
+    for block in document.blocks:
+        if isinstance(block, Heading):
+            st.markdown(f"{'#' * min(block.level + 3, 6)} {block.text}")
+        elif isinstance(block, Paragraph):
+            st.markdown(block.text)
+        elif isinstance(block, ImageRef):
+            if block.unsupported:
+                st.warning(f"⚠️ Video/GIF not supported: {block.prompt}")
+            elif block.ready:
+                st.image(block.path or block.data, caption=block.prompt, width=300)
+            elif block.error:
+                st.warning(f"⚠️ Failed: {block.prompt}")
+            else:
+                st.caption(f"⏳ Generating image: {block.prompt}")
+
+def render_into(slot, document: Document):
+    with slot.container():
+        render_document(document)
+
+def request_regenerate(topic: str):
+    """
+    Button callback: marks a topic to be regenerated at the start of the next script run.
+    """
+    st.session_state["regenerate"] = topic
+
+def cached_export(key, signature, build) -> bytes:
+    """
+    Returns build()'s bytes, reusing the copy kept in session state while signature is
+    unchanged, so reruns (e.g. clicking a download button) don't rebuild DOCX/ZIP files.
+    """
+    exports = st.session_state.setdefault("exports", {})
+    cached = exports.get(key)
+    if cached is None or cached[0] != signature:
+        cached = exports[key] = (signature, build())
+    return cached[1]
+
+def document_signature(document: Document, markdown: str) -> tuple:
+    return (document.title, markdown, tuple((ref.prompt, ref.path, ref.error) for ref in document.images()))
+
+def render_results(images: ImageWorker, results: dict, job: ImageJob):
+    """
+    Draws every topic's plan, drafts and downloads from stored results. Text renders right
+    away; images fill in as the worker delivers them (or instantly once the job is done).
+    """
+    slots, exports = [], []
+    for topic, output in results.items():
+        col_title, col_regenerate = st.columns([5, 1])
+        col_title.markdown(f"## 🧠 Topic: `{topic}`")
+        col_regenerate.button("🔄 Regenerate", key=f"regenerate_{topic}", on_click=request_regenerate, args=(topic,))
+        if "error" in output:
+            st.error(output["error"])
+            continue
+
+        blog_title = output.get("blog_title", topic)
+        drafts = {
+            "Original Draft": output.get("initial_draft", ""),
+            "Editor Feedback": output.get("feedback", ""),
+            "Improved Draft": output.get("blog_post", ""),
+            "Structural Feedback": output.get("structural_feedback", ""),
+            "Second Draft": output.get("second_draft", ""),
+            "Final Post": output.get("edited_post", "")
+        }
+
+        st.markdown("### 📌 Content Plan")
+        st.code(output.get("plan", ""), language="markdown")
+
+        for label, content in drafts.items():
+            st.markdown(f"### {label}")
+            if label in ["Original Draft", "Editor Feedback", "Structural Feedback"]:
+                st.code(content, language="markdown")
+                continue
+            profile = "full" if label == "Final Post" else "preview"
+            slot = st.empty()
+            render_into(slot, build_document(blog_title, content, job.paths_for(profile)))
+            slots.append((slot, blog_title, content, profile, set(collect_image_prompts([content]))))
+
+        exports.append((topic, blog_title, drafts["Final Post"], st.empty()))
+
+    progress = st.empty()
+    for done_profile, prompt, _ in images.iter_results(job):
+        progress.caption(f"🎨 Images: {job.completed}/{job.total}")
+        for slot, blog_title, content, profile, prompts in slots:
+            if profile == done_profile and prompt in prompts:
+                render_into(slot, build_document(blog_title, content, job.paths_for(profile)))
+    progress.empty()
+
+    documents, signatures = [], []
+    for topic, blog_title, final_post, export_slot in exports:
+        document = build_document(blog_title, final_post, job.paths_for("full"))
+        signature = document_signature(document, final_post)
+        documents.append(document)
+        signatures.append(signature)
+        try:
+            export_slot.download_button(
+                label=f"💾 Download DOCX for '{topic}'",
+                data=cached_export(("docx", topic), signature, lambda: docx_bytes(document)),
+                file_name=docx_filename(document),
+                mime=DOCX_MIME,
+                key=f"docx_{topic}"
+            )
+        except Exception as e:
+            export_slot.error(f"⚠️ DOCX Export Failed: {e}")
+
+    if len(documents) > 1:
+        def build_zip():
+            archive = io.BytesIO()
+            write_docx_zip(documents, archive)
+            return archive.getvalue()
+
+        try:
+            st.download_button(
+                label=f"📦 Download all {len(documents)} posts (ZIP)",
+                data=cached_export("zip", tuple(signatures), build_zip),
+                file_name="contentcrafter_posts.zip",
+                mime="application/zip"
+            )
+        except Exception as e:
+            st.error(f"⚠️ ZIP Export Failed: {e}")
 
 def main():
     """
     ContentCrafter AI — Final Streamlit App
 
     ✅ Supports: [Insert image here: ...], (Image: ...), (Infographic: ...)
-    ✅ Inline image rendering in UI and DOCX
+    ✅ Posts are parsed into a document model that both the UI and the DOCX/ZIP export render
     ✅ Uses RTX 4060 via torch.float16 if available
+    ✅ Stable Diffusion runs in a background worker process; text renders first, images fill in
+    ✅ Drafts get fast preview images, the final post (and DOCX) full-quality ones
     ✅ Handles image fallback, CUDA OOM, unsupported formats (GIFs/videos)
+    ✅ Results, images and DOCX/ZIP files are kept in session state, so reruns (downloads,
+       sidebar buttons) redraw instantly; each topic can be regenerated on its own
     """
 
     load_dotenv()
-    hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
-
-    generate_image = lambda prompt: "<!-- Image disabled -->"
-    try:
-        from diffusers import StableDiffusionPipeline
-        from transformers import logging as hf_logging
-        from PIL import Image
-        from huggingface_hub import login
-
-        hf_logging.set_verbosity_error()
-        login(token=hf_token, add_to_git_credential=False)
-
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        pipe = StableDiffusionPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            torch_dtype=torch.float16 if device.type == "cuda" else torch.float32,
-            safety_checker=None,
-            use_safetensors=True,
-            low_cpu_mem_usage=False
-        ).to(device)
-
-        print(f"✅ Stable Diffusion ready on {device.type.upper()}")
-
-        def generate_image(prompt):
-            try:
-                prompt = prompt.strip()[:150]
-                with torch.no_grad():
-                    image = pipe(prompt, num_inference_steps=30, guidance_scale=7.5).images[0]
-                buf = io.BytesIO()
-                image.save(buf, format="PNG")
-                return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
-            except torch.cuda.OutOfMemoryError:
-                pipe.to("cpu")
-                with torch.no_grad():
-                    image = pipe(prompt, num_inference_steps=20, guidance_scale=7.5).images[0]
-                buf = io.BytesIO()
-                image.save(buf, format="PNG")
-                return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
-            except Exception as e:
-                print(f"[Image Error] {prompt}: {e}")
-                return f"<!-- Image failed: {e} -->"
-
-    except Exception as e:
-        print(f"[Image pipeline fallback] {e}")
 
     st.set_page_config(page_title="ContentCrafter AI", page_icon="🧠", layout="wide")
+    images = get_image_worker()
     st.title("🧠 ContentCrafter AI")
     st.subheader("Generate intelligent blog content + images")
+    render_image_controls(images)
 
     topic_input = st.text_area(
         "📝 Enter one or more topics (comma or line-separated):",
@@ -81,86 +260,22 @@ def main():
             return
 
         topics = [t.strip() for t in topic_input.replace("\n", ",").split(",") if t.strip()]
-        agent = ContentChainAgent(model_name="gemini-1.5-flash")
+        agent = get_chain_agent("gemini-1.5-flash")
 
-        with st.spinner("Generating content..."):
-            results = agent.run_chain(",".join(topics))
+        results = stream_results(agent, topics)
+        st.session_state["results"] = results
+        st.session_state.pop("exports", None)
+        submit_run_images(images, results)
 
-        for topic, output in results.items():
-            st.markdown(f"## 🧠 Topic: `{topic}`")
-            if "error" in output:
-                st.error(output["error"])
-                continue
+    results = st.session_state.get("results", {})
+    regenerate = st.session_state.pop("regenerate", None)
+    if regenerate in results:
+        agent = get_chain_agent("gemini-1.5-flash")
+        results.update(stream_results(agent, [regenerate], regenerate=True))
+        submit_run_images(images, results)
 
-            blog_title = output.get("blog_title", topic)
-            drafts = {
-                "Original Draft": output.get("initial_draft", ""),
-                "Editor Feedback": output.get("feedback", ""),
-                "Improved Draft": output.get("blog_post", ""),
-                "Structural Feedback": output.get("structural_feedback", ""),
-                "Second Draft": output.get("second_draft", ""),
-                "Final Post": output.get("edited_post", "")
-            }
-
-            st.markdown("### 📌 Content Plan")
-            st.code(output.get("plan", ""), language="markdown")
-
-            def render_with_images(text, label):
-                def embed(prompt):
-                    if "video" in prompt.lower() or "gif" in prompt.lower():
-                        st.warning(f"⚠️ Skipping video/GIF: {prompt}")
-                        return f"⚠️ Video/GIF not supported: {prompt}"
-                    img_url = generate_image(prompt)
-                    return f'<img src="{img_url}" alt="{prompt}" width="300">' if img_url.startswith("data:image") else f"⚠️ Failed: {prompt}"
-
-                html = re.sub(r"\[Insert image here: (.*?)\]", lambda m: embed(m.group(1)), text)
-                html = re.sub(r"\(Infographic: (.*?)\)", lambda m: embed(m.group(1)), html)
-                html = re.sub(r"\(Image: (.*?)\)", lambda m: embed(m.group(1)), html)
-                html = re.sub(r"\[Insert short video or animated GIF here: (.*?)\]", lambda m: embed(m.group(1)), html)
-                html = re.sub(r"\s*\n", " ", html)
-                st.markdown(f"### {label}")
-                st.markdown(html, unsafe_allow_html=True)
-                return html
-
-            for label, content in drafts.items():
-                if label in ["Original Draft", "Editor Feedback", "Structural Feedback"]:
-                    st.markdown(f"### {label}")
-                    st.code(content, language="markdown")
-                else:
-                    drafts[label] = render_with_images(content, label)
-
-            try:
-                doc = Document()
-                doc.add_heading(blog_title, 0)
-                final_html = drafts["Final Post"]
-                for line in final_html.split("<img"):
-                    if "src=" in line:
-                        try:
-                            b64 = re.search(r'src="data:image/png;base64,(.*?)"', line).group(1)
-                            img_data = base64.b64decode(b64)
-                            with io.BytesIO() as img_io:
-                                img_io.write(img_data)
-                                img_io.seek(0)
-                                doc.add_picture(img_io, width=Inches(4))
-                        except Exception as e:
-                            doc.add_paragraph(f"[Image failed: {e}]")
-                    else:
-                        clean = re.sub(r"<.*?>", "", line).strip()
-                        if clean:
-                            doc.add_paragraph(clean)
-
-                out_io = io.BytesIO()
-                doc.save(out_io)
-                out_io.seek(0)
-                st.download_button(
-                    label=f"💾 Download DOCX for '{topic}'",
-                    data=out_io.read(),
-                    file_name=f"{blog_title.replace(' ', '_')}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-
-            except Exception as e:
-                st.error(f"⚠️ DOCX Export Failed: {e}")
+    if results:
+        render_results(images, results, st.session_state["image_job"])
 
     st.markdown("---")
     st.caption("Built for the Google Cloud Agent Hackathon")
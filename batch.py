@@ -0,0 +1,302 @@
+"""
+batch.py
+
+Headless batch runner for ContentCrafter AI.
+
+Reads topics from a file or stdin (CSV, JSONL or plain text), runs them through
+ContentChainAgent with bounded concurrency and appends one JSON line per topic to the
+output as soon as that topic finishes, so a crash or Ctrl-C never loses finished work.
+Input is read lazily, so thousands of topics never sit in memory at once. Repeated and
+near-duplicate topics (utils/topic_clusters.py) run once; the other members get their own
+output line with the shared result and "duplicate_of". A throughput summary is printed at
+the end.
+
+Input formats:
+    CSV    a "topic" column (or the first column); other columns are copied to the output
+    JSONL  {"topic": "...", ...} objects (extra keys are copied) or bare JSON strings
+    text   one topic per line
+
+🔁 Example Usage:
+
+    python batch.py topics.csv -o results.jsonl --concurrency 8
+    cat topics.jsonl | python batch.py - --format jsonl -o results.jsonl
+    CONTENTCRAFTER_BACKEND=fake python batch.py topics.txt -o /tmp/out.jsonl
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from agents.chain_agent import DEFAULT_MAX_WORKERS, ContentChainAgent
+from agents.events import DONE, ERROR
+from utils.metrics import get_metrics, percentile
+from utils.topic_clusters import DEFAULT_DEDUPE_THRESHOLD, TopicIndex
+
+FORMATS = ("auto", "csv", "jsonl", "text")
+# Finished results kept for fanning out to near-duplicates that arrive later in the input
+SHARED_RESULT_WINDOW = 256
+
+
+def detect_format(path: str, first_line: str) -> str:
+    """
+    Picks the input format from the file extension, or from the first line for stdin/unknown extensions.
+    """
+    extension = os.path.splitext(path)[1].lower() if path != "-" else ""
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    if extension == ".txt":
+        return "text"
+    stripped = first_line.lstrip()
+    if stripped.startswith("{") or stripped.startswith('"'):
+        return "jsonl"
+    if first_line.strip().lower().split(",")[0].strip('"') == "topic":
+        return "csv"
+    return "text"
+
+
+def read_topics(stream, fmt: str = "auto", path: str = "-"):
+    """
+    Yields {"topic": ..., **extra fields} records from a text stream, skipping blank topics.
+
+    Raises:
+        ValueError: A JSONL line is not valid JSON or has no topic.
+    """
+    first_line = stream.readline()
+    if fmt == "auto":
+        fmt = detect_format(path, first_line)
+    lines = _chain([first_line], stream)
+
+    if fmt == "csv":
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [name.strip() for name in header]
+        if "topic" not in [name.lower() for name in columns]:
+            # No header row: the first column is the topic
+            yield from _topic_records([header], ["topic"])
+            columns = ["topic"] + columns[1:]
+        else:
+            columns = ["topic" if name.lower() == "topic" else name for name in columns]
+        yield from _topic_records(reader, columns)
+    elif fmt == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {number}: invalid JSON ({e})") from None
+            record = value if isinstance(value, dict) else {"topic": value}
+            if not isinstance(record.get("topic"), str):
+                raise ValueError(f"Line {number}: no \"topic\" string")
+            if record["topic"].strip():
+                yield {**record, "topic": record["topic"].strip()}
+    else:
+        for line in lines:
+            if line.strip():
+                yield {"topic": line.strip()}
+
+
+def run_topic(agent: ContentChainAgent, topic: str) -> dict:
+    """
+    Runs one topic quietly (no step-by-step printing) and returns its result dict.
+    """
+    result = None
+    for event in agent.stream_single_chain(topic):
+        if event.kind in (DONE, ERROR):
+            result = event.data
+    return result if result is not None else {"error": f"❌ Topic '{topic}' produced no result"}
+
+
+def run_batch(records, output, agent: ContentChainAgent, concurrency: int = DEFAULT_MAX_WORKERS,
+              dedupe: bool = True, progress=None, dedupe_threshold: float = DEFAULT_DEDUPE_THRESHOLD) -> dict:
+    """
+    Runs every record's topic and appends a JSON line per topic to output as it finishes.
+
+    Args:
+        records (iterable): {"topic": ..., ...} records (see read_topics).
+        output (file): Text stream the JSON lines are appended to (flushed after every line).
+        agent (ContentChainAgent): The agent that runs the chain.
+        concurrency (int): Maximum number of topics in flight.
+        dedupe (bool): Run repeated and near-duplicate topics once and share the result.
+        progress (file, optional): Stream for one progress line per finished topic.
+        dedupe_threshold (float, optional): Minimum similarity (0–1) for topics to share a run.
+
+    Returns:
+        dict: Throughput summary (topics, ok, errors, shared, elapsed_s, topics_per_min, p50_s, p95_s, ...).
+    """
+    concurrency = max(1, concurrency)
+    metrics = get_metrics()
+    mark = metrics.mark()
+    index = TopicIndex(dedupe_threshold) if dedupe else None
+    # Representative topic → members waiting on it / its finished result (a bounded window)
+    waiting, finished_results = defaultdict(list), OrderedDict()
+    latencies, counts = [], {"ok": 0, "errors": 0, "shared": 0}
+    start = time.perf_counter()
+
+    def timed_run(topic):
+        started = time.perf_counter()
+        try:
+            return run_topic(agent, topic), time.perf_counter() - started
+        except Exception as e:
+            return {"error": f"❌ Topic '{topic}' failed: {type(e).__name__}: {e}"}, time.perf_counter() - started
+
+    def write(record, result, elapsed, **extra):
+        failed = "error" in result
+        line = {
+            **record,
+            "status": "error" if failed else "ok",
+            "elapsed_s": round(elapsed, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **extra,
+            **({"error": result["error"]} if failed else {"result": result}),
+        }
+        output.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+        output.flush()
+
+    def share(record, representative, similarity, result):
+        counts["shared"] += 1
+        write(record, result, 0.0, duplicate_of=representative, similarity=similarity)
+        if progress is not None:
+            print(f"🔗 {record['topic']} → '{representative}' (similarity {similarity:.2f})", file=progress, flush=True)
+
+    def finish(future, record):
+        result, elapsed = future.result()
+        failed = "error" in result
+        counts["errors" if failed else "ok"] += 1
+        latencies.append(elapsed)
+        write(record, result, elapsed)
+        if progress is not None:
+            done = counts["ok"] + counts["errors"]
+            mark_text = "❌" if failed else "✅"
+            print(f"{mark_text} [{done}] {record['topic']} ({elapsed:.1f}s)", file=progress, flush=True)
+        if index is None:
+            return
+        topic = record["topic"]
+        for member, similarity in waiting.pop(topic, ()):
+            share(member, topic, similarity, result)
+        finished_results[topic] = result
+        if len(finished_results) > SHARED_RESULT_WINDOW:
+            evicted, _ = finished_results.popitem(last=False)
+            index.discard(evicted)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        in_flight = {}
+        for record in records:
+            match = index.match(record["topic"]) if index is not None else None
+            if match is not None:
+                representative, similarity = match
+                if representative in finished_results:
+                    share(record, representative, similarity, finished_results[representative])
+                else:
+                    waiting[representative].append((record, similarity))
+                continue
+            # Bounded read-ahead: only a couple of topics per worker are ever queued
+            while len(in_flight) >= concurrency * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future, in_flight.pop(future))
+            in_flight[pool.submit(timed_run, record["topic"])] = record
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future, in_flight.pop(future))
+
+    elapsed = time.perf_counter() - start
+    calls = [r for r in metrics.records_since(mark) if r["kind"] == "llm_call"]
+    finished = counts["ok"] + counts["errors"]
+    return {
+        "topics": finished,
+        **counts,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "topics_per_min": round(finished / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 2),
+        "p95_s": round(percentile(latencies, 95), 2),
+        "llm_calls": len(calls),
+        "cache_hits": sum(1 for r in calls if r.get("cache_hit")),
+        "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in calls),
+        "response_tokens": sum(r.get("response_tokens", 0) for r in calls),
+    }
+
+
+def format_batch_summary(summary: dict) -> str:
+    return (
+        f"📊 Batch summary: {summary['topics']} topic(s) — {summary['ok']} ok, {summary['errors']} failed, "
+        f"{summary['shared']} duplicate(s) shared\n"
+        f"⏱️ {summary['elapsed_s']:.1f}s total, {summary['topics_per_min']:.1f} topics/min at concurrency "
+        f"{summary['concurrency']} (p50 {summary['p50_s']:.1f}s, p95 {summary['p95_s']:.1f}s per topic)\n"
+        f"🔢 {summary['llm_calls']} LLM calls ({summary['cache_hits']} cached), "
+        f"{summary['prompt_tokens']} prompt / {summary['response_tokens']} response tokens"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run ContentCrafter AI over a file of topics, headless.")
+    parser.add_argument("input", help="Topics file (CSV, JSONL or text), or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to append results to (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, default="auto", help="Input format (default: detect)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_WORKERS, help="Topics processed at once")
+    parser.add_argument("--model", default="gemini-1.5-flash", help="Gemini model name")
+    parser.add_argument("--keep-duplicates", action="store_true", help="Run repeated and near-duplicate topics separately")
+    parser.add_argument("--dedupe-threshold", type=float, default=DEFAULT_DEDUPE_THRESHOLD,
+                        help="Similarity (0–1) at which topics share one run")
+    parser.add_argument("--summary-json", help="Also write the throughput summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    # With results on stdout, progress and the summary go to stderr
+    report = sys.stderr if output is sys.stdout else sys.stdout
+    try:
+        # Keep stray prints (agents, image pipeline) out of JSONL written to stdout
+        with contextlib.redirect_stdout(sys.stderr) if output is sys.stdout else contextlib.nullcontext():
+            agent = ContentChainAgent(model_name=args.model)
+            summary = run_batch(read_topics(source, args.format, args.input), output, agent,
+                                concurrency=args.concurrency, dedupe=not args.keep_duplicates, progress=report,
+                                dedupe_threshold=args.dedupe_threshold)
+    except ValueError as e:
+        print(f"⚠️ Bad input: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrupted — finished topics are already in the output.", file=sys.stderr)
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(format_batch_summary(summary), file=report)
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["topics"] and not summary["ok"] else 0
+
+
+def _topic_records(rows, columns: list):
+    for row in rows:
+        if not row:
+            continue
+        record = {name: value for name, value in zip(columns, row) if name}
+        topic = (record.get("topic") or "").strip()
+        if topic:
+            yield {**record, "topic": topic}
+
+
+def _chain(first: list, stream):
+    yield from first
+    yield from stream
+
+
+if __name__ == "__main__":
+    sys.exit(main())
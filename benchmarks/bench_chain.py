@@ -0,0 +1,125 @@
+"""
+bench_chain.py
+
+Offline end-to-end benchmark for ContentChainAgent using the fake backend (utils/backends.py).
+
+For every (batch size, concurrency) combination it runs a batch of topics through the
+full pipeline and reports throughput, per-topic latency (p50 / p95, from a topic's first
+event to its result, so time spent queued behind other topics is not counted), LLM calls
+and peak Python memory. Every case gets a fresh agent and backend, so no case reuses
+another's validator verdicts. No API key or network access is needed.
+
+🔁 Example Usage:
+
+    python -m benchmarks.bench_chain --batch-sizes 1,5,20 --concurrency 1,4,8 --latency-ms 200
+    python -m benchmarks.bench_chain --error-rate 0.05 --json results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# The benchmark measures the pipeline itself: no response cache, checkpoints or quota pacing
+os.environ.setdefault("CONTENTCRAFTER_CACHE_DISABLED", "1")
+os.environ.setdefault("CONTENTCRAFTER_CHECKPOINTS_DISABLED", "1")
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.chain_agent import ContentChainAgent  # noqa: E402
+from agents.events import DONE, ERROR  # noqa: E402
+from utils.backends import FakeBackend  # noqa: E402
+from utils.metrics import get_metrics, percentile  # noqa: E402
+
+TOPICS = [
+    "AI in Education", "Space Farming on Mars", "Quantum Computing for Beginners", "Urban Beekeeping Basics",
+    "Remote Work Productivity", "Ocean Plastic Cleanup", "Electric Vehicle Batteries", "Mindful Leadership",
+    "Vertical Farming Economics", "Cybersecurity for Small Businesses", "Sustainable Fashion Trends",
+    "Personal Finance for Students", "3D Printed Housing", "Gut Health and Nutrition", "Smart City Traffic",
+]
+
+
+def make_topics(count: int) -> list:
+    """
+    Returns count distinct topics, cycling through TOPICS with a numeric suffix.
+    """
+    return [TOPICS[i % len(TOPICS)] + (f" Part {i // len(TOPICS) + 1}" if i >= len(TOPICS) else "") for i in range(count)]
+
+
+def run_case(agent: ContentChainAgent, batch_size: int, concurrency: int) -> dict:
+    """
+    Runs one batch and returns its measurements.
+    """
+    topics = make_topics(batch_size)
+    metrics = get_metrics()
+    mark = metrics.mark()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    started, latencies, errors = {}, [], 0
+    for event in agent.stream_chain(",".join(topics), max_workers=concurrency):
+        now = time.perf_counter()
+        started.setdefault(event.topic, now)
+        if event.kind in (DONE, ERROR):
+            latencies.append(now - started[event.topic])
+            errors += event.kind == ERROR
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = [r for r in metrics.records_since(mark) if r["kind"] == "llm_call"]
+    return {
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "topics_per_s": round(batch_size / elapsed, 3) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "errors": errors,
+        "llm_calls": len(calls),
+        "calls_per_topic": round(len(calls) / batch_size, 2),
+        "peak_mem_mb": round(peak / 1e6, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline ContentChainAgent benchmark (fake Gemini backend).")
+    parser.add_argument("--batch-sizes", default="1,5,20", help="Comma-separated batch sizes.")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated max_workers values.")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Median fake call latency.")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="Log-normal latency spread.")
+    parser.add_argument("--words", type=int, default=800, help="Median generated post length.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a fake 429 per call.")
+    parser.add_argument("--edit-change-rate", type=float, default=0.05, help="Fraction of words each edit changes.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    def make_agent():
+        # Fresh per case: a shared agent would answer later cases' validations from its verdict cache
+        backend = FakeBackend(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, words=args.words,
+                              error_rate=args.error_rate, edit_change_rate=args.edit_change_rate, seed=args.seed)
+        return ContentChainAgent(backend=backend)
+
+    results = []
+    columns = ["batch_size", "concurrency", "elapsed_s", "topics_per_s", "p50_s", "p95_s", "errors",
+               "calls_per_topic", "peak_mem_mb"]
+    print(" ".join(f"{c:>15}" for c in columns))
+    for batch_size in [int(v) for v in args.batch_sizes.split(",")]:
+        for concurrency in [int(v) for v in args.concurrency.split(",")]:
+            result = run_case(make_agent(), batch_size, concurrency)
+            results.append(result)
+            print(" ".join(f"{result[c]:>15}" for c in columns), flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
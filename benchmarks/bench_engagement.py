@@ -0,0 +1,98 @@
+"""
+bench_engagement.py
+
+Benchmark for engagement scoring: the local feature scorer (utils/engagement.py) over large
+batches of posts, and how many model calls "auto" mode still makes for borderline scores
+(against the fake backend, so no API key is needed).
+
+🔁 Example Usage:
+
+    python -m benchmarks.bench_engagement --posts 100,1000 --words 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("CONTENTCRAFTER_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("GEMINI_TPM", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.engagement_predictor import EngagementPredictorAgent  # noqa: E402
+from benchmarks.bench_placeholders import make_post  # noqa: E402
+from utils.backends import FakeBackend  # noqa: E402
+from utils.engagement import score_posts  # noqa: E402
+from utils.metrics import get_metrics  # noqa: E402
+
+
+def make_posts(count: int, words: int, seed: int) -> list:
+    """
+    Returns count posts of varying length; about half end with a call to action.
+    """
+    rng = random.Random(seed)
+    posts = []
+    for _ in range(count):
+        post = make_post(rng, max(50, int(rng.uniform(0.2, 2.2) * words)), placeholder_every=200)
+        if rng.random() < 0.5:
+            post += "\n\nWhat do you think? Subscribe and share this post with your team."
+        posts.append(post)
+    return posts
+
+
+def run_case(agent: EngagementPredictorAgent, count: int, words: int, seed: int) -> dict:
+    posts = make_posts(count, words, seed)
+
+    start = time.perf_counter()
+    local = score_posts(posts)
+    local_s = time.perf_counter() - start
+
+    mark = get_metrics().mark()
+    start = time.perf_counter()
+    results = agent.predict_engagement_batch(posts)
+    auto_s = time.perf_counter() - start
+    calls = [r for r in get_metrics().records_since(mark) if r["kind"] == "llm_call"]
+
+    scores = [r["score"] for r in local]
+    return {
+        "posts": count,
+        "local_ms": round(local_s * 1000, 2),
+        "posts_per_s": round(count / local_s) if local_s else 0,
+        "auto_ms": round(auto_s * 1000, 2),
+        "llm_calls": len(calls),
+        "llm_share": round(sum(r["method"] == "llm" for r in results) / count, 3),
+        "mean_score": round(sum(scores) / count, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engagement scoring benchmark (local scorer + fake backend).")
+    parser.add_argument("--posts", default="100,1000", help="Comma-separated batch sizes.")
+    parser.add_argument("--words", type=int, default=900, help="Median post length.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Median fake call latency.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    agent = EngagementPredictorAgent("", backend=FakeBackend(latency_ms=args.latency_ms, seed=args.seed), mode="auto")
+
+    results = []
+    columns = ["posts", "local_ms", "posts_per_s", "auto_ms", "llm_calls", "llm_share", "mean_score"]
+    print(" ".join(f"{c:>12}" for c in columns))
+    for count in [int(v) for v in args.posts.split(",")]:
+        result = run_case(agent, count, args.words, args.seed)
+        results.append(result)
+        print(" ".join(f"{result[c]:>12}" for c in columns), flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
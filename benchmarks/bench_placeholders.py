@@ -0,0 +1,145 @@
+"""
+bench_placeholders.py
+
+Micro-benchmark for placeholder extraction (utils/placeholders.py) on large multi-topic outputs.
+
+It builds a synthetic batch (every topic contributes four drafts, like a real chain result)
+with image, infographic and video placeholders, then times:
+
+    tokenize         the single-pass tokenizer
+    legacy_regex     the previous approach: one finditer pass per placeholder pattern, then
+                     four re.sub passes and a whitespace collapse to render each draft
+    collect_prompts  collect_image_prompts over the whole batch (what the UI submits)
+    build_document   parsing every final post into the document model (UI / DOCX)
+
+🔁 Example Usage:
+
+    python -m benchmarks.bench_placeholders --topics 50,200 --words 1500
+    python -m benchmarks.bench_placeholders --repeat 20 --json placeholders.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.document import build_document  # noqa: E402
+from utils.placeholders import collect_image_prompts, tokenize  # noqa: E402
+
+DRAFT_KEYS = ("initial_draft", "blog_post", "second_draft", "edited_post")
+WORDS = ("learning", "students", "data", "future", "systems", "design", "energy", "cities", "health", "tools",
+         "growth", "models", "teams", "markets", "science", "policy", "community", "impact", "research", "trends")
+PLACEHOLDERS = (
+    "[Insert image here: {}]", "(Image: {})", "(Infographic: {})", "[Insert short video or animated GIF here: {}]",
+)
+
+_LEGACY_PATTERNS = [
+    re.compile(r"\[Insert image here: (.*?)\]"),
+    re.compile(r"\(Infographic: (.*?)\)"),
+    re.compile(r"\(Image: (.*?)\)"),
+    re.compile(r"\[Insert short video or animated GIF here: (.*?)\]"),
+]
+
+
+def make_post(rng: random.Random, words: int, placeholder_every: int) -> str:
+    """
+    Returns a markdown post of about `words` words with a placeholder every `placeholder_every` words.
+    """
+    lines, paragraph = ["# " + " ".join(rng.choices(WORDS, k=4)).title()], []
+    for i in range(1, words + 1):
+        paragraph.append(rng.choice(WORDS))
+        if i % placeholder_every == 0:
+            paragraph.append(rng.choice(PLACEHOLDERS).format(" ".join(rng.choices(WORDS, k=5))))
+        if i % 80 == 0:
+            lines.append(" ".join(paragraph))
+            paragraph = []
+            if i % 400 == 0:
+                lines.append("## " + " ".join(rng.choices(WORDS, k=3)).title())
+    lines.append(" ".join(paragraph))
+    return "\n\n".join(lines)
+
+
+def make_batch(topics: int, words: int, placeholder_every: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    return {f"Topic {i}": {key: make_post(rng, words, placeholder_every) for key in DRAFT_KEYS} for i in range(topics)}
+
+
+def legacy_regex(text: str) -> str:
+    """
+    The pre-tokenizer pipeline: per-pattern scans to find prompts, then per-pattern substitution.
+    """
+    for pattern in _LEGACY_PATTERNS:
+        for match in pattern.finditer(text):
+            match.group(1)
+    for pattern in _LEGACY_PATTERNS:
+        text = pattern.sub(lambda m: f"<img alt='{m.group(1)}'>", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+def time_it(fn, repeat: int) -> float:
+    """
+    Best wall time of fn() over repeat runs.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_case(topics: int, words: int, placeholder_every: int, repeat: int, seed: int) -> dict:
+    batch = make_batch(topics, words, placeholder_every, seed)
+    texts = [text for output in batch.values() for text in output.values()]
+    size_mb = sum(len(text) for text in texts) / 1e6
+    spans = sum(len(tokenize(text)) for text in texts)
+
+    timings = {
+        "tokenize": time_it(lambda: [tokenize(text) for text in texts], repeat),
+        "legacy_regex": time_it(lambda: [legacy_regex(text) for text in texts], repeat),
+        "collect_prompts": time_it(lambda: collect_image_prompts(texts), repeat),
+        "build_document": time_it(
+            lambda: [build_document(topic, output["edited_post"]) for topic, output in batch.items()], repeat),
+    }
+    return {
+        "topics": topics,
+        "size_mb": round(size_mb, 2),
+        "spans": spans,
+        **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in timings.items()},
+        "tokenize_mb_s": round(size_mb / timings["tokenize"], 1) if timings["tokenize"] else 0.0,
+        "speedup": round(timings["legacy_regex"] / timings["tokenize"], 2) if timings["tokenize"] else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Placeholder tokenizer micro-benchmark.")
+    parser.add_argument("--topics", default="10,50,200", help="Comma-separated batch sizes.")
+    parser.add_argument("--words", type=int, default=1200, help="Words per draft.")
+    parser.add_argument("--placeholder-every", type=int, default=150, help="Words between placeholders.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = []
+    columns = ["topics", "size_mb", "spans", "tokenize_ms", "legacy_regex_ms", "speedup", "collect_prompts_ms",
+               "build_document_ms", "tokenize_mb_s"]
+    print(" ".join(f"{c:>18}" for c in columns))
+    for topics in [int(v) for v in args.topics.split(",")]:
+        result = run_case(topics, args.words, args.placeholder_every, args.repeat, args.seed)
+        results.append(result)
+        print(" ".join(f"{result[c]:>18}" for c in columns), flush=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
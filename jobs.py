@@ -0,0 +1,363 @@
+"""
+jobs.py
+
+Queue-based scale-out for ContentCrafter AI: submit topics to the durable job queue
+(utils/job_queue.py), run any number of worker processes against it, and inspect it.
+
+Workers lease one job at a time per thread, keep the lease alive while the pipeline runs,
+and write the result back to the queue. A job whose worker dies is picked up again once
+its lease expires; failed jobs are retried with backoff (rejected topics are not).
+All workers run on the machine that holds the queue file, which must be on a local
+filesystem (not NFS/SMB; see utils/job_queue.py). Ctrl-C hands in-flight jobs back to
+the queue; SIGTERM lets them finish first.
+
+The GEMINI_RPM / GEMINI_TPM budget (or --rpm / --tpm) is split evenly between the worker
+processes, and by default only as many processes are started as that budget keeps busy.
+
+🔁 Example Usage:
+
+    python jobs.py submit topics.csv
+    python jobs.py work --processes 4 --threads 2
+    python jobs.py work --rpm 60            # as many processes as 60 requests/minute keep busy
+    python jobs.py status
+    python jobs.py results -o results.jsonl
+    python jobs.py retry --all
+    python jobs.py purge --older-than 7
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from agents.chain_agent import ContentChainAgent
+from batch import FORMATS, read_topics, run_topic
+from utils.job_queue import (
+    COMPLETED, DEFAULT_MAX_ATTEMPTS, DEFAULT_QUEUE_PATH, DEFAULT_VISIBILITY_TIMEOUT, FAILED, STOPPED, JobQueue,
+)
+from utils.rate_limiter import DEFAULT_RPM, DEFAULT_TPM, RateLimiter, set_default_limiter
+from utils.topic_screen import topic_key
+
+# Workers heartbeat (and extend their lease) this often; silent for 3x as long means unhealthy
+HEARTBEAT_INTERVAL = 15.0
+# Model calls per minute one unthrottled job makes (about a dozen calls per topic, roughly a minute)
+CALLS_PER_MINUTE_PER_JOB = 12.0
+
+
+def default_processes(rpm: float, threads: int) -> int:
+    """
+    Worker processes to start when --processes is not given: enough for the request budget
+    to keep every job thread busy, capped at the CPU count. An unlimited budget (0) uses every CPU.
+    """
+    cpus = os.cpu_count() or 1
+    if not rpm:
+        return cpus
+    return max(1, min(cpus, int(rpm // (CALLS_PER_MINUTE_PER_JOB * max(1, threads)))))
+
+
+def keep_lease(queue: JobQueue, job, worker_id: str, visibility: float, done: threading.Event):
+    """
+    Extends the job's lease and the worker's heartbeat until done is set or the lease is lost.
+    """
+    while not done.wait(min(HEARTBEAT_INTERVAL, visibility / 3)):
+        queue.heartbeat(worker_id)
+        if not queue.extend(job, visibility):
+            print(f"⚠️ {worker_id} lost the lease on job {job.job_id}; its result will be discarded", flush=True)
+            return
+
+
+def worker_loop(queue: JobQueue, agent: ContentChainAgent, worker_id: str, stop: threading.Event, leases: dict,
+                visibility: float, poll: float, exit_when_empty: bool):
+    """
+    Leases and runs jobs until stop is set (or, with exit_when_empty, until the queue is drained).
+    """
+    last_heartbeat = 0.0
+    while not stop.is_set():
+        job = queue.lease(worker_id, visibility)
+        if job is None:
+            if exit_when_empty and queue.idle():
+                break
+            if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                queue.heartbeat(worker_id)
+                last_heartbeat = time.time()
+            stop.wait(poll)
+            continue
+
+        leases[worker_id] = job
+        done = threading.Event()
+        threading.Thread(target=keep_lease, args=(queue, job, worker_id, visibility, done), daemon=True).start()
+        started = time.perf_counter()
+        try:
+            result = run_topic(agent, job.topic)
+        except Exception as e:
+            result = {"error": f"❌ Topic '{job.topic}' failed: {type(e).__name__}: {e}", "retryable": True}
+        elapsed = time.perf_counter() - started
+        done.set()
+        leases.pop(worker_id, None)
+
+        attempt = f"attempt {job.attempts}/{job.max_attempts}"
+        if "error" in result:
+            retryable = result.get("retryable", True)
+            if queue.fail(job, result["error"], retryable=retryable, elapsed_s=elapsed):
+                retrying = retryable and job.attempts < job.max_attempts
+                print(f"{'🔁' if retrying else '❌'} [{worker_id}] job {job.job_id} {job.topic} "
+                      f"({elapsed:.1f}s, {attempt}{', will retry' if retrying else ''})", flush=True)
+        elif queue.complete(job, result, elapsed_s=elapsed):
+            print(f"✅ [{worker_id}] job {job.job_id} {job.topic} ({elapsed:.1f}s, {attempt})", flush=True)
+        last_heartbeat = time.time()
+    queue.heartbeat(worker_id, STOPPED)
+
+
+def work_process(index: int, options: dict):
+    """
+    Entry point of one worker process: options["threads"] worker loops sharing one agent
+    and this process's share of the rate budget.
+    """
+    # Before the agent exists: its model handles pick up the default limiter when created
+    set_default_limiter(RateLimiter(options["rpm"], options["tpm"]))
+    queue = JobQueue(options["db"])
+    agent = ContentChainAgent(model_name=options["model"])
+    host, pid = socket.gethostname(), os.getpid()
+    stop, leases = threading.Event(), {}
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    threads = []
+    for i in range(max(1, options["threads"])):
+        worker_id = f"{host}:{pid}:{i}"
+        queue.register_worker(worker_id, host, pid)
+        threads.append(threading.Thread(
+            target=worker_loop, name=f"job-worker-{index}-{i}", daemon=True,
+            args=(queue, agent, worker_id, stop, leases, options["visibility"], options["poll"],
+                  options["exit_when_empty"]),
+        ))
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for worker_id, job in list(leases.items()):
+            if queue.release(job):
+                print(f"↩️ [{worker_id}] handed job {job.job_id} back to the queue", flush=True)
+            queue.heartbeat(worker_id, STOPPED)
+        # The interrupted (daemon) threads die with the process; a late result is rejected by its lease token
+        return
+    queue.close()
+
+
+def submit_command(queue: JobQueue, args) -> int:
+    records = [{"topic": topic.strip()} for topic in args.topic if topic.strip()]
+    if args.input:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+        try:
+            records.extend(read_topics(source, args.format, args.input))
+        except ValueError as e:
+            print(f"⚠️ Bad input: {e}", file=sys.stderr)
+            return 2
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    if not records:
+        print("⚠️ Nothing to submit: give an input file or --topic.", file=sys.stderr)
+        return 2
+
+    pending = set() if args.keep_duplicates else {topic_key(topic) for topic in queue.pending_topics()}
+    jobs, duplicates = [], 0
+    for record in records:
+        key = topic_key(record["topic"])
+        if key in pending:
+            duplicates += 1
+            continue
+        pending.add(key)
+        jobs.append((record["topic"], {k: v for k, v in record.items() if k != "topic"}))
+    job_ids = queue.enqueue_many(jobs, max_attempts=args.max_attempts)
+    span = f" (IDs {job_ids[0]}–{job_ids[-1]})" if job_ids else ""
+    print(f"📥 Queued {len(job_ids)} job(s){span}, {duplicates} already pending or repeated.")
+    return 0
+
+
+def work_command(queue: JobQueue, args) -> int:
+    processes = args.processes or default_processes(args.rpm, args.threads)
+    if args.rpm:
+        # Every process needs at least one request a minute
+        processes = max(1, min(processes, int(args.rpm)))
+    options = {
+        "db": args.db, "model": args.model, "threads": args.threads, "visibility": args.visibility,
+        "poll": args.poll, "exit_when_empty": args.exit_when_empty,
+        # Each process gets an equal share of the budget, so together they stay within it
+        "rpm": args.rpm / processes, "tpm": args.tpm / processes,
+    }
+    queue.close()
+    if processes <= 1:
+        work_process(0, options)
+        return 0
+
+    # spawn, not fork: every worker builds its own agent, model clients and SQLite connections
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=work_process, args=(i, options), name=f"job-worker-{i}")
+               for i in range(processes)]
+    for process in workers:
+        process.start()
+    # Pass a SIGTERM sent to this process on, so every worker finishes its current job and stops
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in workers])
+    budget = f"{options['rpm']:g} RPM / {options['tpm']:g} TPM each" if args.rpm or args.tpm else "no rate limit"
+    print(f"👷 Started {len(workers)} worker process(es) × {max(1, args.threads)} thread(s) on {args.db} ({budget})")
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers got the same Ctrl-C and are handing their jobs back
+        for process in workers:
+            process.join()
+        print("\n⚠️ Workers stopped — unfinished jobs are back in the queue.", file=sys.stderr)
+        return 130
+    return 0 if all(process.exitcode == 0 for process in workers) else 1
+
+
+def worker_health(worker: dict, stale_after: float) -> str:
+    if worker["status"] == STOPPED:
+        return STOPPED
+    return "healthy" if worker["heartbeat_age_s"] <= stale_after else "unresponsive"
+
+
+def status_command(queue: JobQueue, args) -> int:
+    stats, in_flight, workers = queue.stats(), queue.in_flight(), queue.workers()
+    for worker in workers:
+        worker["health"] = worker_health(worker, args.stale_after)
+    if args.json:
+        print(json.dumps({"jobs": stats, "in_flight": in_flight, "workers": workers}, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"📊 Queue {args.db}: {stats['queued']} queued ({stats['ready']} ready, oldest {stats['oldest_ready_s']:.0f}s), "
+          f"{stats['leased']} in flight, {stats['completed']} completed, {stats['failed']} failed")
+    if in_flight:
+        print("\n⏳ In flight:")
+    for job in in_flight:
+        print(f"  job {job['job_id']:<6} {job['worker_id']:<28} {job['running_s']:>7.0f}s  "
+              f"expires in {job['expires_in_s']:.0f}s  attempt {job['attempts']}/{job['max_attempts']}  {job['topic']}")
+    active = [worker for worker in workers if worker["health"] != STOPPED or args.all_workers]
+    if active:
+        print("\n👷 Workers:")
+    for worker in active:
+        current = f"job {worker['current_job']}" if worker["current_job"] else "idle"
+        print(f"  {worker['worker_id']:<28} {worker['health']:<12} heartbeat {worker['heartbeat_age_s']:.0f}s ago  "
+              f"{current:<10} {worker['completed']} done, {worker['failed']} failed")
+    unhealthy = sum(worker["health"] == "unresponsive" for worker in workers)
+    if unhealthy:
+        print(f"\n⚠️ {unhealthy} worker(s) stopped responding; their jobs are re-leased once the leases expire.")
+    return 0
+
+
+def results_command(queue: JobQueue, args) -> int:
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        count = 0
+        for status in ([args.status] if args.status else [COMPLETED, FAILED]):
+            for job in queue.list_jobs(status):
+                failed = job["status"] == FAILED
+                line = {
+                    **job["payload"],
+                    "topic": job["topic"],
+                    "job_id": job["job_id"],
+                    "status": "error" if failed else "ok",
+                    "attempts": job["attempts"],
+                    "elapsed_s": round(job["elapsed_s"] or 0.0, 3),
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(job["updated_at"])),
+                    **({"error": job["error"]} if failed else {"result": job["result"]}),
+                }
+                output.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+                count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"📤 Wrote {count} result(s).", file=sys.stderr if output is sys.stdout else sys.stdout)
+    return 0
+
+
+def retry_command(queue: JobQueue, args) -> int:
+    if not (args.job_ids or args.all):
+        print("⚠️ Give job IDs or --all.", file=sys.stderr)
+        return 2
+    print(f"🔁 Queued {queue.retry(args.job_ids or None)} failed job(s) again.")
+    return 0
+
+
+def purge_command(queue: JobQueue, args) -> int:
+    if not (args.status or args.older_than is not None or args.all):
+        print("⚠️ Say what to purge: --status, --older-than or --all.", file=sys.stderr)
+        return 2
+    older_than = args.older_than * 86400 if args.older_than is not None else None
+    removed = queue.purge(status=args.status, older_than_seconds=older_than, stale_workers_seconds=older_than)
+    print(f"🧹 Purged {removed} finished job(s) and stopped workers.")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Submit topics to the job queue, run workers and inspect the queue.")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_PATH, help="Job queue database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="Queue topics from a file (like batch.py) or --topic")
+    submit_parser.add_argument("input", nargs="?", help="Topics file (CSV, JSONL or text), or - for stdin")
+    submit_parser.add_argument("--topic", action="append", default=[], help="A topic to queue (repeatable)")
+    submit_parser.add_argument("--format", choices=FORMATS, default="auto", help="Input format (default: detect)")
+    submit_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    submit_parser.add_argument("--keep-duplicates", action="store_true",
+                               help="Queue topics even if the same topic is already pending")
+    submit_parser.set_defaults(handler=submit_command)
+
+    work_parser = commands.add_parser("work", help="Run worker processes against the queue")
+    work_parser.add_argument("--processes", type=int,
+                             help="Worker processes (default: as many as --rpm keeps busy, at most one per CPU)")
+    work_parser.add_argument("--rpm", type=float, default=DEFAULT_RPM,
+                             help="Requests per minute shared by all processes (default: GEMINI_RPM; 0 = unlimited)")
+    work_parser.add_argument("--tpm", type=float, default=DEFAULT_TPM,
+                             help="Tokens per minute shared by all processes (default: GEMINI_TPM; 0 = unlimited)")
+    work_parser.add_argument("--threads", type=int, default=1, help="Jobs run at once per process")
+    work_parser.add_argument("--model", default="gemini-1.5-flash", help="Gemini model name")
+    work_parser.add_argument("--visibility", type=float, default=DEFAULT_VISIBILITY_TIMEOUT,
+                             help="Seconds a lease lasts without a heartbeat before the job is re-leased")
+    work_parser.add_argument("--poll", type=float, default=2.0, help="Seconds between polls of an empty queue")
+    work_parser.add_argument("--exit-when-empty", action="store_true", help="Stop once no job is queued or in flight")
+    work_parser.set_defaults(handler=work_command)
+
+    status_parser = commands.add_parser("status", help="Queue depth, in-flight jobs and worker health")
+    status_parser.add_argument("--json", action="store_true", help="Print the status as JSON")
+    status_parser.add_argument("--stale-after", type=float, default=3 * HEARTBEAT_INTERVAL,
+                               help="Seconds without a heartbeat before a worker counts as unresponsive")
+    status_parser.add_argument("--all-workers", action="store_true", help="Also list stopped workers")
+    status_parser.set_defaults(handler=status_command)
+
+    results_parser = commands.add_parser("results", help="Export finished jobs as JSONL (batch.py's format)")
+    results_parser.add_argument("-o", "--output", default="-", help="JSONL file to append results to (default: stdout)")
+    results_parser.add_argument("--status", choices=(COMPLETED, FAILED))
+    results_parser.set_defaults(handler=results_command)
+
+    retry_parser = commands.add_parser("retry", help="Queue failed jobs again")
+    retry_parser.add_argument("job_ids", nargs="*", type=int)
+    retry_parser.add_argument("--all", action="store_true", help="Retry every failed job")
+    retry_parser.set_defaults(handler=retry_command)
+
+    purge_parser = commands.add_parser("purge", help="Delete finished jobs")
+    purge_parser.add_argument("--status", choices=(COMPLETED, FAILED))
+    purge_parser.add_argument("--older-than", type=float, metavar="DAYS", help="Finished more than DAYS ago")
+    purge_parser.add_argument("--all", action="store_true", help="Delete every finished job")
+    purge_parser.set_defaults(handler=purge_command)
+
+    args = parser.parse_args(argv)
+    queue = JobQueue(args.db)
+    try:
+        return args.handler(queue, args)
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
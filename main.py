@@ -32,12 +32,14 @@ Tweet Hooks:
 
 ✅ Final Edited Blog Post:
 "Artificial Intelligence is revolutionizing education..."
+
+For unattended runs over a file of topics, use the headless batch runner (batch.py).
 """
 
 from agents.chain_agent import ContentChainAgent
-import google.api_core.exceptions
 from utils.logger import log_info
-import re  # Added to fix 're' not defined error
+from utils.placeholders import tokenize
+from utils.rate_limiter import ResourceExhausted
 
 def main():
     """
@@ -71,7 +73,7 @@ def main():
             if validation.startswith("VALID"):
                 break
             print(f"⚠️ Invalid topic '{topics[0]}': {validation}\nPlease enter specific, meaningful topics.")
-        except google.api_core.exceptions.ResourceExhausted as e:
+        except ResourceExhausted as e:
             print(
                 f"⚠️ API Quota Exceeded: {str(e)}\nPlease check your Google Cloud plan and billing details at "
                 f"https://ai.google.dev/gemini-api/docs/rate-limits, generate a new API key at https://aistudio.google.com/, "
@@ -95,6 +97,13 @@ def main():
             if "error" in output:
                 print(f"❌ Skipped due to error: {output['error']}")
                 log_info(f"Error for topic {topic}: {output['error']}")
+                # The chain reports failures (quota included) as results; only retryable ones are worth rerunning
+                if output.get("retryable"):
+                    if "ResourceExhausted" in output["error"]:
+                        print("⚠️ API quota exceeded. Check your plan at https://ai.google.dev/gemini-api/docs/rate-limits "
+                              "or lower GEMINI_RPM, then run this topic again.")
+                    else:
+                        print("🔁 This topic can be run again.")
                 continue
 
             print("🧠 Content Plan:\n", output["plan"])
@@ -105,22 +114,19 @@ def main():
             print("\n🏗️ Structural Feedback:\n", output["structural_feedback"])
             print("\n✅ Final Edited Blog Post:\n", output["edited_post"])
 
-            # Log and note image placeholders
+            # Log and note media placeholders
             for section in ["initial_draft", "blog_post", "second_draft", "edited_post"]:
-                if "Insert image here:" in output[section]:
-                    log_info(f"Image placeholder found in {section} for topic {topic}: {output[section]}")
-                    print(f"\n🌄 Note: Image placeholder detected in {section}. Add an image for: {re.search(r'Insert image here: (.*?)\n', output[section]).group(1)}")
+                for span in tokenize(output[section]):
+                    if not span.is_placeholder:
+                        continue
+                    log_info(f"{span.kind.capitalize()} placeholder found in {section} for topic {topic}: {span.prompt}")
+                    if span.unsupported:
+                        print(f"\n⚠️ Note: Video/GIF placeholder in {section} can't be generated: {span.prompt}")
+                    else:
+                        print(f"\n🌄 Note: {span.kind.capitalize()} placeholder detected in {section}. Add an image for: {span.prompt}")
 
             print("=" * 60)
 
-    except google.api_core.exceptions.ResourceExhausted as e:
-        print(
-            f"⚠️ API Quota Exceeded: {str(e)}\nPlease check your Google Cloud plan and billing details at "
-            f"https://ai.google.dev/gemini-api/docs/rate-limits, generate a new API key at https://aistudio.google.com/, "
-            f"or contact support before the June 24, 2025 deadline."
-        )
-        log_info(f"API Quota Exceeded during processing: {str(e)}")
-        return 1
     except Exception as e:
         print(f"⚠️ Error during content generation: {e}")
         log_info(f"General error during processing: {str(e)}")
@@ -0,0 +1,151 @@
+"""
+runs.py
+
+Command-line view of the stage checkpoint store (utils/checkpoints.py).
+
+Lists pipeline runs with their finished stages, shows a run's saved outputs, resumes
+interrupted or failed runs (finished stages are restored, not regenerated) and purges
+old runs.
+
+🔁 Example Usage:
+
+    python runs.py list --status failed
+    python runs.py show 3f2a9c1b
+    python runs.py resume --all -o resumed.jsonl
+    python runs.py purge --older-than 7
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+from agents.chain_agent import DEFAULT_MAX_WORKERS, ContentChainAgent
+from batch import format_batch_summary, run_batch
+from utils.checkpoints import ABORTED, COMPLETED, DEFAULT_CHECKPOINT_PATH, FAILED, RESUMABLE, RUNNING, CheckpointStore
+
+STATUSES = (RUNNING, COMPLETED, FAILED, ABORTED)
+
+
+def format_run(run: dict) -> str:
+    updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["updated_at"]))
+    line = (f"{run['run_id']}  {run['status']:<9} {updated}  attempts={run['attempts']}  "
+            f"stages={len(run['stages'])}  {run['topic']}")
+    if run["error"]:
+        line += f"\n    {run['error'].splitlines()[0]}"
+    return line
+
+
+def list_command(store: CheckpointStore, args) -> int:
+    runs = store.list_runs(args.status)
+    if not runs:
+        print("No checkpointed runs.")
+    for run in runs:
+        print(format_run(run))
+    return 0
+
+
+def show_command(store: CheckpointStore, args) -> int:
+    run = store.get_run(args.run_id)
+    if run is None:
+        print(f"⚠️ No single run matches '{args.run_id}'.", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(run, ensure_ascii=False, indent=2, default=str))
+        return 0
+    print(format_run(run))
+    for stage, outputs in run["outputs"].items():
+        print(f"\n♻️ {stage}")
+        for key, value in outputs.items():
+            text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+            print(f"  {key}: {text[:200]}{'…' if len(text) > 200 else ''}")
+    return 0
+
+
+def resume_command(store: CheckpointStore, args) -> int:
+    if args.all:
+        runs = [run for run in store.list_runs() if run["status"] in RESUMABLE]
+    else:
+        run = store.get_run(args.run_id) if args.run_id else None
+        if run is None:
+            print("⚠️ Give a run ID (or prefix) that matches one run, or --all.", file=sys.stderr)
+            return 2
+        runs = [run]
+    if not runs:
+        print("Nothing to resume.")
+        return 0
+
+    agent = ContentChainAgent(model_name=args.model, checkpoints=store)
+    stale = [run["run_id"] for run in runs if run["version"] != agent.pipeline_version]
+    if stale:
+        # A different pipeline/model would start these from scratch instead of resuming them
+        print(f"⚠️ {len(stale)} run(s) were made by a different pipeline version and will restart: "
+              f"{', '.join(stale)}", file=sys.stderr)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    report = sys.stderr if output is sys.stdout else sys.stdout
+    try:
+        records = ({"topic": run["topic"], "run_id": run["run_id"]} for run in runs)
+        # Keep stray prints (agents, image pipeline) out of JSONL written to stdout
+        with contextlib.redirect_stdout(sys.stderr) if output is sys.stdout else contextlib.nullcontext():
+            summary = run_batch(records, output, agent, concurrency=args.concurrency, progress=report)
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrupted — finished stages stay checkpointed.", file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(format_batch_summary(summary), file=report)
+    return 1 if summary["topics"] and not summary["ok"] else 0
+
+
+def purge_command(store: CheckpointStore, args) -> int:
+    if not (args.run_id or args.status or args.older_than is not None or args.all):
+        print("⚠️ Say what to purge: a run ID, --status, --older-than or --all.", file=sys.stderr)
+        return 2
+    older_than = args.older_than * 86400 if args.older_than is not None else None
+    removed = store.purge(run_id=args.run_id, status=args.status, older_than_seconds=older_than)
+    print(f"🧹 Purged {removed} run(s).")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="List, resume and purge checkpointed pipeline runs.")
+    parser.add_argument("--db", default=DEFAULT_CHECKPOINT_PATH, help="Checkpoint database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="List runs, newest first")
+    list_parser.add_argument("--status", choices=STATUSES)
+    list_parser.set_defaults(handler=list_command)
+
+    show_parser = commands.add_parser("show", help="Show a run's saved stage outputs")
+    show_parser.add_argument("run_id", help="Run ID or unique prefix")
+    show_parser.add_argument("--json", action="store_true", help="Print the full run as JSON")
+    show_parser.set_defaults(handler=show_command)
+
+    resume_parser = commands.add_parser("resume", help="Resume interrupted or failed runs")
+    resume_parser.add_argument("run_id", nargs="?", help="Run ID or unique prefix")
+    resume_parser.add_argument("--all", action="store_true", help="Resume every running/failed run")
+    resume_parser.add_argument("-o", "--output", default="-", help="JSONL file to append results to (default: stdout)")
+    resume_parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_WORKERS)
+    resume_parser.add_argument("--model", default="gemini-1.5-flash", help="Gemini model name")
+    resume_parser.set_defaults(handler=resume_command)
+
+    purge_parser = commands.add_parser("purge", help="Delete runs and their checkpoints")
+    purge_parser.add_argument("run_id", nargs="?", help="Run ID or prefix")
+    purge_parser.add_argument("--status", choices=STATUSES)
+    purge_parser.add_argument("--older-than", type=float, metavar="DAYS", help="Last updated more than DAYS ago")
+    purge_parser.add_argument("--all", action="store_true", help="Delete every run")
+    purge_parser.set_defaults(handler=purge_command)
+
+    args = parser.parse_args(argv)
+    store = CheckpointStore(args.db)
+    try:
+        return args.handler(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+backends.py
+
+Pluggable model backends for the agents.
+
+A backend turns a model name into an object with the Gemini-style
+generate_content(prompt, stream=False, **kwargs) method. GeminiBackend uses the real SDK;
+FakeBackend is a deterministic, offline stand-in that answers every agent prompt in the
+format that agent parses ("### Revised Blog Post:", "### Engagement Score:", "VALID", …)
+with configurable latency, response-size and error-rate distributions. It needs neither
+an API key nor the Google SDK, so benchmarks (benchmarks/bench_chain.py) run offline.
+
+The default backend is chosen with CONTENTCRAFTER_BACKEND ("gemini" or "fake").
+
+🔁 Example Usage:
+
+    backend = FakeBackend(latency_ms=200, error_rate=0.05, seed=1)
+    agent = ContentChainAgent(backend=backend)
+    agent.run_chain("AI in Education, Space Farming")
+"""
+
+import hashlib
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from utils.rate_limiter import ResourceExhausted
+
+
+class ModelBackend:
+    """
+    Interface every backend implements.
+    """
+
+    name = "base"
+
+    def configure(self, api_key: str):
+        """
+        Called once per API key before the first model is created.
+        """
+
+    def create_model(self, model_name: str):
+        """
+        Returns a model object exposing generate_content(prompt, stream=False, **kwargs).
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """
+    The real Google Generative AI SDK.
+    """
+
+    name = "gemini"
+
+    def configure(self, api_key: str):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+
+    def create_model(self, model_name: str):
+        import google.generativeai as genai
+        return genai.GenerativeModel(model_name)
+
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic offline backend. Identical prompts always produce identical responses
+    (for a given seed); latency and errors are drawn from the configured distributions.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, latency_sigma: float = 0.3, words: int = 600,
+                 words_sigma: float = 0.2, error_rate: float = 0.0, edit_change_rate: float = 0.05,
+                 chunk_words: int = 40, seed: int = 0):
+        """
+        Args:
+            latency_ms (float): Median latency of a call (log-normally distributed).
+            latency_sigma (float): Log-space standard deviation of the latency.
+            words (int): Median length of a generated blog post in words.
+            words_sigma (float): Log-space standard deviation of the post length.
+            error_rate (float): Probability that a call raises ResourceExhausted (a 429).
+            edit_change_rate (float): Fraction of words an edit/rewrite changes; low values make drafts converge.
+            chunk_words (int): Words per chunk for streamed responses.
+            seed (int): Makes the whole run reproducible.
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.words = words
+        self.words_sigma = words_sigma
+        self.error_rate = error_rate
+        self.edit_change_rate = edit_change_rate
+        self.chunk_words = chunk_words
+        self.seed = seed
+
+    def create_model(self, model_name: str):
+        return FakeModel(model_name, self)
+
+
+class FakeModel:
+    """
+    Gemini-compatible fake model produced by FakeBackend.
+    """
+
+    def __init__(self, model_name: str, backend: FakeBackend):
+        self.model_name = f"models/{model_name}"
+        self.backend = backend
+        # Calls so far per prompt; concurrent stages share the model, so the counts are locked
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        prompt = str(prompt)
+        digest = _digest(prompt)
+        with self._lock:
+            call = self._calls[digest] = self._calls.get(digest, 0) + 1
+        # Errors and latency vary per repeat of a prompt (not with thread timing); the content depends only on the prompt
+        call_rng = random.Random(f"{self.backend.seed}:{call}:{digest}")
+        if self.backend.error_rate and call_rng.random() < self.backend.error_rate:
+            time.sleep(self._latency(call_rng) / 4)
+            raise ResourceExhausted("429 Resource has been exhausted (fake backend). retry_delay { seconds: 1 }")
+
+        text = self._respond(prompt, random.Random(f"{self.backend.seed}:{digest}"))
+        usage = SimpleNamespace(
+            prompt_token_count=_tokens(prompt),
+            candidates_token_count=_tokens(text),
+            total_token_count=_tokens(prompt) + _tokens(text),
+        )
+        latency = self._latency(call_rng)
+        if not stream:
+            time.sleep(latency)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+        return self._stream(text, latency, usage)
+
+    def _stream(self, text: str, latency: float, usage):
+        words = text.split(" ")
+        step = max(1, self.backend.chunk_words)
+        chunks = [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+        for index, chunk in enumerate(chunks):
+            time.sleep(latency / len(chunks))
+            yield SimpleNamespace(text=chunk, usage_metadata=usage if index == len(chunks) - 1 else None)
+
+    def _latency(self, rng: random.Random) -> float:
+        if not self.backend.latency_ms:
+            return 0.0
+        return self.backend.latency_ms / 1000.0 * math.exp(rng.gauss(0, self.backend.latency_sigma))
+
+    def _respond(self, prompt: str, rng: random.Random) -> str:
+        # Up to the last matching quote on the line, so apostrophes inside a topic ("Kids' screen time") survive
+        topic = (_extract(prompt, r"topic[: ]+(['\"])(.+)\1") or _extract(prompt, r"title (['\"])(.+)\1")
+                 or "the topic")
+
+        if "content validation expert" in prompt:
+            if len(topic.split()) < 2:
+                return f"INVALID: '{topic}' is too vague. Add a specific angle, audience or context."
+            return "VALID"
+        if "expert content strategist" in prompt:
+            return (f"Blog Title: {topic} — What You Need to Know\n"
+                    f"YouTube Video Idea: \"{topic} explained in 10 minutes\"\n"
+                    f"Tweet Hooks:\n- \"{topic} is changing faster than you think.\"\n"
+                    f"- \"Three things nobody tells you about {topic}.\"\n- \"Is {topic} worth the hype?\"")
+        if "senior blog reviewer" in prompt:
+            return ("1. Strengthen the introduction with a concrete example.\n"
+                    "2. Add data to support the key benefits section.\n"
+                    "3. End the conclusion with a clear call to action.")
+        if "engagement expert" in prompt:
+            blog = prompt.split("--- Blog Post ---", 1)[-1]
+            score = 5 + min(3, blog.count("\n#")) + (1 if "call to action" in blog.lower() else 0)
+            return f"### Engagement Score: {min(score, 10)}\n### Analysis:\nLength and formatting look reasonable (fake backend)."
+        if "market research expert" in prompt:
+            return ("### Audience Profile\n**Demographics**: 25–45, professionals\n"
+                    f"**Interests**: {topic}, technology\n**Reading Goals**: practical overview")
+        if "[[SECTION:" in prompt:
+            blocks = re.findall(r"(\[\[SECTION:[\w-]+\]\]\n.*?\n\[\[END SECTION\]\])", prompt, re.DOTALL)
+            revised = "\n\n".join(self._mutate(block, rng) for block in blocks)
+            if "### Editor Feedback:" in prompt:
+                return f"### Revised Sections:\n{revised}\n\n### Editor Feedback:\nTightened the selected sections."
+            return revised
+        if "professional blog editor" in prompt:
+            draft = prompt.split("--- DRAFT BLOG POST ---", 1)[-1].split("Return your response", 1)[0].strip()
+            return (f"### Revised Blog Post:\n{self._mutate(draft, rng)}\n\n"
+                    "### Editor Feedback:\nImproved flow and tightened wording. The conclusion could be stronger.")
+        if "tone expert" in prompt:
+            draft = prompt.split("--- DRAFT ---", 1)[-1].split("Return in format", 1)[0].strip()
+            return f"### Refined Post:\n{self._mutate(draft, rng)}\n### Tone Feedback:\nWarmer, more confident tone."
+        if "--- Original Draft ---" in prompt:
+            draft = prompt.split("--- Original Draft ---", 1)[-1].split("Return the improved blog post only.", 1)[0].strip()
+            return self._mutate(draft, rng)
+        return self._blog_post(topic, rng)
+
+    def _blog_post(self, topic: str, rng: random.Random) -> str:
+        total_words = max(50, int(self.backend.words * math.exp(rng.gauss(0, self.backend.words_sigma))))
+        headings = ["Introduction", "Why It Matters", "Key Benefits", "Challenges", "Real-World Examples", "Conclusion"]
+        per_section = max(10, total_words // len(headings))
+        parts = [f"# {topic}"]
+        for index, heading in enumerate(headings):
+            body = " ".join(rng.choice(_VOCABULARY) for _ in range(per_section)).capitalize() + "."
+            parts.append(f"## {heading}\n{body}")
+            if index == 1:
+                parts.append(f"(Image: {topic} illustrated)")
+            if index == 3:
+                parts.append(f"[Insert image here: infographic about {topic}]")
+        parts.append("Ready to learn more? Subscribe and share this post — that's your call to action.")
+        return "\n\n".join(parts)
+
+    def _mutate(self, text: str, rng: random.Random) -> str:
+        """
+        Changes roughly edit_change_rate of the words in non-heading, non-marker lines.
+        """
+        lines = []
+        for line in text.split("\n"):
+            if line.startswith("#") or line.startswith("[[") or line.startswith("(") or line.startswith("[Insert"):
+                lines.append(line)
+                continue
+            words = line.split(" ")
+            for i in range(len(words)):
+                if words[i] and rng.random() < self.backend.edit_change_rate:
+                    words[i] = rng.choice(_VOCABULARY)
+            lines.append(" ".join(words))
+        return "\n".join(lines)
+
+
+_VOCABULARY = (
+    "learning data model students teachers future impact research insight practical example growth "
+    "innovation community strategy results evidence tools adoption design systems people value clear "
+    "simple powerful approach benefit challenge solution world change digital culture progress"
+).split()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _extract(text: str, pattern: str):
+    match = re.search(pattern, text)
+    return match.groups()[-1] if match else None
+
+
+_default_backend = None
+
+
+def get_default_backend() -> ModelBackend:
+    """
+    Returns the backend selected by CONTENTCRAFTER_BACKEND (defaults to Gemini).
+    """
+    global _default_backend
+    if _default_backend is None:
+        choice = os.getenv("CONTENTCRAFTER_BACKEND", "gemini").lower()
+        _default_backend = FakeBackend(latency_ms=float(os.getenv("CONTENTCRAFTER_FAKE_LATENCY_MS", "0"))) \
+            if choice == "fake" else GeminiBackend()
+    return _default_backend
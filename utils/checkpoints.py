@@ -0,0 +1,293 @@
+"""
+checkpoints.py
+
+Stage-level checkpoint store for the content pipeline.
+
+Every stage's outputs (plan, drafts, edits, feedback, scores) are saved to a small SQLite
+database as soon as the stage finishes, keyed by topic and pipeline version. If a run dies
+part-way (quota error, crash, Ctrl-C), running the same topic again restores the finished
+stages and resumes from the first incomplete one. Completed and aborted runs start fresh.
+
+Each attempt owns its run through an owner token (host, process ID and a random suffix).
+A run that is still RUNNING under a live owner — same host and that process still exists,
+or another host that saved within CONTENTCRAFTER_CHECKPOINT_LEASE seconds (default 900) —
+is taken: start() raises RunInProgress instead of sharing it, and a previous owner that
+lost its run can no longer write stages or status into it.
+
+The pipeline version (see ContentChainAgent.pipeline_version) covers the stage graph and
+the model, so checkpoints are never reused across a changed pipeline.
+
+Set CONTENTCRAFTER_CHECKPOINTS_DISABLED=1 to turn checkpointing off; runs.py lists,
+resumes and purges runs from the command line.
+
+🔁 Example Usage:
+
+    store = get_default_checkpoints()
+    run = store.start("AI in Education", version="3f2a…")   # run.completed → {stage: outputs}
+    run.save("plan", {"plan": "...", "blog_title": "..."})
+    run.finish("completed")
+    store.list_runs(status="failed")
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("CONTENTCRAFTER_CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3"))
+CHECKPOINTS_DISABLED = os.getenv("CONTENTCRAFTER_CHECKPOINTS_DISABLED", "").lower() in ("1", "true", "yes")
+
+# A RUNNING run whose owner has not saved for this long is considered abandoned
+LEASE_SECONDS = float(os.getenv("CONTENTCRAFTER_CHECKPOINT_LEASE", "900"))
+
+RUNNING, COMPLETED, FAILED, ABORTED = "running", "completed", "failed", "aborted"
+RESUMABLE = (RUNNING, FAILED)
+
+
+class RunInProgress(RuntimeError):
+    """
+    Raised by CheckpointStore.start when another live attempt owns the run.
+    """
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+class RunCheckpoint:
+    """
+    One topic's run: the stage outputs restored at start, and a handle to save new ones.
+    """
+
+    def __init__(self, store: "CheckpointStore", run_id: str, topic: str, version: str, completed: dict,
+                 owner: str = None):
+        self.store = store
+        self.run_id = run_id
+        self.topic = topic
+        self.version = version
+        self.completed = completed
+        self.owner = owner
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.completed)
+
+    def load(self) -> dict:
+        """
+        Returns {stage name: outputs} for the stages finished in earlier attempts.
+        """
+        return dict(self.completed)
+
+    def save(self, stage: str, outputs: dict):
+        self.store.save_stage(self.run_id, stage, outputs, owner=self.owner)
+
+    def finish(self, status: str, error: str = None):
+        self.store.set_status(self.run_id, status, error, owner=self.owner)
+
+
+class CheckpointStore:
+    """
+    SQLite-backed run/stage store. Safe to share across threads; SQLite's file locking
+    covers multiple processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        """
+        Args:
+            path (str): SQLite file location (":memory:" for a throwaway store).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT
+                )"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE runs ADD COLUMN owner TEXT")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, stage)
+                )"""
+            )
+
+    @staticmethod
+    def make_run_id(topic: str, version: str) -> str:
+        return hashlib.sha256(f"{normalize_topic(topic)}\x00{version}".encode("utf-8")).hexdigest()[:16]
+
+    def start(self, topic: str, version: str, resume: bool = True) -> RunCheckpoint:
+        """
+        Opens the run for (topic, version): an interrupted or failed run is resumed with its
+        finished stages, anything else (or resume=False) starts over.
+
+        Raises:
+            RunInProgress: If another live attempt is still running this topic.
+        """
+        run_id = self.make_run_id(topic, version)
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT status, owner, updated_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is not None and row[0] == RUNNING and _owner_alive(row[1], row[2], now):
+                raise RunInProgress(f"⏳ '{topic}' is already being generated by another run ({row[1]})")
+            if resume and row is not None and row[0] in RESUMABLE:
+                self._conn.execute(
+                    "UPDATE runs SET status = ?, error = NULL, attempts = attempts + 1, updated_at = ?, owner = ? "
+                    "WHERE run_id = ?",
+                    (RUNNING, now, owner, run_id),
+                )
+                stages = self._conn.execute("SELECT stage, outputs FROM stages WHERE run_id = ?", (run_id,)).fetchall()
+                completed = {stage: json.loads(outputs) for stage, outputs in stages}
+            else:
+                self._conn.execute("DELETE FROM stages WHERE run_id = ?", (run_id,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, topic, version, status, error, attempts, created_at, updated_at, owner) "
+                    "VALUES (?, ?, ?, ?, NULL, 1, ?, ?, ?)",
+                    (run_id, topic, version, RUNNING, now, now, owner),
+                )
+                completed = {}
+        return RunCheckpoint(self, run_id, topic, version, completed, owner)
+
+    def save_stage(self, run_id: str, stage: str, outputs: dict, owner: str = None):
+        """
+        Saves a finished stage. With owner, nothing is written once another attempt has taken the run.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            if not self._touch(run_id, owner, now):
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (run_id, stage, outputs, completed_at) VALUES (?, ?, ?, ?)",
+                (run_id, stage, json.dumps(outputs, ensure_ascii=False, default=str), now),
+            )
+
+    def set_status(self, run_id: str, status: str, error: str = None, owner: str = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?"
+                + (" AND owner = ?" if owner else ""),
+                (status, error, time.time(), run_id) + ((owner,) if owner else ()),
+            )
+
+    def _touch(self, run_id: str, owner: str, now: float) -> bool:
+        cursor = self._conn.execute(
+            "UPDATE runs SET updated_at = ? WHERE run_id = ?" + (" AND owner = ?" if owner else ""),
+            (now, run_id) + ((owner,) if owner else ()),
+        )
+        return cursor.rowcount > 0
+
+    def list_runs(self, status: str = None) -> list:
+        """
+        Returns runs (newest first) with their finished stage names.
+        """
+        query = ("SELECT run_id, topic, version, status, error, attempts, created_at, updated_at FROM runs"
+                 + (" WHERE status = ?" if status else "") + " ORDER BY updated_at DESC")
+        with self._lock:
+            rows = self._conn.execute(query, (status,) if status else ()).fetchall()
+            stages = {}
+            for run_id, stage in self._conn.execute("SELECT run_id, stage FROM stages ORDER BY completed_at"):
+                stages.setdefault(run_id, []).append(stage)
+        columns = ("run_id", "topic", "version", "status", "error", "attempts", "created_at", "updated_at")
+        return [{**dict(zip(columns, row)), "stages": stages.get(row[0], [])} for row in rows]
+
+    def get_run(self, run_id: str):
+        """
+        Returns one run (matched by full ID or unique prefix) with its stage outputs, or None.
+        """
+        matches = [run for run in self.list_runs() if run["run_id"].startswith(run_id)]
+        if len(matches) != 1:
+            return None
+        run = matches[0]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, outputs FROM stages WHERE run_id = ? ORDER BY completed_at", (run["run_id"],)
+            ).fetchall()
+        return {**run, "outputs": {stage: json.loads(outputs) for stage, outputs in rows}}
+
+    def purge(self, run_id: str = None, status: str = None, older_than_seconds: float = None) -> int:
+        """
+        Deletes runs matching every given filter (all runs when none is given). Returns the count.
+        """
+        clauses, params = [], []
+        if run_id:
+            clauses.append("run_id LIKE ?")
+            params.append(f"{run_id}%")
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if older_than_seconds is not None:
+            clauses.append("updated_at < ?")
+            params.append(time.time() - older_than_seconds)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock, self._conn:
+            run_ids = [row[0] for row in self._conn.execute(f"SELECT run_id FROM runs{where}", params)]
+            self._conn.executemany("DELETE FROM stages WHERE run_id = ?", [(r,) for r in run_ids])
+            self._conn.executemany("DELETE FROM runs WHERE run_id = ?", [(r,) for r in run_ids])
+        return len(run_ids)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _owner_alive(owner: str, updated_at: float, now: float) -> bool:
+    """
+    Whether the attempt that last owned a RUNNING run may still be working on it.
+    """
+    if now - updated_at > LEASE_SECONDS:
+        return False
+    host, _, rest = (owner or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        # Other hosts (and Windows, where os.kill would terminate the process) rely on the lease alone
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_checkpoints():
+    """
+    Returns the process-wide CheckpointStore, or None when checkpointing is disabled.
+    """
+    global _default_store
+    if CHECKPOINTS_DISABLED:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore()
+        return _default_store
@@ -0,0 +1,50 @@
+"""
+convergence.py
+
+Cheap signals for deciding whether another editor/writer refinement pass is worth an LLM call.
+
+🔁 Example Usage:
+
+    similarity = draft_similarity(previous_draft, revised_draft)   # 0.0 – 1.0
+    if has_converged(previous_draft, revised_draft, threshold=0.9):
+        ...  # stop refining
+"""
+
+import re
+from difflib import SequenceMatcher
+
+_HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def draft_similarity(previous: str, current: str) -> float:
+    """
+    Word-level diff ratio between two drafts (1.0 means identical).
+    """
+    if previous == current:
+        return 1.0
+    return SequenceMatcher(None, previous.split(), current.split(), autojunk=False).ratio()
+
+
+def section_stability(previous: str, current: str) -> float:
+    """
+    Jaccard overlap of the markdown headings of two drafts (1.0 means the outline did not change).
+    """
+    before = {heading.lower() for heading in _HEADING_PATTERN.findall(previous)}
+    after = {heading.lower() for heading in _HEADING_PATTERN.findall(current)}
+    if not before and not after:
+        return 1.0
+    return len(before & after) / len(before | after)
+
+
+def convergence_score(previous: str, current: str) -> float:
+    """
+    Combined signal: the lower of the text diff ratio and the outline stability.
+    """
+    return min(draft_similarity(previous, current), section_stability(previous, current))
+
+
+def has_converged(previous: str, current: str, threshold: float) -> bool:
+    """
+    True when a revision changed the draft so little that further passes are unlikely to help.
+    """
+    return convergence_score(previous, current) >= threshold
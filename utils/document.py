@@ -0,0 +1,114 @@
+"""
+document.py
+
+Structured document model for rendered blog posts.
+
+A post is parsed once into a Document: a title plus an ordered list of blocks (Heading,
+Paragraph, ImageRef). Images are held by reference, as a path into the image cache or as
+raw bytes, never as base64 strings. The Streamlit view (app.py) and the DOCX writer
+(utils/docx_export.py) both render from this model.
+
+🔁 Example Usage:
+
+    doc = build_document("Space Farming", final_post, image_paths)   # image_paths: {prompt: path or Exception}
+    for block in doc.blocks:
+        if isinstance(block, ImageRef) and block.ready:
+            ...block.path or block.data...
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from utils.placeholders import is_unsupported, normalize_prompt, split_placeholders
+
+_HEADING_PATTERN = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+@dataclass
+class Heading:
+    text: str
+    level: int
+
+
+@dataclass
+class Paragraph:
+    text: str  # inline markdown (bold, links, list markers) is kept as-is
+
+
+@dataclass
+class ImageRef:
+    prompt: str
+    kind: str = "image"  # "image", "infographic" or "video"
+    path: str = None     # file in the image cache
+    data: bytes = None   # raw image bytes (when not backed by a file)
+    error: str = None
+
+    @property
+    def unsupported(self) -> bool:
+        return self.kind == "video" or is_unsupported(self.prompt)
+
+    @property
+    def ready(self) -> bool:
+        return self.path is not None or self.data is not None
+
+    @property
+    def pending(self) -> bool:
+        return not (self.ready or self.error or self.unsupported)
+
+
+@dataclass
+class Document:
+    title: str
+    blocks: list = field(default_factory=list)
+
+    def images(self) -> list:
+        return [block for block in self.blocks if isinstance(block, ImageRef)]
+
+
+def build_document(title: str, markdown: str, image_paths: dict = None) -> Document:
+    """
+    Parses a markdown post into a Document. Media placeholders become ImageRefs resolved
+    against image_paths ({normalized prompt: path, bytes or Exception}); prompts missing
+    from it stay pending.
+    """
+    image_paths = image_paths or {}
+    document = Document(title)
+    lines = []
+
+    def flush():
+        text = "\n".join(lines).strip()
+        lines.clear()
+        if not text:
+            return
+        for piece in split_placeholders(text):
+            if isinstance(piece, str):
+                if piece.strip():
+                    document.blocks.append(Paragraph(piece.strip()))
+            else:
+                document.blocks.append(_image_ref(*piece, image_paths))
+
+    for line in markdown.splitlines():
+        heading = _HEADING_PATTERN.match(line)
+        if heading:
+            flush()
+            document.blocks.append(Heading(heading.group(2).strip(), len(heading.group(1))))
+        elif not line.strip():
+            flush()
+        else:
+            lines.append(line)
+    flush()
+    return document
+
+
+def _image_ref(kind: str, prompt: str, image_paths: dict) -> ImageRef:
+    ref = ImageRef(prompt.strip(), kind)
+    if ref.unsupported:
+        return ref
+    result = image_paths.get(normalize_prompt(prompt))
+    if isinstance(result, Exception):
+        ref.error = str(result)
+    elif isinstance(result, (bytes, bytearray)):
+        ref.data = bytes(result)
+    elif result is not None:
+        ref.path = result
+    return ref
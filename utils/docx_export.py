@@ -0,0 +1,86 @@
+"""
+docx_export.py
+
+Writes Documents (utils/document.py) to DOCX, one at a time or as a batch streamed into a
+single ZIP.
+
+Images are added straight from their cache files (or raw bytes), so no base64 round trip
+happens and, in a batch, only the document being written is held in memory.
+
+🔁 Example Usage:
+
+    with open("post.docx", "wb") as f:
+        write_docx(doc, f)
+    with open("posts.zip", "wb") as f:
+        write_docx_zip([doc_1, doc_2], f)
+"""
+
+import io
+import re
+import zipfile
+
+from docx import Document as DocxDocument
+from docx.shared import Inches
+
+from utils.document import Document, Heading, ImageRef, Paragraph
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def write_docx(document: Document, fp):
+    """
+    Writes document as DOCX to a binary file object.
+    """
+    docx = DocxDocument()
+    docx.add_heading(document.title, 0)
+    for block in document.blocks:
+        if isinstance(block, Heading):
+            docx.add_heading(_plain(block.text), min(block.level, 9))
+        elif isinstance(block, Paragraph):
+            docx.add_paragraph(_plain(block.text))
+        elif isinstance(block, ImageRef):
+            if block.unsupported:
+                docx.add_paragraph(f"[Video/GIF not supported: {block.prompt}]")
+            elif block.ready:
+                try:
+                    docx.add_picture(block.path if block.path else io.BytesIO(block.data), width=Inches(4))
+                except Exception as e:
+                    docx.add_paragraph(f"[Image failed: {e}]")
+            else:
+                docx.add_paragraph(f"[Image failed: {block.error or 'not generated'}]")
+    docx.save(fp)
+
+
+def docx_bytes(document: Document) -> bytes:
+    out = io.BytesIO()
+    write_docx(document, out)
+    return out.getvalue()
+
+
+def docx_filename(document: Document) -> str:
+    name = re.sub(r"[^\w\-]+", "_", document.title).strip("_") or "post"
+    return f"{name}.docx"
+
+
+def write_docx_zip(documents, fp):
+    """
+    Streams every document into one ZIP (fp may be unseekable), one DOCX entry per document.
+    """
+    used = set()
+    with zipfile.ZipFile(fp, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for document in documents:
+            name = docx_filename(document)
+            stem, counter = name[:-5], 2
+            while name in used:
+                name, counter = f"{stem}_{counter}.docx", counter + 1
+            used.add(name)
+            with archive.open(name, "w") as entry:
+                write_docx(document, entry)
+
+
+def _plain(text: str) -> str:
+    """
+    Drops markdown emphasis/link syntax that DOCX would otherwise show literally.
+    """
+    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)
+    return re.sub(r"(\*\*|__|\*|`)", "", text)
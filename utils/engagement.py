@@ -0,0 +1,187 @@
+"""
+engagement.py
+
+Deterministic, local engagement scoring for blog posts.
+
+Scores the same four criteria the EngagementPredictorAgent prompt asks the model about,
+from plain text statistics, with a few linear scans per post:
+
+    Length      words, ideally 500–1500
+    Formatting  headings, lists and paragraph length
+    CTA         a call to action, best near the end
+    Emotion     hook words, questions and direct address ("you")
+
+Each criterion contributes up to 2.5 points, so the total maps onto the usual 1–10 score.
+Features are computed for a whole batch of posts at once and then scored column by column,
+so a thousand full-length posts take well under a second and no API calls. Scores inside the borderline band
+(CONTENTCRAFTER_ENGAGEMENT_BORDERLINE, default "5,6") are where the heuristics are least
+decisive; EngagementPredictorAgent asks the model about those in "auto" mode.
+
+🔁 Example Usage:
+
+    results = score_posts([post_1, post_2])   # [{"score": 7, "analysis": "...", "raw_score": 7.2, ...}, ...]
+    is_borderline(results[0]["raw_score"])
+"""
+
+import os
+import re
+from collections import Counter
+
+IDEAL_MIN_WORDS, IDEAL_MAX_WORDS = 500, 1500
+# Posts this long or longer get no length points
+MAX_USEFUL_WORDS = 3000
+CTA_TAIL_FRACTION = 0.25
+
+
+def _parse_band(value: str) -> tuple:
+    low, _, high = value.partition(",")
+    return float(low), float(high or low)
+
+
+BORDERLINE_BAND = _parse_band(os.getenv("CONTENTCRAFTER_ENGAGEMENT_BORDERLINE", "5,6"))
+
+_STRUCTURE = re.compile(r"^\s{0,3}(?:(#{1,6}\s+\S|\*\*[^*\n]{2,80}\*\*[ \t]*$)|(?:[-*•]|\d+[.)])\s+\S)", re.MULTILINE)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_PUNCTUATION = ".,;:!?\"'()[]*_`“”‘’—-"
+_YOU = frozenset(("you", "your", "yours", "yourself", "you're", "you'll", "you've"))
+_HOOKS = frozenset((
+    "imagine", "discover", "secret", "surprising", "powerful", "amazing", "incredible", "future", "unlock",
+    "breakthrough", "dream", "fear", "hope", "love", "exciting", "curious", "myth", "mistake", "proven",
+    "essential", "ultimate", "why", "how",
+))
+_HOOK_PREFIXES = ("transform", "revolution", "inspir")
+_CTA_PHRASES = (
+    "subscribe", "sign up", "share this", "share your", "leave a comment", "comment below", "let us know",
+    "let me know", "learn more", "read more", "get started", "join us", "join the", "try it", "try this",
+    "try out", "download", "contact us", "follow us", "what do you think", "start today", "start now",
+    "take action", "click",
+)
+
+
+def extract_features(posts) -> list:
+    """
+    Returns one feature dict per post (words, headings, list_items, avg_paragraph_words,
+    cta, cta_at_end, hooks_per_100, questions, you_per_100).
+
+    Word-level features come from one word count per post (hook and "you" words are looked
+    up once per distinct word), so the cost is a few linear scans of the text.
+    """
+    features = []
+    for post in posts:
+        post = post or ""
+        lowered = post.lower()
+        tokens = lowered.split()
+        words = len(tokens)
+        hooks = you = 0
+        for token, count in Counter(tokens).items():
+            token = token.strip(_PUNCTUATION)
+            if token in _HOOKS or token.startswith(_HOOK_PREFIXES):
+                hooks += count
+            elif token in _YOU:
+                you += count
+        structure = _STRUCTURE.findall(post)
+        headings = sum(1 for heading in structure if heading)
+        paragraphs = sum(1 for p in _PARAGRAPH_BREAK.split(post) if p.strip())
+        tail_start = int(len(lowered) * (1 - CTA_TAIL_FRACTION))
+        cta_at = max(_last_phrase(lowered, phrase) for phrase in _CTA_PHRASES)
+        per_100 = 100.0 / words if words else 0.0
+        features.append({
+            "words": words,
+            "headings": headings,
+            "list_items": len(structure) - headings,
+            "avg_paragraph_words": round(words / paragraphs, 1) if paragraphs else 0.0,
+            "cta": cta_at >= 0,
+            "cta_at_end": cta_at >= tail_start,
+            "hooks_per_100": round(hooks * per_100, 2),
+            "questions": post.count("?"),
+            "you_per_100": round(you * per_100, 2),
+        })
+    return features
+
+
+def _last_phrase(lowered: str, phrase: str) -> int:
+    """
+    Offset of the last occurrence of phrase that starts a word, or -1.
+    """
+    position = lowered.rfind(phrase)
+    while position > 0 and lowered[position - 1].isalnum():
+        position = lowered.rfind(phrase, 0, position)
+    return position
+
+
+def criterion_scores(features: list) -> dict:
+    """
+    Scores a batch of feature dicts column by column. Returns {criterion: [points 0–2.5, ...]}.
+    """
+    words = [f["words"] for f in features]
+    length = [
+        2.5 * w / IDEAL_MIN_WORDS if w < IDEAL_MIN_WORDS
+        else 2.5 if w <= IDEAL_MAX_WORDS
+        else max(0.0, 2.5 * (MAX_USEFUL_WORDS - w) / (MAX_USEFUL_WORDS - IDEAL_MAX_WORDS))
+        for w in words
+    ]
+    formatting = [
+        min(1.0, f["headings"] / 3) + min(0.75, f["list_items"] * 0.25)
+        + (0.75 if 0 < f["avg_paragraph_words"] <= 120 else 0.25 if f["avg_paragraph_words"] else 0.0)
+        for f in features
+    ]
+    cta = [2.5 if f["cta_at_end"] else 1.5 if f["cta"] else 0.0 for f in features]
+    emotion = [
+        2.5 * (0.4 * min(1.0, f["hooks_per_100"] / 1.5) + 0.3 * min(1.0, f["questions"] / 3)
+               + 0.3 * min(1.0, f["you_per_100"] / 2))
+        for f in features
+    ]
+    return {"length": length, "formatting": formatting, "cta": cta, "emotion": emotion}
+
+
+def score_posts(posts) -> list:
+    """
+    Scores a batch of posts locally.
+
+    Returns:
+        list: One {"score": int 1–10, "analysis": str, "raw_score": float, "features": dict,
+        "method": "local"} per post, in input order.
+    """
+    features = extract_features(posts)
+    criteria = criterion_scores(features)
+    results = []
+    for i, feature in enumerate(features):
+        points = {name: column[i] for name, column in criteria.items()}
+        raw = sum(points.values())
+        results.append({
+            "score": max(1, min(10, int(raw + 0.5))),
+            "analysis": format_analysis(feature, points),
+            "raw_score": round(raw, 2),
+            "features": feature,
+            "method": "local",
+        })
+    return results
+
+
+def is_borderline(raw_score: float) -> bool:
+    low, high = BORDERLINE_BAND
+    return low <= raw_score <= high
+
+
+def format_analysis(feature: dict, points: dict) -> str:
+    words = feature["words"]
+    if words < IDEAL_MIN_WORDS:
+        length_note = "shorter than the ideal 500–1500 words"
+    elif words <= IDEAL_MAX_WORDS:
+        length_note = "within the ideal 500–1500 words"
+    else:
+        length_note = "longer than the ideal 500–1500 words"
+    if feature["cta_at_end"]:
+        cta_note = "clear call-to-action near the end"
+    elif feature["cta"]:
+        cta_note = "call-to-action present but not in the closing section"
+    else:
+        cta_note = "no clear call-to-action"
+    return "\n".join([
+        f"- **Length** ({points['length']:.1f}/2.5): {words} words, {length_note}.",
+        f"- **Formatting** ({points['formatting']:.1f}/2.5): {feature['headings']} heading(s), "
+        f"{feature['list_items']} list item(s), ~{feature['avg_paragraph_words']:.0f} words per paragraph.",
+        f"- **CTA Presence** ({points['cta']:.1f}/2.5): {cta_note}.",
+        f"- **Emotional Impact** ({points['emotion']:.1f}/2.5): {feature['hooks_per_100']:.1f} hook words "
+        f"and {feature['you_per_100']:.1f} direct \"you\" per 100 words, {feature['questions']} question(s).",
+    ])
@@ -0,0 +1,83 @@
+"""
+gemini_client.py
+
+Process-wide registry of Gemini model handles shared by every agent.
+
+Models come from a pluggable backend (utils/backends.py: the Gemini SDK by default, or an
+offline fake). The backend is configured once per API key and a single model handle is kept per model
+name — the response cache (utils/llm_cache.py) in front of the shared rate limiter
+(utils/rate_limiter.py) — so constructing agents or a new ContentChainAgent costs
+nothing and all agents reuse the SDK's underlying client connection. Handles are safe to share across
+threads and async tasks.
+
+🔁 Example Usage:
+
+    model = get_model("gemini-1.5-flash", api_key, agent="PlannerAgent")
+    model.generate_content("Hello")
+"""
+
+import threading
+
+from utils.backends import ModelBackend, get_default_backend
+from utils.llm_cache import CachedModel
+from utils.metrics import InstrumentedModel
+from utils.rate_limiter import RateLimitedModel, get_default_limiter
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+
+_lock = threading.Lock()
+_configured_keys = {}
+_models = {}
+
+
+def configure(api_key: str, backend: ModelBackend = None):
+    """
+    Configures the backend with api_key unless it is already configured with the same key.
+    Reconfiguring with a different key drops that backend's existing handles.
+    """
+    backend = backend or get_default_backend()
+    with _lock:
+        if _configured_keys.get(backend) == api_key:
+            return
+        backend.configure(api_key)
+        _configured_keys[backend] = api_key
+        for key in [key for key in _models if key[0] is backend]:
+            del _models[key]
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME, api_key: str = None, agent: str = "",
+              backend: ModelBackend = None) -> InstrumentedModel:
+    """
+    Returns the shared handle for model_name, creating it on first use.
+
+    Args:
+        model_name (str, optional): The Gemini model to use.
+        api_key (str, optional): Configures the backend on first use (or when the key changes).
+        agent (str, optional): Name that tags this caller's calls in utils/metrics.py.
+        backend (ModelBackend, optional): Where models come from (utils/backends.py).
+            Defaults to CONTENTCRAFTER_BACKEND, i.e. the Gemini SDK.
+
+    Returns:
+        InstrumentedModel: A per-agent metrics view over the cached, rate-limited handle
+        shared by every caller asking for model_name on the same backend.
+    """
+    backend = backend or get_default_backend()
+    if api_key is not None and _configured_keys.get(backend) != api_key:
+        configure(api_key, backend)
+    with _lock:
+        model = _models.get((backend, model_name))
+        if model is None:
+            # Cache first, so cache hits never spend rate-limit budget
+            model = CachedModel(RateLimitedModel(backend.create_model(model_name), get_default_limiter()),
+                                backend=backend.name)
+            _models[(backend, model_name)] = model
+    return InstrumentedModel(model, agent=agent)
+
+
+def reset():
+    """
+    Drops every shared handle and forgets the configured keys (mainly for tests and key rotation).
+    """
+    with _lock:
+        _models.clear()
+        _configured_keys.clear()
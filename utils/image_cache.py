@@ -0,0 +1,174 @@
+"""
+image_cache.py
+
+Content-addressed on-disk store for generated images.
+
+An image is stored as <root>/<key[:2]>/<key>.png, where key is the SHA-256 of everything
+that determines the pixels: prompt, model ID, inference steps, guidance scale and seed.
+Repeated prompts — across reruns, sessions and restarts — cost a file read instead of a
+diffusion run. Files are evicted least-recently-used first once the store grows past
+max_bytes.
+
+🔁 Example Usage:
+
+    cache = get_default_image_cache()
+    key = ImageCache.make_key("moon base", "runwayml/stable-diffusion-v1-5", 30, 7.5, 0)
+    path = cache.get(key) or cache.put(key, pil_image)
+    cache.stats()                                   # {"hits": 0, "misses": 1, "files": 1, "bytes": ...}
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+
+DEFAULT_IMAGE_CACHE_DIR = os.getenv("CONTENTCRAFTER_IMAGE_CACHE_DIR", os.path.join(".cache", "images"))
+DEFAULT_IMAGE_CACHE_MAX_MB = float(os.getenv("CONTENTCRAFTER_IMAGE_CACHE_MAX_MB", "512"))
+
+
+class ImageCache:
+    """
+    Size-bounded, content-addressed PNG store. Safe to share across threads; writes are
+    atomic (temp file + rename), so concurrent processes never see partial files.
+    """
+
+    def __init__(self, root: str = DEFAULT_IMAGE_CACHE_DIR, max_bytes: int = int(DEFAULT_IMAGE_CACHE_MAX_MB * 1024 * 1024)):
+        """
+        Args:
+            root (str): Directory holding the images.
+            max_bytes (int): Least recently used files beyond this total size are evicted. 0 disables eviction.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(prompt: str, model_id: str, steps: int, guidance_scale: float, seed: int, **params) -> str:
+        """
+        Builds the content address from every parameter that affects the generated image
+        (extra params such as width/height/scheduler are included as given).
+        """
+        payload = json.dumps(
+            {"prompt": prompt, "model": model_id, "steps": int(steps), "guidance": float(guidance_scale), "seed": seed,
+             **params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def get(self, key: str):
+        """
+        Returns the file path of a cached image (marking it recently used), or None on a miss.
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, image) -> str:
+        """
+        Stores a PIL image (or raw PNG bytes) under key and returns its path.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            data = bytes(image)
+        else:
+            buf = io.BytesIO()
+            image.save(buf, format="PNG")
+            data = buf.getvalue()
+
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        existed = os.path.exists(path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is not None and not existed:
+                self._total_bytes += len(data)
+        self._evict()
+        return path
+
+    def clear(self):
+        """
+        Deletes every cached image.
+        """
+        for path, _, _ in self._files():
+            _remove(path)
+        with self._lock:
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        files = self._files()
+        return {"hits": self.hits, "misses": self.misses, "files": len(files), "bytes": sum(size for _, size, _ in files)}
+
+    def _files(self) -> list:
+        """
+        Returns (path, size, last used) for every stored image.
+        """
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".png"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._files())
+            if self._total_bytes <= self.max_bytes:
+                return
+            files = sorted(self._files(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in files)
+            for path, size, _ in files:
+                if total <= self.max_bytes:
+                    break
+                if _remove(path):
+                    total -= size
+            self._total_bytes = total
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_image_cache() -> ImageCache:
+    """
+    Returns the process-wide image cache configured from the environment.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache()
+        return _default_cache
+
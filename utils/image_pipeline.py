@@ -0,0 +1,351 @@
+"""
+image_pipeline.py
+
+Process-wide, lazily loaded Stable Diffusion pipeline with image-quality profiles.
+
+The multi-GB model is only loaded on the first real image request (or an explicit
+warm_up()), then shared by every caller and Streamlit session until unload() is called.
+torch/diffusers are imported on first use, so pages without images never pay for them.
+
+Every generation runs under an ImageProfile: "preview" (few DPM-Solver++ steps, lower
+resolution, tuned torch threads, optional attention slicing) for drafts, and "full" for the final
+post. Time spent per profile is tracked in timing_stats() and recorded as "image" metrics.
+
+🔁 Example Usage:
+
+    provider = get_image_provider()
+    provider.warm_up()                              # optional: load ahead of time
+    path = provider.generate_file("moon base")      # PNG path in the image cache (raises on failure)
+    paths = provider.generate_files(["moon base", "mars farm"], batch_size=4, profile="preview")
+    provider.timing_stats()                         # {"preview": {"images": 2, "seconds": ..., "avg_s": ...}}
+    provider.unload()                               # free GPU/CPU memory
+"""
+
+import dataclasses
+import gc
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from utils.image_cache import ImageCache, get_default_image_cache
+from utils.metrics import get_metrics
+from utils.placeholders import normalize_prompt
+
+DEFAULT_MODEL_ID = os.getenv("CONTENTCRAFTER_SD_MODEL", "runwayml/stable-diffusion-v1-5")
+DEFAULT_BATCH_SIZE = int(os.getenv("CONTENTCRAFTER_IMAGE_BATCH_SIZE", "4"))
+DEFAULT_SEED = int(os.getenv("CONTENTCRAFTER_IMAGE_SEED", "0"))
+TORCH_THREADS = int(os.getenv("CONTENTCRAFTER_TORCH_THREADS", "0"))
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    name: str
+    steps: int
+    guidance_scale: float = 7.5
+    width: int = 512
+    height: int = 512
+    scheduler: str = "default"  # "default" keeps the model's own scheduler; "dpm" = DPM-Solver++ (good in few steps)
+    attention_slicing: bool = False
+    torch_threads: int = 0  # 0 keeps (or restores) torch's default
+
+    def cache_params(self) -> dict:
+        """
+        The fields that change the generated pixels (threads and slicing only change speed/memory).
+        """
+        return {"width": self.width, "height": self.height, "scheduler": self.scheduler}
+
+
+PROFILES = {
+    "preview": ImageProfile(
+        "preview",
+        steps=int(os.getenv("CONTENTCRAFTER_PREVIEW_STEPS", "8")),
+        width=int(os.getenv("CONTENTCRAFTER_PREVIEW_SIZE", "384")),
+        height=int(os.getenv("CONTENTCRAFTER_PREVIEW_SIZE", "384")),
+        scheduler="dpm",
+        attention_slicing=os.getenv("CONTENTCRAFTER_PREVIEW_ATTENTION_SLICING", "0").lower() in ("1", "true", "yes"),
+        torch_threads=TORCH_THREADS or (os.cpu_count() or 0),
+    ),
+    "full": ImageProfile("full", steps=30, torch_threads=TORCH_THREADS),
+}
+DEFAULT_PROFILE = "full"
+
+
+def get_profile(profile) -> ImageProfile:
+    """
+    Resolves a profile name ("preview" / "full") or returns an ImageProfile unchanged.
+    """
+    if isinstance(profile, ImageProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown image profile '{profile}'. Choose from: {', '.join(PROFILES)}") from None
+
+
+def image_cache_key(prompt: str, model_id: str, seed: int, profile=DEFAULT_PROFILE) -> str:
+    """
+    Image cache key of a prompt rendered with the given model, seed and profile.
+    """
+    profile = get_profile(profile)
+    return ImageCache.make_key(normalize_prompt(prompt), model_id, profile.steps, profile.guidance_scale, seed,
+                               **profile.cache_params())
+
+
+class ImagePipelineProvider:
+    """
+    Owns one StableDiffusionPipeline; thread-safe lazy loading, generation and unloading.
+    """
+
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, hf_token: str = None, cache: ImageCache = None,
+                 seed: int = DEFAULT_SEED):
+        """
+        Args:
+            model_id (str): Hugging Face model to load.
+            hf_token (str): Hugging Face token (defaults to HUGGINGFACE_API_TOKEN).
+            cache (ImageCache): Where generated images are stored (defaults to the process-wide cache).
+            seed (int): Fixed generator seed, so a prompt always yields the same (cacheable) image.
+        """
+        self.model_id = model_id
+        self.hf_token = hf_token if hf_token is not None else os.getenv("HUGGINGFACE_API_TOKEN")
+        self.cache = cache if cache is not None else get_default_image_cache()
+        self.seed = seed
+        self.device = None
+        self.load_error = None
+        self.timings = {}
+        self._pipe = None
+        self._schedulers = {}
+        self._default_threads = None  # torch's own thread count, restored for profiles without a setting
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._pipe is not None
+
+    def get(self):
+        """
+        Returns the pipeline, loading it on first use.
+
+        Raises:
+            Exception: Whatever prevented loading (missing diffusers, download failure, ...).
+        """
+        with self._lock:
+            if self._pipe is None:
+                self._pipe = self._load()
+            return self._pipe
+
+    def _load(self):
+        import torch
+        from diffusers import StableDiffusionPipeline
+        from transformers import logging as hf_logging
+        from huggingface_hub import login
+
+        hf_logging.set_verbosity_error()
+        if self.hf_token:
+            login(token=self.hf_token, add_to_git_credential=False)
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        try:
+            pipe = StableDiffusionPipeline.from_pretrained(
+                self.model_id,
+                torch_dtype=torch.float16 if device.type == "cuda" else torch.float32,
+                safety_checker=None,
+                use_safetensors=True,
+                low_cpu_mem_usage=True
+            ).to(device)
+        except Exception as e:
+            self.load_error = e
+            raise
+        self.device = device
+        self.load_error = None
+        self._schedulers = {"default": pipe.scheduler}
+        print(f"✅ Stable Diffusion ready on {device.type.upper()}")
+        return pipe
+
+    def warm_up(self) -> bool:
+        """
+        Loads the pipeline ahead of the first request. Returns False if loading failed.
+        """
+        try:
+            self.get()
+            return True
+        except Exception as e:
+            print(f"[Image pipeline fallback] {e}")
+            return False
+
+    def unload(self):
+        """
+        Releases the pipeline and the memory it holds; the next request reloads it.
+        """
+        with self._lock:
+            if self._pipe is None:
+                return
+            self._pipe = None
+            self._schedulers = {}
+            self.device = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def generate(self, prompt: str, profile=DEFAULT_PROFILE):
+        """
+        Generates one PIL image, falling back to the CPU with at most 20 steps on CUDA out-of-memory.
+        """
+        import torch
+
+        profile = get_profile(profile)
+        pipe = self.get()
+        prompt = normalize_prompt(prompt)
+        with self._lock:
+            try:
+                return self._run(pipe, [prompt], profile)[0]
+            except torch.cuda.OutOfMemoryError:
+                pipe.to("cpu")
+                self.device = torch.device("cpu")
+                return self._run(pipe, [prompt], dataclasses.replace(profile, steps=min(profile.steps, 20)))[0]
+
+    def generate_batch(self, prompts: list, batch_size: int = DEFAULT_BATCH_SIZE, profile=DEFAULT_PROFILE) -> dict:
+        """
+        Generates one image per unique prompt, running the pipeline on batches of prompts.
+        On CUDA out-of-memory the remaining prompts fall back to one at a time.
+
+        Returns:
+            dict: {normalized prompt: PIL image or the Exception that prevented it}
+        """
+        profile = get_profile(profile)
+        unique = list(dict.fromkeys(normalize_prompt(p) for p in prompts))
+        results = {}
+        try:
+            import torch
+            pipe = self.get()
+        except Exception as e:
+            return {prompt: e for prompt in unique}
+
+        batch_size = max(1, batch_size)
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            with self._lock:
+                try:
+                    results.update(zip(batch, self._run(pipe, batch, profile)))
+                    continue
+                except torch.cuda.OutOfMemoryError:
+                    batch_size = 1
+                except Exception as e:
+                    print(f"[Image Error] batch of {len(batch)}: {e}")
+            for prompt in batch:
+                try:
+                    results[prompt] = self.generate(prompt, profile)
+                except Exception as e:
+                    print(f"[Image Error] {prompt}: {e}")
+                    results[prompt] = e
+        return results
+
+    def generate_files(self, prompts: list, batch_size: int = DEFAULT_BATCH_SIZE, profile=DEFAULT_PROFILE) -> dict:
+        """
+        Returns {normalized prompt: cached PNG path or the Exception that prevented it}.
+        Only prompts missing from the image cache are sent to the pipeline.
+        """
+        unique = list(dict.fromkeys(normalize_prompt(p) for p in prompts))
+        keys = {prompt: self.cache_key(prompt, profile) for prompt in unique}
+        paths = {prompt: self.cache.get(key) for prompt, key in keys.items()}
+        missing = [prompt for prompt, path in paths.items() if path is None]
+        if missing:
+            for prompt, image in self.generate_batch(missing, batch_size, profile).items():
+                paths[prompt] = image if isinstance(image, Exception) else self.cache.put(keys[prompt], image)
+        return paths
+
+    def generate_file(self, prompt: str, profile=DEFAULT_PROFILE) -> str:
+        """
+        Single-prompt generate_files: returns the cached PNG path, raising if generation failed.
+        """
+        result = self.generate_files([prompt], 1, profile)[normalize_prompt(prompt)]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def cache_key(self, prompt: str, profile=DEFAULT_PROFILE) -> str:
+        return image_cache_key(prompt, self.model_id, self.seed, profile)
+
+    def timing_stats(self) -> dict:
+        """
+        Returns {profile name: {"images", "batches", "seconds", "avg_s"}} for this process.
+        """
+        with self._lock:
+            return {
+                name: {**stats, "avg_s": round(stats["seconds"] / stats["images"], 3) if stats["images"] else 0.0}
+                for name, stats in self.timings.items()
+            }
+
+    def _run(self, pipe, prompts: list, profile: ImageProfile) -> list:
+        """
+        Runs the pipeline on prompts under profile and records the time it took.
+        """
+        import torch
+
+        self._apply_profile(pipe, profile)
+        start = time.perf_counter()
+        with torch.no_grad():
+            images = pipe(
+                prompts,
+                num_inference_steps=profile.steps,
+                guidance_scale=profile.guidance_scale,
+                width=profile.width,
+                height=profile.height,
+                generator=[self._generator() for _ in prompts],
+            ).images
+        seconds = time.perf_counter() - start
+
+        stats = self.timings.setdefault(profile.name, {"images": 0, "batches": 0, "seconds": 0.0})
+        stats["images"] += len(prompts)
+        stats["batches"] += 1
+        stats["seconds"] = round(stats["seconds"] + seconds, 3)
+        get_metrics().record("image", profile=profile.name, images=len(prompts), steps=profile.steps,
+                             device=self.device.type if self.device is not None else "", wall_s=round(seconds, 4))
+        return images
+
+    def _apply_profile(self, pipe, profile: ImageProfile):
+        import torch
+
+        if self._default_threads is None:
+            self._default_threads = torch.get_num_threads()
+        threads = profile.torch_threads or self._default_threads
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+        pipe.scheduler = self._scheduler(profile.scheduler)
+        if profile.attention_slicing:
+            pipe.enable_attention_slicing()
+        else:
+            pipe.disable_attention_slicing()
+
+    def _scheduler(self, name: str):
+        if name not in self._schedulers:
+            if name != "dpm":
+                raise ValueError(f"Unknown scheduler '{name}'")
+            from diffusers import DPMSolverMultistepScheduler
+            self._schedulers[name] = DPMSolverMultistepScheduler.from_config(
+                self._schedulers["default"].config, algorithm_type="dpmsolver++", use_karras_sigmas=True
+            )
+        return self._schedulers[name]
+
+    def _generator(self):
+        import torch
+        return torch.Generator(device=self.device.type if self.device is not None else "cpu").manual_seed(self.seed)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_image_provider() -> ImagePipelineProvider:
+    """
+    Returns the process-wide ImagePipelineProvider (nothing is loaded until it is used).
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = ImagePipelineProvider()
+        return _provider
@@ -0,0 +1,315 @@
+"""
+image_worker.py
+
+Background image generation in a separate process that owns the Stable Diffusion pipeline.
+
+The caller submits a job (a list of prompts) and gets it back immediately; prompts already
+in the image cache are resolved on the spot, the rest go to the worker process through a
+job queue and come back one by one as they finish. Between batches the worker drains its
+queue, so cancelling a job (e.g. because the user started a new generation) drops its
+remaining prompts without waiting for them.
+
+🔁 Example Usage:
+
+    worker = get_image_worker()
+    job = worker.submit({"preview": ["moon base"], "full": ["mars farm"]})   # or a list → "full"
+    for profile, prompt, path in worker.iter_results(job):   # path is a PNG file or an Exception
+        ...
+    job.paths_for("preview")                        # {prompt: path} received so far
+    worker.cancel(job)                              # stop generating the rest
+"""
+
+import itertools
+import multiprocessing
+import queue
+import threading
+from collections import deque
+
+from utils.image_cache import ImageCache, get_default_image_cache
+from utils.image_pipeline import (
+    DEFAULT_BATCH_SIZE, DEFAULT_MODEL_ID, DEFAULT_PROFILE, DEFAULT_SEED, ImagePipelineProvider, get_profile, image_cache_key
+)
+from utils.placeholders import normalize_prompt
+
+_STOP = object()
+
+
+class ImageJob:
+    """
+    The prompts of one submission, per quality profile, and the paths (or Exceptions)
+    received for them so far.
+    """
+
+    def __init__(self, job_id: int, prompts: dict):
+        self.id = job_id
+        self.prompts = {
+            get_profile(profile).name: list(dict.fromkeys(normalize_prompt(p) for p in profile_prompts))
+            for profile, profile_prompts in prompts.items()
+        }
+        self.paths = {profile: {} for profile in self.prompts}
+        self.cancelled = False
+        self._updates = queue.Queue()
+
+    @property
+    def total(self) -> int:
+        return sum(len(prompts) for prompts in self.prompts.values())
+
+    @property
+    def completed(self) -> int:
+        return sum(len(paths) for paths in self.paths.values())
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or self.completed == self.total
+
+    def paths_for(self, profile) -> dict:
+        return self.paths.get(get_profile(profile).name, {})
+
+    def _resolve(self, profile: str, prompt: str, result):
+        self.paths[profile][prompt] = result
+        self._updates.put((profile, prompt, result))
+
+
+class ImageWorker:
+    """
+    Parent-side handle of the image worker process. Thread-safe; one instance can serve
+    every Streamlit session. Mirrors ImagePipelineProvider's loaded/device/load_error status.
+    """
+
+    def __init__(self, model_id: str = DEFAULT_MODEL_ID, seed: int = DEFAULT_SEED,
+                 batch_size: int = DEFAULT_BATCH_SIZE, cache: ImageCache = None):
+        """
+        Args:
+            model_id (str): Model the worker loads.
+            seed (int): Generator seed (part of the image cache key).
+            batch_size (int): Prompts per pipeline call in the worker.
+            cache (ImageCache): Cache the worker writes to and this process reads hits from.
+        """
+        self.model_id = model_id
+        self.seed = seed
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else get_default_image_cache()
+        self.loaded = False
+        self.device = None
+        self.load_error = None
+        self.timings = {}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._process = None
+        self._jobs_queue = None
+        self._results_queue = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """
+        Starts the worker process (and the thread routing its results) if it isn't running.
+        """
+        with self._lock:
+            if self.alive:
+                return
+            self._jobs_queue = self._ctx.Queue()
+            self._results_queue = self._ctx.Queue()
+            self._process = self._ctx.Process(
+                target=_worker_main,
+                args=(self._jobs_queue, self._results_queue, self.model_id, self.seed, self.batch_size, self.cache.root),
+                name="contentcrafter-image-worker",
+                daemon=True,
+            )
+            self._process.start()
+            threading.Thread(target=self._dispatch, args=(self._results_queue,), daemon=True).start()
+
+    def submit(self, prompts) -> ImageJob:
+        """
+        Queues the prompts that are not cached yet and returns the job immediately.
+
+        Args:
+            prompts (dict | list): {profile name: prompts}, or a list of prompts for the default profile.
+                Profiles are queued in the given order.
+        """
+        job = ImageJob(next(self._ids), prompts if isinstance(prompts, dict) else {DEFAULT_PROFILE: prompts})
+        missing = []
+        for profile, profile_prompts in job.prompts.items():
+            for prompt in profile_prompts:
+                path = self.cache.get(image_cache_key(prompt, self.model_id, self.seed, profile))
+                if path:
+                    job._resolve(profile, prompt, path)
+                else:
+                    missing.append((profile, prompt))
+        if missing:
+            self.start()
+            # Queued under the lock, so a cancel message always follows all of its job's items
+            with self._lock:
+                self._jobs[job.id] = job
+                for profile, prompt in missing:
+                    self._jobs_queue.put(("job", job.id, profile, prompt))
+        return job
+
+    def cancel(self, job: ImageJob):
+        """
+        Drops the job's prompts that the worker has not started yet.
+        """
+        job.cancelled = True
+        job._updates.put(_STOP)
+        with self._lock:
+            if self._jobs.pop(job.id, None) is not None and self.alive:
+                self._jobs_queue.put(("cancel", job.id))
+
+    def iter_results(self, job: ImageJob, timeout: float = None):
+        """
+        Yields (profile, prompt, path or Exception) as images complete, until the job is done,
+        cancelled, or no result arrives within timeout seconds.
+        """
+        while not job.done or not job._updates.empty():
+            try:
+                update = job._updates.get(timeout=timeout if timeout is not None else 1.0)
+            except queue.Empty:
+                if timeout is not None:
+                    return
+                if not self.alive:
+                    self._fail(job, RuntimeError("Image worker stopped"))
+                continue
+            if update is _STOP:
+                return
+            yield update
+
+    def warm_up(self) -> bool:
+        """
+        Asks the worker to load the pipeline now. Returns immediately; status updates follow.
+        """
+        self.start()
+        self._jobs_queue.put(("warm_up",))
+        return True
+
+    def unload(self):
+        """
+        Asks the worker to release the pipeline.
+        """
+        if self.alive:
+            self._jobs_queue.put(("unload",))
+
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Stops the worker process, cancelling every pending job.
+        """
+        with self._lock:
+            jobs, self._jobs = list(self._jobs.values()), {}
+            process = self._process
+        for job in jobs:
+            job.cancelled = True
+            job._updates.put(_STOP)
+        if process is not None and process.is_alive():
+            self._jobs_queue.put(("stop",))
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def _dispatch(self, results_queue):
+        """
+        Routes worker messages to their jobs (runs in a daemon thread of the parent).
+        """
+        while True:
+            try:
+                message = results_queue.get()
+            except (EOFError, OSError):
+                return
+            if message[0] == "status":
+                _, self.loaded, self.device, self.load_error, self.timings = message
+            elif message[0] == "image":
+                _, job_id, profile, prompt, path, error = message
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job._resolve(profile, prompt, path if error is None else RuntimeError(error))
+                if job.done:
+                    with self._lock:
+                        self._jobs.pop(job_id, None)
+            elif message[0] == "stopped":
+                return
+
+    def _fail(self, job: ImageJob, error: Exception):
+        for profile, prompts in job.prompts.items():
+            for prompt in prompts:
+                if prompt not in job.paths[profile]:
+                    job._resolve(profile, prompt, error)
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+
+def _worker_main(jobs_queue, results_queue, model_id: str, seed: int, batch_size: int, cache_root: str):
+    """
+    Worker process loop: drain control messages and jobs, then generate one single-profile batch.
+    """
+    provider = ImagePipelineProvider(model_id=model_id, cache=ImageCache(cache_root), seed=seed)
+    pending = deque()
+    cancelled = set()
+
+    def post_status():
+        device = provider.device.type if provider.device is not None else None
+        error = str(provider.load_error) if provider.load_error else None
+        results_queue.put(("status", provider.loaded, device, error, provider.timing_stats()))
+
+    while True:
+        messages = [jobs_queue.get()] if not pending else []
+        while True:
+            try:
+                messages.append(jobs_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for message in messages:
+            kind = message[0]
+            if kind == "job":
+                pending.append(message[1:])
+            elif kind == "cancel":
+                cancelled.add(message[1])
+            elif kind == "warm_up":
+                provider.warm_up()
+                post_status()
+            elif kind == "unload":
+                provider.unload()
+                post_status()
+            elif kind == "stop":
+                results_queue.put(("stopped",))
+                return
+
+        pending = deque(item for item in pending if item[0] not in cancelled)
+        # A cancel arrives after all of its job's items, so none of those jobs can queue more
+        cancelled.clear()
+        if not pending:
+            continue
+        profile = pending[0][1]
+        batch = [item for item in pending if item[1] == profile][:batch_size]
+        pending = deque(item for item in pending if item not in batch)
+        prompts = [prompt for _, _, prompt in batch]
+        try:
+            paths = provider.generate_files(prompts, batch_size, profile)
+        except Exception as e:
+            paths = {prompt: e for prompt in prompts}
+        for job_id, _, prompt in batch:
+            result = paths[prompt]
+            if isinstance(result, Exception):
+                results_queue.put(("image", job_id, profile, prompt, None, str(result)))
+            else:
+                results_queue.put(("image", job_id, profile, prompt, result, None))
+        post_status()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_image_worker() -> ImageWorker:
+    """
+    Returns the process-wide ImageWorker (the worker process starts on the first uncached job).
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = ImageWorker()
+        return _worker
@@ -0,0 +1,388 @@
+"""
+job_queue.py
+
+Durable, SQLite-backed job queue for running topics across worker processes.
+
+Jobs are topics (plus the extra fields of their input record). A worker leases the oldest
+ready job for a visibility timeout and keeps extending the lease while the pipeline runs;
+if the worker dies, the lease expires and another worker picks the job up. Failed jobs are
+retried with exponential backoff until they run out of attempts. Results are written back
+to the same database, so any number of processes on one machine can work off one queue.
+
+The database runs in WAL mode, which relies on shared memory between the processes using
+it: keep the file on a local filesystem of the machine the workers run on. Network
+filesystems (NFS, SMB/CIFS, cloud-synced folders) are not supported, and neither are
+workers on several hosts sharing one file.
+
+Leasing is a compare-and-set UPDATE on the job's state, so two processes never hold the
+same job; every lease gets a token, and a worker whose lease expired can no longer
+complete, fail or extend the job.
+
+Workers also report a heartbeat, which jobs.py status uses to tell healthy workers from
+ones that stopped responding.
+
+🔁 Example Usage:
+
+    queue = JobQueue(".cache/jobs.sqlite3")
+    queue.enqueue("AI in Education", {"audience": "teachers"})
+    job = queue.lease("host:123:0", visibility_timeout=600)    # Job or None
+    queue.complete(job, {"edited_post": "..."})                # or queue.fail(job, "❌ ...")
+    queue.stats()                                              # {"queued": 0, "leased": 0, ...}
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+DEFAULT_QUEUE_PATH = os.getenv("CONTENTCRAFTER_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+DEFAULT_VISIBILITY_TIMEOUT = float(os.getenv("CONTENTCRAFTER_QUEUE_VISIBILITY", "600"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("CONTENTCRAFTER_QUEUE_MAX_ATTEMPTS", "3"))
+# Retry n waits RETRY_BASE_DELAY * 2**(n-1) seconds, capped at RETRY_MAX_DELAY
+RETRY_BASE_DELAY = float(os.getenv("CONTENTCRAFTER_QUEUE_RETRY_DELAY", "30"))
+RETRY_MAX_DELAY = 900.0
+
+QUEUED, LEASED, COMPLETED, FAILED = "queued", "leased", "completed", "failed"
+STATUSES = (QUEUED, LEASED, COMPLETED, FAILED)
+PENDING = (QUEUED, LEASED)
+
+RUNNING, STOPPED = "running", "stopped"
+
+
+@dataclass
+class Job:
+    job_id: int
+    topic: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+    lease_token: str = None
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue. Safe to share across threads; SQLite's file locking covers
+    multiple processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        """
+        Args:
+            path (str): SQLite file location (":memory:" for a throwaway, single-process queue).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                # Local filesystems only (see the module docstring)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_token TEXT,
+                    leased_at REAL,
+                    lease_expires_at REAL,
+                    result TEXT,
+                    error TEXT,
+                    elapsed_s REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at, job_id)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    host TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    current_job INTEGER,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                )"""
+            )
+
+    # --- Producers ---------------------------------------------------------------------
+
+    def enqueue(self, topic: str, payload: dict = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """
+        Adds a job and returns its ID.
+        """
+        return self.enqueue_many([(topic, payload)], max_attempts)[0]
+
+    def enqueue_many(self, jobs, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> list:
+        """
+        Adds (topic, payload) jobs in one transaction and returns their IDs, in order.
+        """
+        now = time.time()
+        job_ids = []
+        with self._lock, self._conn:
+            for topic, payload in jobs:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (topic, payload, status, max_attempts, available_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (topic, json.dumps(payload or {}, ensure_ascii=False, default=str), QUEUED, max(1, max_attempts),
+                     now, now, now),
+                )
+                job_ids.append(cursor.lastrowid)
+        return job_ids
+
+    def pending_topics(self) -> list:
+        """
+        Topics of jobs that are queued or leased.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT topic FROM jobs WHERE status IN (?, ?)", PENDING)]
+
+    # --- Workers -----------------------------------------------------------------------
+
+    def lease(self, worker_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT):
+        """
+        Leases the oldest ready job (queued and due, or leased with an expired lease) to
+        worker_id for visibility_timeout seconds. Returns the Job, or None if nothing is ready.
+        Expired leases of jobs that are out of attempts are marked failed instead, and counted
+        as a failure of the worker that held them.
+        """
+        while True:
+            now = time.time()
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT job_id, topic, payload, status, attempts, max_attempts, lease_owner, lease_token FROM jobs "
+                    "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?) "
+                    "ORDER BY job_id LIMIT 1",
+                    (QUEUED, now, LEASED, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, topic, payload, status, attempts, max_attempts, previous_owner, previous_token = row
+                # Compare-and-set on the state just read: only one process wins the job
+                guard = "status = ? AND lease_token IS ?"
+                if status == LEASED and attempts >= max_attempts:
+                    cursor = self._conn.execute(
+                        f"UPDATE jobs SET status = ?, error = ?, lease_token = NULL, updated_at = ? "
+                        f"WHERE job_id = ? AND {guard}",
+                        (FAILED, "❌ Lease expired on the last attempt (worker died or timed out)", now,
+                         job_id, status, previous_token),
+                    )
+                    if cursor.rowcount == 1:
+                        # Charged to the worker that let the lease expire, as _finish would have
+                        self._conn.execute(
+                            "UPDATE workers SET current_job = CASE WHEN current_job = ? THEN NULL ELSE current_job END, "
+                            "failed = failed + 1 WHERE worker_id = ?", (job_id, previous_owner))
+                    continue
+                token = uuid.uuid4().hex
+                cursor = self._conn.execute(
+                    f"UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_token = ?, "
+                    f"leased_at = ?, lease_expires_at = ?, updated_at = ? WHERE job_id = ? AND {guard}",
+                    (LEASED, worker_id, token, now, now + visibility_timeout, now, job_id, status, previous_token),
+                )
+                if cursor.rowcount != 1:
+                    continue
+                if status == LEASED and previous_owner != worker_id:
+                    self._conn.execute(
+                        "UPDATE workers SET current_job = NULL WHERE worker_id = ? AND current_job = ?",
+                        (previous_owner, job_id))
+                self._conn.execute(
+                    "UPDATE workers SET current_job = ?, heartbeat_at = ? WHERE worker_id = ?", (job_id, now, worker_id))
+            return Job(job_id, topic, json.loads(payload), attempts + 1, max_attempts, token)
+
+    def extend(self, job: Job, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> bool:
+        """
+        Pushes the job's lease out by visibility_timeout. False if the lease was lost.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE job_id = ? AND status = ? AND lease_token = ?",
+                (now + visibility_timeout, now, job.job_id, LEASED, job.lease_token),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, result: dict, elapsed_s: float = None) -> bool:
+        """
+        Stores the job's result. False if the lease was lost (another worker owns the job now).
+        """
+        return self._finish(job, COMPLETED, result=json.dumps(result, ensure_ascii=False, default=str),
+                            elapsed_s=elapsed_s)
+
+    def fail(self, job: Job, error: str, retryable: bool = True, elapsed_s: float = None) -> bool:
+        """
+        Records a failed attempt: the job is queued again after a backoff delay while it has
+        attempts left (and the error is retryable), otherwise it is marked failed.
+        False if the lease was lost.
+        """
+        if retryable and job.attempts < job.max_attempts:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            return self._finish(job, QUEUED, error=error, elapsed_s=elapsed_s, available_at=time.time() + delay)
+        return self._finish(job, FAILED, error=error, elapsed_s=elapsed_s)
+
+    def release(self, job: Job) -> bool:
+        """
+        Hands a leased job back without using up an attempt (e.g. on worker shutdown).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, lease_owner = NULL, lease_token = NULL, "
+                "lease_expires_at = NULL, available_at = ?, updated_at = ? WHERE job_id = ? AND status = ? AND lease_token = ?",
+                (QUEUED, now, now, job.job_id, LEASED, job.lease_token),
+            )
+        return cursor.rowcount == 1
+
+    def _finish(self, job: Job, status: str, result: str = None, error: str = None, elapsed_s: float = None,
+                available_at: float = None) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, elapsed_s = ?, available_at = COALESCE(?, available_at), "
+                "lease_token = NULL, lease_expires_at = NULL, updated_at = ? WHERE job_id = ? AND status = ? AND lease_token = ?",
+                (status, result, error, elapsed_s, available_at, now, job.job_id, LEASED, job.lease_token),
+            )
+            if cursor.rowcount == 1:
+                counter = "completed" if status == COMPLETED else "failed"
+                self._conn.execute(
+                    f"UPDATE workers SET current_job = NULL, {counter} = {counter} + 1, heartbeat_at = ? "
+                    "WHERE worker_id = (SELECT lease_owner FROM jobs WHERE job_id = ?)", (now, job.job_id))
+        return cursor.rowcount == 1
+
+    def register_worker(self, worker_id: str, host: str, pid: int):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, host, pid, status, current_job, completed, failed, "
+                "started_at, heartbeat_at) VALUES (?, ?, ?, ?, NULL, 0, 0, ?, ?)",
+                (worker_id, host, pid, RUNNING, now, now),
+            )
+
+    def heartbeat(self, worker_id: str, status: str = RUNNING):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE workers SET status = ?, heartbeat_at = ?, "
+                "current_job = CASE WHEN ? = ? THEN NULL ELSE current_job END WHERE worker_id = ?",
+                (status, time.time(), status, STOPPED, worker_id),
+            )
+
+    def idle(self) -> bool:
+        """
+        True when no job is queued (including retries waiting out their backoff) or leased.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM jobs WHERE status IN (?, ?) LIMIT 1", PENDING).fetchone() is None
+
+    # --- Admin -------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """
+        Returns job counts per status, how many queued jobs are ready now, and the age of
+        the oldest ready job in seconds.
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            ready, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM jobs WHERE status = ? AND available_at <= ?", (QUEUED, now)
+            ).fetchone()
+        return {
+            **{status: counts.get(status, 0) for status in STATUSES},
+            "ready": ready,
+            "oldest_ready_s": round(now - oldest, 1) if oldest else 0.0,
+        }
+
+    def in_flight(self) -> list:
+        """
+        Returns the leased jobs (oldest lease first) with their owner and lease timing.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, topic, lease_owner, attempts, max_attempts, leased_at, lease_expires_at FROM jobs "
+                "WHERE status = ? ORDER BY leased_at", (LEASED,)
+            ).fetchall()
+        return [
+            {"job_id": job_id, "topic": topic, "worker_id": owner, "attempts": attempts, "max_attempts": max_attempts,
+             "running_s": round(now - leased_at, 1), "expires_in_s": round(expires_at - now, 1)}
+            for job_id, topic, owner, attempts, max_attempts, leased_at, expires_at in rows
+        ]
+
+    def workers(self) -> list:
+        """
+        Returns every registered worker with the seconds since its last heartbeat.
+        """
+        now = time.time()
+        columns = ("worker_id", "host", "pid", "status", "current_job", "completed", "failed", "started_at",
+                   "heartbeat_at")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(columns)} FROM workers ORDER BY started_at").fetchall()
+        return [{**dict(zip(columns, row)), "heartbeat_age_s": round(now - row[-1], 1)} for row in rows]
+
+    def list_jobs(self, status: str = None, limit: int = None) -> list:
+        """
+        Returns jobs (oldest first) with their decoded payload and result.
+        """
+        columns = ("job_id", "topic", "payload", "status", "attempts", "max_attempts", "result", "error", "elapsed_s",
+                   "created_at", "updated_at")
+        query = (f"SELECT {', '.join(columns)} FROM jobs" + (" WHERE status = ?" if status else "")
+                 + " ORDER BY job_id" + (" LIMIT ?" if limit else ""))
+        params = ((status,) if status else ()) + ((limit,) if limit else ())
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(zip(columns, row))
+            job["payload"] = json.loads(job["payload"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            jobs.append(job)
+        return jobs
+
+    def retry(self, job_ids=None) -> int:
+        """
+        Queues failed jobs (all of them, or the given IDs) again with fresh attempts. Returns the count.
+        """
+        now = time.time()
+        query = "UPDATE jobs SET status = ?, attempts = 0, error = NULL, available_at = ?, updated_at = ? WHERE status = ?"
+        params = [QUEUED, now, now, FAILED]
+        if job_ids:
+            query += f" AND job_id IN ({', '.join('?' * len(job_ids))})"
+            params.extend(job_ids)
+        with self._lock, self._conn:
+            return self._conn.execute(query, params).rowcount
+
+    def purge(self, status: str = None, older_than_seconds: float = None, stale_workers_seconds: float = None) -> int:
+        """
+        Deletes finished jobs matching every given filter (both completed and failed when no
+        status is given), stopped workers, and workers silent for stale_workers_seconds.
+        Returns the number of jobs deleted.
+        """
+        clauses, params = ["status IN (?, ?)"], [COMPLETED, FAILED]
+        if status:
+            clauses, params = ["status = ?"], [status]
+        if older_than_seconds is not None:
+            clauses.append("updated_at < ?")
+            params.append(time.time() - older_than_seconds)
+        with self._lock, self._conn:
+            removed = self._conn.execute(f"DELETE FROM jobs WHERE {' AND '.join(clauses)}", params).rowcount
+            stale_before = time.time() - stale_workers_seconds if stale_workers_seconds is not None else 0
+            self._conn.execute("DELETE FROM workers WHERE status = ? OR heartbeat_at < ?", (STOPPED, stale_before))
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
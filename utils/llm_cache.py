@@ -0,0 +1,280 @@
+"""
+llm_cache.py
+
+Persistent prompt-level cache for Gemini responses, shared by every agent.
+
+Responses are keyed on (backend, model name, prompt hash, generation config) and stored in a
+small SQLite database so repeated prompts — re-running a topic, re-validating the same
+topic — are answered from disk instead of paying for another API call. The backend is part
+of the key, so offline FakeBackend runs never answer (or overwrite) real Gemini prompts.
+
+🔁 Example Usage:
+
+    model = CachedModel(genai.GenerativeModel("gemini-1.5-flash"))
+    model.generate_content(prompt)                      # miss → API call, stored
+    model.generate_content(prompt)                      # hit  → served from disk
+    model.generate_content(prompt, bypass_cache=True)   # always calls the API
+    with fresh_responses():                             # same, for every call in the block
+        agent.stream_single_chain(topic)
+    model.generate_content(prompt, stream=True)         # streamed chunks, stored when complete
+    get_default_cache().stats()                         # {"hits": 1, "misses": 1, ...}
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.metrics import set_call_stat
+
+DEFAULT_CACHE_PATH = os.getenv("CONTENTCRAFTER_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+DEFAULT_TTL_SECONDS = float(os.getenv("CONTENTCRAFTER_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("CONTENTCRAFTER_CACHE_MAX_ENTRIES", "5000"))
+CACHE_DISABLED = os.getenv("CONTENTCRAFTER_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Set inside fresh_responses(): every cached model call skips the lookup (results are still stored)
+_bypass = contextvars.ContextVar("contentcrafter_bypass_cache", default=False)
+
+
+@contextlib.contextmanager
+def fresh_responses():
+    """
+    Makes every model call inside the block (in this thread / task, and in pipeline stages
+    started from it) go to the API instead of the cache, e.g. to regenerate a topic.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with TTL expiry and size-bounded LRU eviction.
+    Safe to share across threads; SQLite's file locking covers multiple processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path (str): SQLite file location (":memory:" for a throwaway cache).
+            ttl_seconds (float): Entries older than this are treated as misses. 0 disables expiry.
+            max_entries (int): Least recently used entries beyond this count are evicted.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config=None, backend: str = "gemini") -> str:
+        """
+        Builds the cache key from the backend, model name, prompt hash and generation config.
+        """
+        config = json.dumps(_config_to_dict(generation_config), sort_keys=True, default=str)
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{backend}\x00{model_name}\x00{prompt_hash}\x00{config}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns the cached text for key, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT text, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, model_name: str, text: str):
+        """
+        Stores a response and evicts least recently used entries beyond max_entries.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, text, now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        """
+        Removes every cached response and resets the counters.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the current number of stored entries.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for a Gemini response when it is served from the cache.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.from_cache = True
+
+
+class CachedModel:
+    """
+    Wraps a GenerativeModel so generate_content is served from a ResponseCache when possible.
+    Any other attribute is forwarded to the wrapped model.
+    """
+
+    def __init__(self, model, cache: ResponseCache = None, backend: str = "gemini"):
+        """
+        Args:
+            model: The model to wrap.
+            cache (ResponseCache, optional): Defaults to the shared cache (get_default_cache()).
+            backend (str, optional): Name of the backend that produced model; part of every key.
+        """
+        self._model = model
+        self._cache = cache
+        self.backend = backend
+
+    @property
+    def cache(self):
+        return self._cache if self._cache is not None else get_default_cache()
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self._model, "model_name", type(self._model).__name__)
+
+    def generate_content(self, prompt, generation_config=None, bypass_cache: bool = False, stream: bool = False,
+                         **kwargs):
+        """
+        Calls the wrapped model, answering repeated prompts from the cache.
+
+        Args:
+            prompt: The prompt passed to the model. Only plain strings are cached.
+            generation_config (optional): Forwarded to the model and included in the cache key.
+            bypass_cache (bool): If True, always call the model (the fresh response is still stored).
+                Also implied inside fresh_responses().
+            stream (bool): If True, return an iterable of chunks (a single chunk on a cache hit);
+                the full text is stored once the stream is exhausted.
+            **kwargs: Other SDK arguments. Requests using them (e.g. tools) are never cached.
+
+        Returns:
+            The SDK response, or a CachedResponse exposing .text on a cache hit.
+        """
+        cache = self.cache
+        if generation_config is not None:
+            kwargs["generation_config"] = generation_config
+        if cache is None or not isinstance(prompt, str) or set(kwargs) - {"generation_config"}:
+            if stream:
+                kwargs["stream"] = True
+            return self._model.generate_content(prompt, **kwargs)
+
+        model_config = getattr(self._model, "_generation_config", None)
+        key = cache.make_key(self.model_name, prompt, [model_config, generation_config], backend=self.backend)
+        if not (bypass_cache or _bypass.get()):
+            text = cache.get(key)
+            if text is not None:
+                set_call_stat("cache_hit", True)
+                return [CachedResponse(text)] if stream else CachedResponse(text)
+
+        if stream:
+            return self._stream_and_store(cache, key, prompt, kwargs)
+        response = self._model.generate_content(prompt, **kwargs)
+        cache.set(key, self.model_name, response.text)
+        return response
+
+    def _stream_and_store(self, cache, key, prompt, kwargs):
+        """
+        Yields streamed chunks and caches the concatenated text once the stream completes.
+        """
+        parts = []
+        for chunk in self._model.generate_content(prompt, stream=True, **kwargs):
+            parts.append(chunk.text)
+            yield chunk
+        cache.set(key, self.model_name, "".join(parts))
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def _config_to_dict(config):
+    """
+    Normalizes SDK config objects, dicts and lists into JSON-serializable values.
+    """
+    if config is None or isinstance(config, (str, int, float, bool)):
+        return config
+    if isinstance(config, dict):
+        return {str(k): _config_to_dict(v) for k, v in config.items()}
+    if isinstance(config, (list, tuple)):
+        return [_config_to_dict(v) for v in config]
+    if hasattr(config, "to_dict"):
+        return _config_to_dict(config.to_dict())
+    if hasattr(config, "__dict__"):
+        return _config_to_dict(vars(config))
+    return str(config)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Returns the process-wide ResponseCache, or None when CONTENTCRAFTER_CACHE_DISABLED is set.
+    """
+    global _default_cache
+    if CACHE_DISABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -0,0 +1,376 @@
+"""
+metrics.py
+
+Latency, token and cost instrumentation for model calls and pipeline stages.
+
+Every Gemini call made through an InstrumentedModel (see utils/gemini_client.py) and every
+pipeline stage run by the executor is recorded with its wall time, queue wait (rate limiter),
+prompt/response token counts (from the SDK's usage_metadata), retries and cache hits, tagged
+by agent, stage and topic. Records can be exported as JSON lines or in the Prometheus text
+format, and summarized per run.
+
+Set CONTENTCRAFTER_METRICS_PATH to also append every record to a JSONL file as it happens.
+
+🔁 Example Usage:
+
+    metrics = get_metrics()
+    mark = metrics.mark()
+    ...run the chain...
+    print(format_summary(summarize(metrics.records_since(mark))))
+    metrics.export_jsonl("metrics.jsonl")
+    open("metrics.prom", "w").write(metrics.to_prometheus())
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+METRICS_PATH = os.getenv("CONTENTCRAFTER_METRICS_PATH")
+MAX_RECORDS = int(os.getenv("CONTENTCRAFTER_METRICS_MAX_RECORDS", "100000"))
+
+# Tags (agent / stage / topic) applied to every record made in the current context
+_tags = contextvars.ContextVar("contentcrafter_metric_tags", default={})
+# Stats for the model call currently in progress, filled in by the cache and rate limiter
+_current_call = contextvars.ContextVar("contentcrafter_current_call", default=None)
+
+
+@contextlib.contextmanager
+def metric_tags(**tags):
+    """
+    Adds tags to every record made inside the block (in this thread / task).
+    """
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def add_call_stat(name: str, value):
+    """
+    Adds value to a numeric stat of the model call in progress (no-op outside an instrumented call).
+    """
+    call = _current_call.get()
+    if call is not None:
+        call[name] = call.get(name, 0) + value
+
+
+def set_call_stat(name: str, value):
+    """
+    Sets a stat of the model call in progress (no-op outside an instrumented call).
+    """
+    call = _current_call.get()
+    if call is not None:
+        call[name] = value
+
+
+class MetricsRecorder:
+    """
+    Thread-safe, bounded in-memory store of metric records.
+    """
+
+    def __init__(self, max_records: int = MAX_RECORDS, path: str = METRICS_PATH):
+        self._records = deque(maxlen=max_records)
+        self._count = 0
+        self._lock = threading.Lock()
+        self.path = path
+
+    def record(self, kind: str, **fields) -> dict:
+        """
+        Stores a record of the given kind ("llm_call", "stage", "image" or "prompt"), tagged with the current context tags.
+        """
+        record = {"ts": round(time.time(), 3), "kind": kind, **_tags.get(), **fields}
+        with self._lock:
+            self._records.append(record)
+            self._count += 1
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    def mark(self) -> int:
+        """
+        Returns a position marker for records_since().
+        """
+        with self._lock:
+            return self._count
+
+    def records_since(self, mark: int = 0, topics=None) -> list:
+        """
+        Returns the records made after mark, optionally limited to the given topics.
+        """
+        with self._lock:
+            skip = max(0, len(self._records) - (self._count - mark))
+            records = list(self._records)[skip:]
+        if topics is not None:
+            topics = set(topics)
+            records = [r for r in records if r.get("topic") in topics]
+        return records
+
+    def export_jsonl(self, path: str, records: list = None):
+        """
+        Appends records (default: all retained records) to path as JSON lines.
+        """
+        records = self.records_since(0) if records is None else records
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def to_prometheus(self, records: list = None) -> str:
+        """
+        Renders aggregated counters in the Prometheus text exposition format.
+        Topic is deliberately not a label (unbounded cardinality).
+        """
+        records = self.records_since(0) if records is None else records
+        calls = defaultdict(lambda: defaultdict(float))
+        stages = defaultdict(lambda: defaultdict(float))
+        images = defaultdict(lambda: defaultdict(float))
+        prompts = defaultdict(lambda: defaultdict(float))
+        for r in records:
+            if r["kind"] == "llm_call":
+                c = calls[(r.get("agent", ""), r.get("stage", ""))]
+                c["count"] += 1
+                c["seconds"] += r.get("wall_s", 0)
+                c["queue_seconds"] += r.get("queue_wait_s", 0)
+                c["prompt_tokens"] += r.get("prompt_tokens", 0)
+                c["response_tokens"] += r.get("response_tokens", 0)
+                c["retries"] += r.get("retries", 0)
+                c["cache_hits"] += 1 if r.get("cache_hit") else 0
+                c["errors"] += 1 if r.get("error") else 0
+            elif r["kind"] == "stage":
+                s = stages[r.get("stage", "")]
+                s["count"] += 1
+                s["seconds"] += r.get("wall_s", 0)
+            elif r["kind"] == "image":
+                i = images[r.get("profile", "")]
+                i["count"] += r.get("images", 0)
+                i["seconds"] += r.get("wall_s", 0)
+            elif r["kind"] == "prompt":
+                p = prompts[r.get("budget_name", "")]
+                p["count"] += 1
+                p["compacted"] += 1 if r.get("compacted") else 0
+                p["trimmed_tokens"] += r.get("original_tokens", 0) - r.get("prompt_tokens", 0)
+
+        lines = []
+
+        def family(name, metric_type, help_text, rows):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in rows:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value:g}")
+
+        def call_rows(field):
+            return [({"agent": agent, "stage": stage}, c[field]) for (agent, stage), c in sorted(calls.items())]
+
+        family("contentcrafter_llm_calls_total", "counter", "Gemini calls.", call_rows("count"))
+        family("contentcrafter_llm_call_seconds_total", "counter", "Wall time spent in Gemini calls.", call_rows("seconds"))
+        family("contentcrafter_llm_queue_wait_seconds_total", "counter", "Time spent waiting on the rate limiter.",
+               call_rows("queue_seconds"))
+        family("contentcrafter_llm_tokens_total", "counter", "Tokens by direction.",
+               [({"agent": agent, "stage": stage, "direction": direction}, c[f"{direction}_tokens"])
+                for (agent, stage), c in sorted(calls.items()) for direction in ("prompt", "response")])
+        family("contentcrafter_llm_cache_hits_total", "counter", "Calls answered from the response cache.",
+               call_rows("cache_hits"))
+        family("contentcrafter_llm_retries_total", "counter", "Rate-limit retries.", call_rows("retries"))
+        family("contentcrafter_llm_errors_total", "counter", "Calls that raised.", call_rows("errors"))
+        family("contentcrafter_stage_runs_total", "counter", "Pipeline stage runs.",
+               [({"stage": stage}, s["count"]) for stage, s in sorted(stages.items())])
+        family("contentcrafter_stage_seconds_total", "counter", "Wall time per pipeline stage.",
+               [({"stage": stage}, s["seconds"]) for stage, s in sorted(stages.items())])
+        family("contentcrafter_images_total", "counter", "Generated images per quality profile.",
+               [({"profile": profile}, i["count"]) for profile, i in sorted(images.items())])
+        family("contentcrafter_image_seconds_total", "counter", "Diffusion time per quality profile.",
+               [({"profile": profile}, i["seconds"]) for profile, i in sorted(images.items())])
+        family("contentcrafter_prompts_total", "counter", "Budgeted prompts built.",
+               [({"budget": name}, p["count"]) for name, p in sorted(prompts.items())])
+        family("contentcrafter_prompt_compactions_total", "counter", "Prompts compacted to fit their token budget.",
+               [({"budget": name}, p["compacted"]) for name, p in sorted(prompts.items())])
+        family("contentcrafter_prompt_trimmed_tokens_total", "counter", "Estimated tokens removed by compaction.",
+               [({"budget": name}, p["trimmed_tokens"]) for name, p in sorted(prompts.items())])
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedModel:
+    """
+    Wraps a (shared) model handle and records every generate_content call, tagged with the agent name.
+    Any other attribute is forwarded to the wrapped model.
+    """
+
+    def __init__(self, model, agent: str = "", recorder: MetricsRecorder = None):
+        self._model = model
+        self._agent = agent
+        self._recorder = recorder
+
+    @property
+    def recorder(self) -> MetricsRecorder:
+        return self._recorder if self._recorder is not None else get_metrics()
+
+    def generate_content(self, prompt, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(prompt, kwargs)
+        call = {}
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            with metric_tags(agent=self._agent):
+                response = self._model.generate_content(prompt, **kwargs)
+            self._finish(call, start, prompt, response)
+            return response
+        except Exception as e:
+            self._finish(call, start, prompt, None, error=e)
+            raise
+        finally:
+            _current_call.reset(token)
+
+    def _stream(self, prompt, kwargs):
+        call = {}
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        last, parts = None, []
+        try:
+            with metric_tags(agent=self._agent):
+                for chunk in self._model.generate_content(prompt, **kwargs):
+                    if "first_chunk_s" not in call:
+                        call["first_chunk_s"] = round(time.perf_counter() - start, 4)
+                    last = chunk
+                    parts.append(chunk.text)
+                    yield chunk
+            self._finish(call, start, prompt, last, response_text="".join(parts))
+        except Exception as e:
+            self._finish(call, start, prompt, None, error=e)
+            raise
+        finally:
+            _current_call.reset(token)
+
+    def _finish(self, call: dict, start: float, prompt, response, response_text: str = None, error=None):
+        usage = getattr(response, "usage_metadata", None)
+        if response_text is None and response is not None and error is None:
+            response_text = getattr(response, "text", "")
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or _estimate_tokens(prompt)
+        response_tokens = getattr(usage, "candidates_token_count", 0) or _estimate_tokens(response_text or "")
+        with metric_tags(agent=self._agent):
+            self.recorder.record(
+                "llm_call",
+                model=getattr(self._model, "model_name", ""),
+                wall_s=round(time.perf_counter() - start, 4),
+                queue_wait_s=round(call.get("queue_wait_s", 0), 4),
+                prompt_tokens=prompt_tokens,
+                response_tokens=response_tokens if error is None else 0,
+                retries=call.get("retries", 0),
+                cache_hit=bool(call.get("cache_hit")),
+                **({"first_chunk_s": call["first_chunk_s"]} if "first_chunk_s" in call else {}),
+                **({"error": f"{type(error).__name__}: {error}"} if error is not None else {}),
+            )
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+@contextlib.contextmanager
+def timed_stage(stage: str, topic: str, recorder: MetricsRecorder = None):
+    """
+    Tags the block with stage/topic and records its wall time as a "stage" record.
+    """
+    recorder = recorder or get_metrics()
+    start = time.perf_counter()
+    error = None
+    with metric_tags(stage=stage, topic=topic):
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            recorder.record(
+                "stage", wall_s=round(time.perf_counter() - start, 4),
+                **({"error": f"{type(error).__name__}: {error}"} if error is not None else {}),
+            )
+
+
+def summarize(records: list) -> list:
+    """
+    Aggregates records per stage: stage wall time, LLM calls, tokens, queue wait, cache hits, retries.
+    Rows are ordered by total stage time, slowest first.
+    """
+    rows = defaultdict(lambda: defaultdict(float))
+    for r in records:
+        if r["kind"] not in ("stage", "llm_call"):
+            continue
+        row = rows[r.get("stage", "(none)")]
+        if r["kind"] == "stage":
+            row["runs"] += 1
+            row["stage_s"] += r.get("wall_s", 0)
+        elif r["kind"] == "llm_call":
+            row["calls"] += 1
+            row["llm_s"] += r.get("wall_s", 0)
+            row["queue_s"] += r.get("queue_wait_s", 0)
+            row["prompt_tokens"] += r.get("prompt_tokens", 0)
+            row["response_tokens"] += r.get("response_tokens", 0)
+            row["cache_hits"] += 1 if r.get("cache_hit") else 0
+            row["retries"] += r.get("retries", 0)
+    return sorted(({"stage": stage, **row} for stage, row in rows.items()), key=lambda row: -row["stage_s"])
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of values (0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))]
+
+
+def format_summary(rows: list) -> str:
+    """
+    Renders summarize() output as a fixed-width text table.
+    """
+    columns = [("stage", "Stage", 20), ("runs", "Runs", 5), ("stage_s", "Stage s", 9), ("calls", "Calls", 6),
+               ("llm_s", "LLM s", 8), ("queue_s", "Queue s", 8), ("prompt_tokens", "Tok in", 8),
+               ("response_tokens", "Tok out", 8), ("cache_hits", "Hits", 5), ("retries", "Retry", 5)]
+    header = " ".join(f"{title:>{width}}" if key != "stage" else f"{title:<{width}}" for key, title, width in columns)
+    lines = [header, "-" * len(header)]
+    for row in rows + [_total_row(rows)]:
+        cells = []
+        for key, _, width in columns:
+            value = row.get(key, 0)
+            if key == "stage":
+                cells.append(f"{str(value)[:width]:<{width}}")
+            elif key.endswith("_s"):
+                cells.append(f"{value:>{width}.2f}")
+            else:
+                cells.append(f"{int(value):>{width}d}")
+        lines.append(" ".join(cells))
+    return "\n".join(lines)
+
+
+def _total_row(rows: list) -> dict:
+    total = defaultdict(float, stage="TOTAL")
+    for row in rows:
+        for key, value in row.items():
+            if key != "stage":
+                total[key] += value
+    return total
+
+
+def _estimate_tokens(text) -> int:
+    return max(1, len(str(text)) // 4) if text else 0
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_default_metrics = MetricsRecorder()
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    Returns the process-wide MetricsRecorder.
+    """
+    return _default_metrics
@@ -0,0 +1,150 @@
+"""
+placeholders.py
+
+Finds the media placeholders the writer/editor agents leave in blog posts:
+
+    [Insert image here: ...]   (Image: ...)   (Infographic: ...)
+    [Insert short video or animated GIF here: ...]
+
+tokenize() splits a post into text and placeholder Spans (with source offsets) in one
+left-to-right pass. Brackets inside a prompt may nest ("(Image: sales chart (2024))"), and a
+placeholder whose closing bracket is missing ends at the end of its line. The Streamlit
+view and DOCX export (through utils/document.py) and the CLI (main.py) all read posts this
+way; benchmarks/bench_placeholders.py measures it on large multi-topic outputs.
+
+🔁 Example Usage:
+
+    for span in tokenize(post):                     # Span("text" | "image" | "infographic" | "video", ...)
+        post[span.start:span.end], span.prompt
+    prompts = collect_image_prompts([draft_1, draft_2, final_post])   # unique, in first-seen order
+    for piece in split_placeholders(paragraph):     # "text" or ("image", "prompt"), in order
+        ...
+"""
+
+import re
+from dataclasses import dataclass
+
+TEXT = "text"
+
+# Opening marker → (kind, closing bracket)
+PLACEHOLDER_MARKERS = {
+    "[Insert image here:": ("image", "]"),
+    "(Infographic:": ("infographic", ")"),
+    "(Image:": ("image", ")"),
+    "[Insert short video or animated GIF here:": ("video", "]"),
+}
+
+_OPENER = re.compile("|".join(re.escape(marker) for marker in PLACEHOLDER_MARKERS))
+# Per bracket type: the next nested opener, closer or line end
+_BRACKET_STOPS = {"]": re.compile(r"[\[\]\n]"), ")": re.compile(r"[()\n]")}
+
+MAX_PROMPT_CHARS = 150
+
+
+@dataclass(frozen=True)
+class Span:
+    kind: str    # "text", "image", "infographic" or "video"
+    start: int   # offsets into the tokenized text; text[start:end] is the span's source
+    end: int
+    prompt: str = None  # placeholders only, as written (see normalize_prompt)
+
+    @property
+    def is_placeholder(self) -> bool:
+        return self.kind != TEXT
+
+    @property
+    def unsupported(self) -> bool:
+        return self.kind == "video" or (self.prompt is not None and is_unsupported(self.prompt))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    The form of a prompt that is actually sent to the image model (and used as its dedupe key).
+    """
+    return prompt.strip()[:MAX_PROMPT_CHARS]
+
+
+def is_unsupported(prompt: str) -> bool:
+    """
+    Video/GIF placeholders cannot be produced by Stable Diffusion.
+    """
+    lowered = prompt.lower()
+    return "video" in lowered or "gif" in lowered
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into consecutive Spans: text runs and placeholders, covering the whole input.
+    """
+    spans = []
+    position = 0
+    search_from = 0
+    while True:
+        match = _OPENER.search(text, search_from)
+        if match is None:
+            break
+        kind, closer = PLACEHOLDER_MARKERS[match.group(0)]
+        prompt_end, end = _find_closer(text, match.end(), closer)
+        prompt = text[match.end():prompt_end].strip()
+        if not prompt:
+            search_from = match.end()
+            continue
+        if match.start() > position:
+            spans.append(Span(TEXT, position, match.start()))
+        spans.append(Span(kind, match.start(), end, prompt))
+        position = search_from = end
+    if position < len(text):
+        spans.append(Span(TEXT, position, len(text)))
+    return spans
+
+
+def find_placeholders(text: str) -> list:
+    """
+    Returns (kind, prompt) for every placeholder in text, in document order.
+    """
+    return [(span.kind, span.prompt) for span in tokenize(text) if span.is_placeholder]
+
+
+def split_placeholders(text: str):
+    """
+    Yields the text between placeholders as strings and each placeholder as (kind, prompt),
+    in document order.
+    """
+    for span in tokenize(text):
+        yield (span.kind, span.prompt) if span.is_placeholder else text[span.start:span.end]
+
+
+def collect_image_prompts(texts) -> list:
+    """
+    Returns the unique, normalized image prompts across all texts, skipping video/GIF placeholders.
+    """
+    prompts = {}
+    for text in texts:
+        for span in tokenize(text or ""):
+            if span.is_placeholder and not span.unsupported:
+                prompts.setdefault(normalize_prompt(span.prompt), None)
+    return list(prompts)
+
+
+def _find_closer(text: str, start: int, closer: str):
+    """
+    Returns (prompt end, placeholder end) for a placeholder whose prompt starts at start:
+    the matching closer (nested brackets are skipped), or the end of the line if it is missing.
+    """
+    stops = _BRACKET_STOPS[closer]
+    depth = 0
+    position = start
+    while True:
+        stop = stops.search(text, position)
+        if stop is None:
+            return len(text), len(text)
+        char = stop.group(0)
+        if char == "\n":
+            return stop.start(), stop.start()
+        if char == closer:
+            if depth == 0:
+                return stop.start(), stop.end()
+            depth -= 1
+        else:
+            depth += 1
+        position = stop.end()
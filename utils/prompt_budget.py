@@ -0,0 +1,265 @@
+"""
+prompt_budget.py
+
+Token-budgeted prompt construction.
+
+A PromptBuilder counts the tokens of each component of a prompt (draft, goals, feedback, ...)
+and keeps the whole prompt within a per-stage budget. When it is over budget, components
+are compacted deterministically, lowest priority first:
+
+    draft     repeated paragraphs are dropped, then sections the focus text (feedback,
+              goals) does not mention are cut to their first paragraph, then the rest
+    feedback  repeated points are dropped, then every point is cut to its first sentence,
+              then trailing points are dropped
+    text      trailing lines are dropped
+    verbatim  never compacted: the text the model is asked to rewrite. If the prompt cannot
+              fit without cutting it, build() raises PromptOverBudget instead of silently
+              dropping content (callers switch to section-level prompts or fail)
+
+Drafts are only compacted where the model reads them (reviewer prompts), never where it
+rewrites them. The same inputs always produce the same prompt, so compacted prompts still
+hit the response cache. Every build is recorded as a "prompt" metric (budget, tokens,
+compacted components), tagged with the stage and topic like other records.
+
+Budgets default to CONTENTCRAFTER_PROMPT_BUDGET tokens. Individual budgets can be
+overridden with CONTENTCRAFTER_PROMPT_BUDGETS, e.g. "reviewer=4000,tone=8000".
+
+🔁 Example Usage:
+
+    prompt = (PromptBuilder("reviewer")
+              .add("post", post, kind="draft", focus=goals)
+              .build("Suggest 3 improvements:\\n\\n{post}"))
+    prompt = (PromptBuilder("editor")
+              .add("goals", goals, priority=1)
+              .add("draft", draft, kind="verbatim")   # PromptOverBudget if it does not fit
+              .build("--- GOALS ---\\n{goals}\\n\\n--- DRAFT ---\\n{draft}"))
+"""
+
+import logging
+import os
+import re
+
+from utils.metrics import get_metrics
+from utils.rate_limiter import estimate_tokens
+from utils.sections import join_sections, select_sections, split_sections
+
+DEFAULT_PROMPT_BUDGET = int(os.getenv("CONTENTCRAFTER_PROMPT_BUDGET", "12000"))
+# Smallest size a component is compacted to, however tight the budget
+MIN_COMPONENT_TOKENS = 64
+
+PROMPT_BUDGETS = {
+    "writer": DEFAULT_PROMPT_BUDGET,
+    "writer_sections": DEFAULT_PROMPT_BUDGET,
+    "editor": DEFAULT_PROMPT_BUDGET,
+    "editor_sections": DEFAULT_PROMPT_BUDGET,
+    "reviewer": DEFAULT_PROMPT_BUDGET // 2,
+    "tone": DEFAULT_PROMPT_BUDGET,
+}
+
+logger = logging.getLogger(__name__)
+
+_TRIM_MARKER = "[…]"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+def parse_budgets(spec: str) -> dict:
+    """
+    Parses "name=tokens,name=tokens" into {name: tokens}.
+
+    Raises:
+        ValueError: An entry is not name=<integer>.
+    """
+    budgets = {}
+    for entry in (part.strip() for part in (spec or "").split(",")):
+        if not entry:
+            continue
+        name, _, value = entry.partition("=")
+        if not value.strip().isdigit():
+            raise ValueError(f"Bad prompt budget '{entry}' (expected name=tokens)")
+        budgets[name.strip()] = int(value)
+    return budgets
+
+
+PROMPT_BUDGETS.update(parse_budgets(os.getenv("CONTENTCRAFTER_PROMPT_BUDGETS", "")))
+
+
+class PromptOverBudget(ValueError):
+    """
+    Raised when a prompt is over its budget even after compaction because a verbatim
+    component (text the model must rewrite in full) does not fit.
+    """
+
+
+def count_tokens(text: str) -> int:
+    return estimate_tokens(text) if text else 0
+
+
+class PromptBuilder:
+    """
+    Collects prompt components and fits them into a token budget.
+    """
+
+    def __init__(self, name: str, budget: int = None):
+        """
+        Args:
+            name (str): Budget name (a key of PROMPT_BUDGETS), also used in the metric record.
+            budget (int, optional): Token budget. Defaults to PROMPT_BUDGETS[name].
+        """
+        self.name = name
+        self.budget = budget if budget is not None else PROMPT_BUDGETS.get(name, DEFAULT_PROMPT_BUDGET)
+        self.components = []
+
+    def add(self, key: str, text: str, kind: str = "text", priority: int = 0, focus: str = None) -> "PromptBuilder":
+        """
+        Adds a component, filled into the template's {key} placeholder.
+
+        Args:
+            key (str): Placeholder name.
+            text (str): The component's full text.
+            kind (str): Compaction strategy: "draft", "feedback", "text" or "verbatim" (never compacted).
+            priority (int): Lower priorities are compacted first.
+            focus (str, optional): For drafts, text whose subject sections are kept longest.
+        """
+        self.components.append({"key": key, "text": text or "", "kind": kind, "priority": priority, "focus": focus})
+        return self
+
+    def fit(self, template: str) -> dict:
+        """
+        Returns {key: text} with components compacted so the filled template fits the budget.
+
+        Raises:
+            PromptOverBudget: The prompt is still over budget and a verbatim component is why.
+        """
+        texts = {c["key"]: c["text"] for c in self.components}
+        overhead = count_tokens(template.format_map({key: "" for key in texts}))
+        available = max(0, self.budget - overhead)
+        tokens = {key: count_tokens(text) for key, text in texts.items()}
+        original = sum(tokens.values())
+        compacted = []
+
+        for component in sorted(self.components, key=lambda c: c["priority"]):
+            if sum(tokens.values()) <= available:
+                break
+            key = component["key"]
+            if component["kind"] == "verbatim":
+                continue
+            others = sum(tokens.values()) - tokens[key]
+            target = max(MIN_COMPONENT_TOKENS, available - others)
+            if tokens[key] <= target:
+                continue
+            texts[key] = COMPACTORS[component["kind"]](texts[key], target, component["focus"])
+            tokens[key] = count_tokens(texts[key])
+            compacted.append(key)
+
+        used = overhead + sum(tokens.values())
+        get_metrics().record("prompt", budget_name=self.name, budget=self.budget, prompt_tokens=used,
+                             original_tokens=overhead + original, compacted=compacted,
+                             components=tokens, over_budget=used > self.budget)
+        if used > self.budget and any(c["kind"] == "verbatim" for c in self.components):
+            raise PromptOverBudget(f"Prompt '{self.name}' needs {used} tokens (budget {self.budget}) "
+                                   f"without cutting the text it rewrites")
+        if compacted:
+            logger.info("Prompt '%s': %d → %d tokens (budget %d; compacted %s)",
+                        self.name, overhead + original, used, self.budget, ", ".join(compacted))
+        return texts
+
+    def build(self, template: str) -> str:
+        """
+        Fills template ({key} placeholders, no other braces) with the fitted components.
+        """
+        return template.format_map(self.fit(template))
+
+
+def compact_draft(text: str, max_tokens: int, focus: str = None) -> str:
+    """
+    Shrinks a markdown post towards max_tokens, keeping its heading structure: repeated
+    paragraphs go first, then sections unrelated to focus lose everything but their first
+    paragraph (largest first), then the remaining sections do, then the tail is cut.
+    """
+    text = _dedupe_paragraphs(text)
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sections = split_sections(text)
+    keep = {section.id for section in select_sections(sections, focus)} if focus else set()
+    for protected in (keep, set()):
+        candidates = [i for i, section in enumerate(sections) if section.id not in protected]
+        for i in sorted(candidates, key=lambda i: (-count_tokens(sections[i].body), i)):
+            sections[i] = _first_paragraph(sections[i])
+            if count_tokens(join_sections(sections)) <= max_tokens:
+                return join_sections(sections)
+    return _truncate(join_sections(sections), max_tokens, "\n\n")
+
+
+def compact_feedback(text: str, max_tokens: int, focus: str = None) -> str:
+    """
+    Shrinks reviewer feedback towards max_tokens: repeated points go first, then each point
+    is cut to its first sentence, then the last points are dropped.
+    """
+    points, seen = [], set()
+    for line in text.splitlines():
+        normalized = " ".join(_LIST_ITEM.sub("", line).lower().split())
+        if normalized and normalized in seen:
+            continue
+        seen.add(normalized)
+        points.append(line)
+    text = "\n".join(points).strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    text = "\n".join(_first_sentence(line) for line in points).strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+    return _truncate(text, max_tokens, "\n")
+
+
+def compact_text(text: str, max_tokens: int, focus: str = None) -> str:
+    """
+    Keeps the leading lines of text that fit in max_tokens.
+    """
+    return _truncate(text, max_tokens, "\n")
+
+
+COMPACTORS = {"draft": compact_draft, "feedback": compact_feedback, "text": compact_text}
+
+
+def _dedupe_paragraphs(text: str) -> str:
+    seen, kept = set(), []
+    for paragraph in re.split(r"\n\s*\n", text):
+        normalized = " ".join(paragraph.lower().split())
+        if normalized and normalized in seen:
+            continue
+        seen.add(normalized)
+        kept.append(paragraph)
+    return "\n\n".join(kept)
+
+
+def _first_sentence(line: str) -> str:
+    marker = _LIST_ITEM.match(line)
+    prefix = marker.group(0) if marker else ""
+    return prefix + _SENTENCE_END.split(line[len(prefix):].strip(), 1)[0]
+
+
+def _first_paragraph(section):
+    paragraphs = [p for p in re.split(r"\n\s*\n", section.body.strip()) if p.strip()]
+    if len(paragraphs) <= 1:
+        return section
+    return type(section)(section.id, section.heading, f"{paragraphs[0]}\n\n{_TRIM_MARKER}")
+
+
+def _truncate(text: str, max_tokens: int, separator: str) -> str:
+    """
+    Keeps whole pieces (split on separator) from the start while they fit, then marks the cut.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept, budget = [], max_tokens - count_tokens(_TRIM_MARKER) - 1
+    for piece in text.split(separator):
+        if count_tokens(separator.join(kept + [piece])) > budget:
+            break
+        kept.append(piece)
+    if not kept:
+        # A single piece is longer than the whole budget: cut it at a word boundary
+        kept = [text[:max(0, budget) * 4].rsplit(" ", 1)[0]]
+    return f"{separator.join(kept).rstrip()}{separator}{_TRIM_MARKER}"
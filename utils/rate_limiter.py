@@ -0,0 +1,269 @@
+"""
+rate_limiter.py
+
+Quota-aware pacing for every Gemini generate_content call.
+
+A RateLimiter enforces requests-per-minute and tokens-per-minute budgets with two token
+buckets shared by all threads. When the API still answers 429 (ResourceExhausted), the
+call is retried with jittered exponential backoff, honouring any retry delay the server
+sends, and every other caller is paused for that delay too. Concurrent batches therefore
+run at the quota ceiling instead of aborting when they hit it.
+
+Budgets are configured with GEMINI_RPM / GEMINI_TPM (defaults match the gemini-1.5-flash
+free tier). They are per process: jobs.py gives each worker process its share of the
+budget with set_default_limiter().
+
+🔁 Example Usage:
+
+    model = RateLimitedModel(genai.GenerativeModel("gemini-1.5-flash"), get_default_limiter())
+    model.generate_content(prompt)
+    get_default_limiter().stats()   # {"queue_depth": 0, "total_wait_s": 1.2, ...}
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+try:
+    from google.api_core.exceptions import ResourceExhausted
+except ImportError:  # Offline use (utils/backends.FakeBackend) without the Google SDK installed
+    class ResourceExhausted(Exception):
+        """
+        Stand-in for google.api_core.exceptions.ResourceExhausted.
+        """
+
+from utils.metrics import add_call_stat
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPM = float(os.getenv("GEMINI_RPM", "15"))
+DEFAULT_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+DEFAULT_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+_RETRY_DELAY_PATTERN = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most one minute of budget.
+    Reservations may drive the balance negative; later callers then wait their turn.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Reserves amount tokens and returns how many seconds the caller must wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Never reserve more than the bucket can hold, or an oversized request would wait forever
+            self._tokens -= min(amount, self.capacity)
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def consume(self, amount: float):
+        """
+        Charges (or refunds, if negative) tokens after the fact without waiting.
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RateLimiter:
+    """
+    Central limiter shared by every model handle. Thread-safe.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_RPM, tokens_per_minute: float = DEFAULT_TPM,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 2.0, max_delay: float = 60.0):
+        """
+        Args:
+            requests_per_minute (float): Request budget. 0 disables request pacing.
+            tokens_per_minute (float): Token budget (prompt + response). 0 disables token pacing.
+            max_retries (int): How many times a 429 is retried before the error is raised.
+            base_delay (float): First backoff delay in seconds; doubles on every retry.
+            max_delay (float): Upper bound for a single backoff delay.
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._queue_depth = 0
+        self._calls = 0
+        self._retries = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Blocks until a request costing `tokens` fits in both budgets.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        wait = 0.0
+        with self._lock:
+            self._queue_depth += 1
+        try:
+            wait = max(self._paused_until - time.monotonic(), 0.0)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.reserve(tokens))
+            if wait > 0:
+                time.sleep(wait)
+            return wait
+        finally:
+            with self._lock:
+                self._queue_depth -= 1
+                self._calls += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """
+        Corrects the token budget once the real usage of a call is known.
+        """
+        if self.tokens and actual_tokens:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def call(self, fn, *args, tokens: int = 0, **kwargs):
+        """
+        Runs fn(*args, **kwargs) inside the budgets, retrying 429s with jittered exponential backoff.
+
+        Raises:
+            google.api_core.exceptions.ResourceExhausted: If the quota is still exhausted after max_retries.
+        """
+        attempt = 0
+        while True:
+            add_call_stat("queue_wait_s", self.acquire(tokens))
+            try:
+                return fn(*args, **kwargs)
+            except ResourceExhausted as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                with self._lock:
+                    self._retries += 1
+                    # Pause every caller, not just this one: the whole key is over quota
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                add_call_stat("retries", 1)
+                logger.warning("Rate limited, retrying in %.1fs (attempt %d/%d)", delay, attempt, self.max_retries)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Uses the server's retry delay when present, otherwise full-jitter exponential backoff.
+        """
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after + random.uniform(0, 1), self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        """
+        Returns the current queue depth and cumulative wait/retry counters.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queue_depth,
+                "calls": self._calls,
+                "retries": self._retries,
+                "total_wait_s": round(self._total_wait, 3),
+                "avg_wait_s": round(self._total_wait / self._calls, 3) if self._calls else 0.0,
+                "max_wait_s": round(self._max_wait, 3),
+            }
+
+
+class RateLimitedModel:
+    """
+    Wraps a GenerativeModel so every generate_content call goes through a RateLimiter.
+    Any other attribute is forwarded to the wrapped model.
+    """
+
+    def __init__(self, model, limiter: RateLimiter = None):
+        self._model = model
+        self._limiter = limiter
+
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter if self._limiter is not None else get_default_limiter()
+
+    def generate_content(self, prompt, **kwargs):
+        limiter = self.limiter
+        estimated = estimate_tokens(prompt)
+        response = limiter.call(self._model.generate_content, prompt, tokens=estimated, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and not kwargs.get("stream"):
+            limiter.record_usage(estimated, getattr(usage, "total_token_count", 0))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def estimate_tokens(prompt) -> int:
+    """
+    Cheap token estimate (~4 characters per token) used to reserve TPM budget before a call.
+    """
+    return max(1, len(str(prompt)) // 4)
+
+
+def _retry_after_seconds(error: Exception):
+    """
+    Extracts the server-suggested retry delay from a 429, if any.
+    """
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None and getattr(retry_delay, "seconds", None) is not None:
+            return float(retry_delay.seconds)
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if "Retry-After" in headers:
+        try:
+            return float(headers["Retry-After"])
+        except (TypeError, ValueError):
+            pass
+
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> RateLimiter:
+    """
+    Returns the process-wide RateLimiter configured from GEMINI_RPM / GEMINI_TPM.
+    """
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
+
+
+def set_default_limiter(limiter: RateLimiter):
+    """
+    Replaces the process-wide RateLimiter, e.g. with one process's share of the quota.
+    Model handles created before the call keep the limiter they were built with.
+    """
+    global _default_limiter
+    with _default_limiter_lock:
+        _default_limiter = limiter
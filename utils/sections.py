@@ -0,0 +1,137 @@
+"""
+sections.py
+
+Splits a markdown blog post into heading-delimited sections with stable IDs so agents can
+revise only the sections that need it and merge the results back.
+
+A section ID is the slug of its heading ("## Why It Matters" → "why-it-matters"), suffixed
+with "-2", "-3", … for repeated headings; text before the first heading is "intro". IDs stay
+the same across revisions as long as the heading text does.
+
+🔁 Example Usage:
+
+    sections = split_sections(post)
+    targets = select_sections(sections, feedback="The conclusion needs a CTA")
+    revised = parse_sections_response(model_output)           # {"conclusion": "..."}
+    new_post = merge_sections(sections, revised)
+"""
+
+import re
+from dataclasses import dataclass
+
+_HEADING_PATTERN = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_SECTION_BLOCK_PATTERN = re.compile(r"\[\[SECTION:\s*([\w-]+)\s*\]\]\s*\n?(.*?)\n?\s*\[\[END SECTION\]\]", re.DOTALL)
+_STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "your", "what", "why", "how", "are", "into",
+    "about", "more", "section", "post", "blog",
+}
+
+INTRO_ID = "intro"
+
+
+@dataclass
+class Section:
+    id: str
+    heading: str  # full heading line including the #'s, "" for the intro
+    body: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.heading}\n{self.body}".strip("\n") if self.heading else self.body.strip("\n")
+
+
+def split_sections(markdown: str) -> list:
+    """
+    Splits markdown into Sections at every heading line (outside fenced code blocks).
+    """
+    sections = []
+    seen = {}
+    heading, body_lines, in_fence = "", [], False
+
+    def flush():
+        if heading or any(line.strip() for line in body_lines):
+            title = _HEADING_PATTERN.match(heading).group(2) if heading else ""
+            base = _slugify(title) if heading else INTRO_ID
+            seen[base] = seen.get(base, 0) + 1
+            section_id = base if seen[base] == 1 else f"{base}-{seen[base]}"
+            sections.append(Section(section_id, heading, "\n".join(body_lines)))
+
+    for line in markdown.splitlines():
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+        if not in_fence and _HEADING_PATTERN.match(line):
+            flush()
+            heading, body_lines = line.strip(), []
+        else:
+            body_lines.append(line)
+    flush()
+    return sections
+
+
+def join_sections(sections: list) -> str:
+    """
+    Reassembles sections into a markdown post.
+    """
+    return "\n\n".join(section.text for section in sections if section.text.strip())
+
+
+def merge_sections(sections: list, revised: dict) -> str:
+    """
+    Replaces the sections whose IDs appear in revised (id → full section text) and keeps the rest.
+    """
+    return "\n\n".join(
+        revised[section.id].strip() if section.id in revised else section.text
+        for section in sections
+        if section.id in revised or section.text.strip()
+    )
+
+
+def changed_sections(previous: str, current: str) -> list:
+    """
+    Returns the sections of current that are new or whose text differs from previous.
+    """
+    before = {section.id: _normalize(section.text) for section in split_sections(previous)}
+    return [section for section in split_sections(current) if before.get(section.id) != _normalize(section.text)]
+
+
+def select_sections(sections: list, feedback: str) -> list:
+    """
+    Picks the sections a piece of feedback refers to, by heading keywords, quoted IDs or
+    "intro"/"conclusion" mentions. Returns an empty list when nothing specific is targeted.
+    """
+    feedback_lower = feedback.lower()
+    feedback_words = set(re.findall(r"[a-z0-9]+", feedback_lower))
+    selected = []
+    for index, section in enumerate(sections):
+        keywords = {word for word in section.id.split("-") if len(word) > 3 and word not in _STOP_WORDS}
+        mentioned = section.id in feedback_lower or bool(keywords & feedback_words)
+        if index == 0 and feedback_words & {"intro", "introduction", "opening", "hook"}:
+            mentioned = True
+        if index == len(sections) - 1 and feedback_words & {"conclusion", "ending", "cta", "closing"}:
+            mentioned = True
+        if mentioned:
+            selected.append(section)
+    return selected
+
+
+def format_sections_for_prompt(sections: list) -> str:
+    """
+    Wraps sections in [[SECTION:id]] … [[END SECTION]] markers for a section-level prompt.
+    """
+    return "\n\n".join(f"[[SECTION:{section.id}]]\n{section.text}\n[[END SECTION]]" for section in sections)
+
+
+def parse_sections_response(output: str) -> dict:
+    """
+    Extracts {section id: revised text} from a response that kept the section markers.
+    """
+    return {match.group(1): match.group(2).strip() for match in _SECTION_BLOCK_PATTERN.finditer(output)}
+
+
+def _slugify(text: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", re.sub(r"[*_`]", "", text.lower())).strip("-")
+    return slug or "section"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
@@ -0,0 +1,205 @@
+"""
+topic_clusters.py
+
+Near-duplicate topic detection for a batch, so "AI in Education", "ai in education " and
+"AI for Education" cost one pipeline run instead of three.
+
+Topics are normalized (case and punctuation folded, "n't" spelled "not", and a short list
+of articles and prepositions dropped) and turned into character 3-gram shingles. Unlike the
+topic screen's stop words, the dedupe list keeps negations, comparison words and numbers,
+and topics are never merged when their numbers or their negation/comparison words differ,
+so "Best laptops 2023" / "Best laptops 2024" and "Investing over 50" / "Investing under 50"
+stay separate runs.
+
+A MinHash signature with LSH banding finds candidate matches among the topics seen so far,
+and the exact Jaccard similarity of the shingle sets decides. Clustering is greedy in input
+order: a topic joins the earlier representative it matches at CONTENTCRAFTER_DEDUPE_THRESHOLD
+(default 0.85) or better (the most similar one), and otherwise starts a new cluster, so
+clusters never chain through intermediate topics. A threshold above 1 turns clustering off.
+At 0.85, rewordings and plurals ("AI in Education" / "AI for Education" 1.0, "Home workout
+plan" / "Home workout plans" 0.94) merge, while added qualifiers ("Marathon training plan" /
+"Half marathon training plan" 0.80, "Healthy meal prep" / "Healthy meal prep ideas" 0.70)
+do not.
+
+ContentChainAgent.run_chain / stream_chain and batch.py run each cluster's representative
+once and fan its result out to the other members.
+
+🔁 Example Usage:
+
+    clusters = cluster_topics(["AI in Education", "ai in education ", "AI for Education", "Remote work"])
+    # [TopicCluster("AI in Education", members=[("ai in education ", 1.0), ("AI for Education", 1.0)]),
+    #  TopicCluster("Remote work", members=[])]
+    print(format_clusters(clusters))
+
+    index = TopicIndex()
+    index.match("AI in Education")          # None — registered as a representative
+    index.match("AI for Education")         # ("AI in Education", 1.0)
+"""
+
+import os
+import random
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from utils.topic_screen import topic_key
+
+DEFAULT_DEDUPE_THRESHOLD = float(os.getenv("CONTENTCRAFTER_DEDUPE_THRESHOLD", "0.85"))
+SHINGLE_SIZE = 3
+# 8 bands of 4 rows: pairs at Jaccard 0.85 become candidates with ~99% probability, at 0.5 ~40%
+NUM_BANDS, ROWS_PER_BAND = 8, 4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(17)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_BANDS * ROWS_PER_BAND)]
+
+# Words that never change what a topic is about; much shorter than topic_screen's stop words
+_DEDUPE_STOP_WORDS = frozenset("a an the of in on at to for with from by into as is are".split())
+# Topics that differ in any of these (or in their numbers) are never merged
+_GUARD_WORDS = frozenset("""
+not no never without nor non none
+over under above below more less fewer most least before after vs versus than
+""".split())
+
+
+def _words(topic: str) -> list:
+    return topic_key(re.sub(r"n['’]t\b", " not", topic.lower())).split()
+
+
+def normalize(topic: str) -> str:
+    """
+    The text a topic is compared on: its words without articles and prepositions, or all
+    of its words if nothing else is left.
+    """
+    words = _words(topic)
+    return " ".join(word for word in words if word not in _DEDUPE_STOP_WORDS) or " ".join(words)
+
+
+def guard(topic: str) -> tuple:
+    """
+    What two topics must have in common to be merged at all: their numbers and their
+    negation/comparison words.
+    """
+    words = _words(topic)
+    return (frozenset(word for word in words if any(char.isdigit() for char in word)),
+            frozenset(word for word in words if word in _GUARD_WORDS))
+
+
+def shingles(topic: str) -> frozenset:
+    text = normalize(topic)
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset((text,))
+    return frozenset(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set: frozenset) -> list:
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_set] or [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+@dataclass
+class TopicCluster:
+    representative: str
+    members: list = field(default_factory=list)  # (topic, similarity to the representative)
+
+    @property
+    def topics(self) -> list:
+        return [self.representative] + [topic for topic, _ in self.members]
+
+
+class TopicIndex:
+    """
+    Representatives seen so far, with an LSH index over their MinHash signatures.
+    Thread-safe use is up to the caller (batch.py matches topics on its reader thread).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_DEDUPE_THRESHOLD):
+        self.threshold = threshold
+        self._shingles = {}
+        self._guards = {}
+        self._bands = {}
+        self._buckets = defaultdict(set)
+
+    def match(self, topic: str):
+        """
+        Returns (representative, similarity) for the best earlier representative at or above
+        the threshold. Otherwise registers topic as a representative and returns None.
+        """
+        if self.threshold > 1:
+            return None
+        topic_shingles = shingles(topic)
+        topic_guard = guard(topic)
+        signature = minhash(topic_shingles)
+        bands = [(band, tuple(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])) for band in range(NUM_BANDS)]
+
+        best = None
+        candidates = set().union(*(self._buckets.get(key, ()) for key in bands))
+        for representative in candidates:
+            if self._guards[representative] != topic_guard:
+                continue
+            similarity = jaccard(topic_shingles, self._shingles[representative])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (representative, round(similarity, 3))
+        if best is not None:
+            return best
+
+        self._shingles[topic] = topic_shingles
+        self._guards[topic] = topic_guard
+        self._bands[topic] = bands
+        for key in bands:
+            self._buckets[key].add(topic)
+        return None
+
+    def discard(self, representative: str):
+        """
+        Forgets a representative; later near-duplicates of it start their own cluster.
+        """
+        self._shingles.pop(representative, None)
+        self._guards.pop(representative, None)
+        for key in self._bands.pop(representative, ()):
+            self._buckets[key].discard(representative)
+            if not self._buckets[key]:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._shingles)
+
+
+def cluster_topics(topics, threshold: float = DEFAULT_DEDUPE_THRESHOLD) -> list:
+    """
+    Groups near-duplicate topics.
+
+    Args:
+        topics (iterable): Topics in input order (exact repeats are dropped).
+        threshold (float, optional): Minimum Jaccard similarity (0–1) to join a cluster.
+
+    Returns:
+        list: TopicClusters in the order their representatives first appear.
+    """
+    index = TopicIndex(threshold)
+    clusters = {}
+    for topic in dict.fromkeys(topics):
+        match = index.match(topic)
+        if match is None:
+            clusters[topic] = TopicCluster(topic)
+        else:
+            clusters[match[0]].members.append((topic, match[1]))
+    return list(clusters.values())
+
+
+def format_clusters(clusters: list) -> str:
+    """
+    One line per clustered topic, e.g. "🔗 'AI for Education' → 'AI in Education' (similarity 1.00)".
+    Empty when nothing was clustered.
+    """
+    return "\n".join(
+        f"🔗 '{topic}' → '{cluster.representative}' (similarity {similarity:.2f})"
+        for cluster in clusters for topic, similarity in cluster.members
+    )
@@ -0,0 +1,171 @@
+"""
+topic_screen.py
+
+Local pre-screen for blog topics, run before the LLM validator.
+
+screen_topic() settles the obvious cases without a network call:
+
+    reject      empty input (nothing but punctuation or filler words) or a topic from the
+                deny lexicon ("AI", "life", "the future")
+    accept      a topic containing a term from the allow lexicon, or a clearly specific one:
+                at least CONTENTCRAFTER_TOPIC_FAST_TRACK_WORDS (default 3) content words,
+                at most half of its words stop words, and no more than 30 words
+    unsure      everything else, including short topics such as "Kubernetes", filler-heavy
+                or overly long ones — ContentChainAgent.validate_topic asks the model (and
+                caches its verdict)
+
+Model verdicts are stored per normalized topic (case, spacing and punctuation folded) in a
+TopicVerdictCache, so "AI in Education" and "ai in education!" share one validator call.
+Verdicts live in the response cache (utils/llm_cache.py) when it is enabled, so they
+survive restarts, and in memory otherwise.
+
+The lexicons are comma-separated lists in CONTENTCRAFTER_TOPIC_DENY and
+CONTENTCRAFTER_TOPIC_ALLOW; deny entries match whole topics, allow entries match any
+phrase in the topic.
+
+🔁 Example Usage:
+
+    screen_topic("AI")                          # TopicScreen("reject", "INVALID: ...")
+    screen_topic("Kubernetes")                  # TopicScreen("unsure", "") → ask the model
+    screen_topic("Kubernetes cost tuning")      # TopicScreen("accept", "VALID")
+    verdicts = TopicVerdictCache("gemini-1.5-flash")
+    verdicts.get("AI in Education") or verdicts.set("AI in Education", "VALID")
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from utils.llm_cache import get_default_cache
+
+REJECT, ACCEPT, UNSURE = "reject", "accept", "unsure"
+
+# Topics with at least this many content words (and within the limits below) skip the model; 0 always asks it
+FAST_TRACK_MIN_WORDS = int(os.getenv("CONTENTCRAFTER_TOPIC_FAST_TRACK_WORDS", "3"))
+MAX_TOPIC_WORDS = 30
+MAX_STOP_WORD_RATIO = 0.5
+
+_STOP_WORDS = frozenset("""
+a an the and or but of in on at to for with from by about into over under as is are was were be been being
+it its this that these those my your our their his her what which who whom how why when where
+do does did can could should would will shall may might must not no so very just really some any all
+i me we you he she they them us thing things stuff something anything everything
+""".split())
+
+# Single-subject topics the validator prompt itself says to reject
+_DEFAULT_DENY = (
+    "ai,life,technology,tech,love,business,money,health,science,history,music,sports,food,travel,"
+    "education,the future,future,stuff,things,anything,everything,test,testing,hello,hi,topic,blog"
+)
+
+
+def _lexicon(value: str) -> frozenset:
+    return frozenset(topic_key(term) for term in value.split(",") if term.strip())
+
+
+def topic_key(topic: str) -> str:
+    """
+    Normalized form of a topic: lower case, punctuation dropped, single spaces.
+    """
+    return " ".join(re.findall(r"[\w+#]+", topic.lower()))
+
+
+def content_words(topic: str) -> list:
+    """
+    The words of the normalized topic that are not stop words, in order.
+    """
+    return [word for word in topic_key(topic).split() if word not in _STOP_WORDS]
+
+
+DENY_LEXICON = _lexicon(os.getenv("CONTENTCRAFTER_TOPIC_DENY", _DEFAULT_DENY))
+ALLOW_LEXICON = _lexicon(os.getenv("CONTENTCRAFTER_TOPIC_ALLOW", ""))
+
+
+@dataclass(frozen=True)
+class TopicScreen:
+    verdict: str   # "reject", "accept" or "unsure"
+    text: str      # the validator-style answer ("VALID" / "INVALID: ...") unless unsure
+
+
+def screen_topic(topic: str, deny: frozenset = None, allow: frozenset = None) -> TopicScreen:
+    """
+    Screens a topic locally.
+
+    Args:
+        topic (str): The topic as entered.
+        deny (frozenset, optional): Normalized topics to reject. Defaults to DENY_LEXICON.
+        allow (frozenset, optional): Normalized phrases that fast-track a topic. Defaults to ALLOW_LEXICON.
+
+    Returns:
+        TopicScreen: The verdict and, when decided, the validator-style answer.
+    """
+    deny = DENY_LEXICON if deny is None else deny
+    allow = ALLOW_LEXICON if allow is None else allow
+    key = topic_key(topic)
+    words = key.split()
+    content = content_words(topic)
+
+    if not words:
+        return _reject(topic, "empty")
+    if key in deny:
+        return _reject(topic, "too broad a subject")
+    if any(phrase in allow for phrase in _phrases(words)):
+        return TopicScreen(ACCEPT, "VALID")
+    if not content:
+        return _reject(topic, "only filler words")
+    if (FAST_TRACK_MIN_WORDS and len(content) >= FAST_TRACK_MIN_WORDS and len(words) <= MAX_TOPIC_WORDS
+            and (len(words) - len(content)) / len(words) <= MAX_STOP_WORD_RATIO):
+        return TopicScreen(ACCEPT, "VALID")
+    return TopicScreen(UNSURE, "")
+
+
+class TopicVerdictCache:
+    """
+    Validator answers keyed by normalized topic (and backend and model). Backed by the shared
+    response cache when it is enabled, otherwise by a bounded in-memory LRU.
+    """
+
+    def __init__(self, model_name: str, cache=None, max_entries: int = 10000, backend: str = "gemini"):
+        self.model_name = model_name
+        self.backend = backend
+        self._cache = cache if cache is not None else get_default_cache()
+        self._memory = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _key(self, topic: str) -> str:
+        return f"topic-verdict:{topic_key(topic)}"
+
+    def get(self, topic: str):
+        key = self._key(topic)
+        if self._cache is not None:
+            return self._cache.get(self._cache.make_key(self.model_name, key, backend=self.backend))
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            return self._memory.get(key)
+
+    def set(self, topic: str, verdict: str):
+        key = self._key(topic)
+        if self._cache is not None:
+            self._cache.set(self._cache.make_key(self.model_name, key, backend=self.backend), self.model_name, verdict)
+            return
+        with self._lock:
+            self._memory[key] = verdict
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+
+
+def _phrases(words: list):
+    for size in range(1, len(words) + 1):
+        for start in range(len(words) - size + 1):
+            yield " ".join(words[start:start + size])
+
+
+def _reject(topic: str, reason: str) -> TopicScreen:
+    return TopicScreen(REJECT, f"INVALID: '{topic.strip()}' is not specific enough for a blog post ({reason}). "
+                               "Add a specific angle, audience or context (e.g. 'AI tutoring tools for "
+                               "high-school maths teachers').")